@@ -20,7 +20,7 @@
     # DODAJEMY NOWY PLIK:
     ./modules/ui/topbar.nix
 
-    ./modules/ai/memory.nix
+    ./modules/ai/memory/memory.nix
     ./modules/ai/brain/brain.nix
     ./modules/system/searx.nix
   ];
@@ -58,12 +58,18 @@ let
       accelerate
       sentencepiece
       huggingface-hub
+      onnxruntime # int8 MiniLM backend (memory/lib/embedder.py)
+      tokenizers
     ]
   );
 
+  # Shared index layout / content store / embedder (modules/ai/memory/lib)
+  memoryLib = ../memory/lib;
+
   # --- SERVER SCRIPT ---
   brainServerScript = pkgs.writeScriptBin "ai-brain-server" ''
     #!${brainPython}/bin/python
+    import sys; sys.path.insert(0, "${memoryLib}")
     ${builtins.readFile ./brain.py}
   '';
   # --- STARTUP WRAPPER ---
@@ -95,7 +101,8 @@ in
   systemd.user.services.ai-brain = {
     enable = true;
     description = "OmniOS Brain Native Server";
-    after = [ "graphical-session.target" ];
+    after = [ "graphical-session.target" "ai-embed.service" ];
+    wants = [ "ai-embed.service" ];
     wantedBy = [ "graphical-session.target" ];
 
     serviceConfig = {
@@ -1,7 +1,11 @@
-import logging, sys, os, time, threading, json
-from flask import Flask, request, jsonify
+import logging, sys, os, re, time, threading, json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from flask import Flask, Response, request, jsonify, stream_with_context
 import requests
 from simpleeval import SimpleEval
+from memory_store import DB_PATH, FTS_COLUMNS, SEARCH_COLUMNS, ContentStore, open_index, filter_sql
+from vector_matrix import MatrixReader
 
 # Silence logs
 logging.getLogger('werkzeug').setLevel(logging.ERROR)
@@ -10,12 +14,12 @@ app = Flask(__name__)
 
 HOME = os.path.expanduser("~")
 MODEL_PATH = os.path.join(HOME, ".local/share/ai-models", os.environ.get("MODEL_FILENAME", "Qwen2.5-0.5B-Instruct-Q8_0.gguf"))
-DB_PATH = os.path.join(HOME, ".local/share/ai-memory-db")
 SEARXNG_URL = "http://127.0.0.1:8888/search"
 
 llm = None
 embed_model = None
 db_conn = None
+content_store = None
 init_error = None
 
 # Thread Lock
@@ -44,7 +48,7 @@ COMMON_SHORTCUTS = {
 
 def ensure_model_loaded():
     """Smart Loader: Loads models separately or unified based on config"""
-    global llm, fast_model, init_error, embed_model, db_conn, fast_lock, main_lock
+    global llm, fast_model, init_error, embed_model, db_conn, content_store, fast_lock, main_lock
     
     # Fast check
     if llm and fast_model: return
@@ -58,6 +62,7 @@ def ensure_model_loaded():
             if os.path.exists(DB_PATH): 
                 import lancedb
                 db_conn = lancedb.connect(DB_PATH)
+                content_store = ContentStore()
                 logging.info("Smart Loader: DB Connected.")
             else:
                 logging.info("Smart Loader: DB Path not found, skipping.")
@@ -68,8 +73,7 @@ def ensure_model_loaded():
     logging.info("Smart Loader: Importing Libraries...")
     try:
         from llama_cpp import Llama
-        from sentence_transformers import SentenceTransformer
-        import torch
+        from embed_service import embedding_client
         logging.info("Smart Loader: Libraries Imported.")
     except Exception as e:
         logging.error(f"Smart Loader: Import Error: {e}")
@@ -144,12 +148,269 @@ def ensure_model_loaded():
                         init_error = str(e)
                         logging.error(f"Main Load Error: {e}")
 
-    # 4. Embeddings (CPU/GPU)
+    # 4. Embeddings: shared ai-embed service, interactive priority (outranks indexing)
     try:
-        device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        logging.info(f"Loading Embeddings on device: {device.upper()}")
-        embed_model = SentenceTransformer('all-MiniLM-L6-v2', device=device)
-    except: pass
+        if embed_model is None:
+            embed_model = embedding_client(priority="interactive")
+            logging.info(f"Embeddings: {embed_model.name} ({embed_model.device})")
+    except Exception as e:
+        logging.error(f"Embedding Load Error: {e}")
+
+# --- QUERY EMBEDDINGS ---
+# Every debounced keystroke hits /search, and overlapping SearchWorkers often
+# ask for the same text. Vectors are cached by normalized query, and misses
+# arriving within QUERY_BATCH_WINDOW are encoded together in one call.
+QUERY_CACHE_SIZE = 512
+QUERY_BATCH_WINDOW = 0.005 # seconds
+
+class _PendingEmbedding:
+    def __init__(self):
+        self.event = threading.Event()
+        self.vector = None
+        self.error = None
+
+class QueryEmbedder:
+    """LRU cache + micro-batching in front of embed_model.encode"""
+
+    def __init__(self, max_size=QUERY_CACHE_SIZE, window=QUERY_BATCH_WINDOW):
+        self.max_size = max_size
+        self.window = window
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.pending = {}
+        self.queue = []
+        self.collecting = False
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+
+    @staticmethod
+    def normalize(text):
+        # MiniLM is uncased, so case and spacing don't change the vector
+        return " ".join(text.lower().split())
+
+    def encode(self, text):
+        key = self.normalize(text)
+        with self.lock:
+            vec = self.cache.get(key)
+            if vec is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return vec
+            self.misses += 1
+            slot = self.pending.get(key)
+            if slot is None:
+                slot = self.pending[key] = _PendingEmbedding()
+                self.queue.append(key)
+            leader = not self.collecting
+            if leader: self.collecting = True
+
+        if leader:
+            # First miss collects everyone else who shows up during the window
+            time.sleep(self.window)
+            with self.lock:
+                keys, self.queue = self.queue, []
+                self.collecting = False
+            self._encode_batch(keys)
+
+        if not slot.event.wait(timeout=30):
+            raise TimeoutError("Query embedding timed out")
+        if slot.error: raise slot.error
+        return slot.vector
+
+    def _encode_batch(self, keys):
+        if not keys: return
+        vectors, error = None, None
+        try:
+            if embed_model is None: raise RuntimeError("Embedding model not loaded")
+            vectors = embed_model.encode(keys, batch_size=len(keys))
+            self.batches += 1
+        except Exception as e:
+            error = e
+
+        with self.lock:
+            for i, key in enumerate(keys):
+                slot = self.pending.pop(key, None)
+                if error is None:
+                    self.cache[key] = vectors[i]
+                    self.cache.move_to_end(key)
+                if slot:
+                    slot.vector = vectors[i] if error is None else None
+                    slot.error = error
+                    slot.event.set()
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+
+        if len(keys) > 1:
+            logging.info(f"QueryEmbedder: batched {len(keys)} queries into one encode")
+
+query_embedder = QueryEmbedder()
+
+# --- FILE RETRIEVAL (HYBRID) ---
+# MiniLM is weak on exact identifiers (invoice numbers, code symbols), so the
+# vector search runs alongside BM25 over the body and the file name (indexes
+# maintained by ai-mem-daemon). The ranked lists are merged with reciprocal
+# rank fusion; retrievers that miss the latency budget are simply left out.
+RRF_K = 60
+VECTOR_MAX_DISTANCE = 1.1
+SEARCH_BUDGET = 0.3 # seconds, per-keystroke /search
+ASK_BUDGET = 1.5    # seconds, /ask "files" context
+retrieval_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieval")
+# Small corpora: brute force over ai-mem-daemon's float16 matrix, no LanceDB
+# round trip. Falls back to LanceDB when the matrix is missing or too large.
+vector_matrix = MatrixReader()
+
+# --- RERANKING ---
+# Optional second stage: a small cross-encoder (ai-embed "rerank" op) rescores
+# a wider candidate set, using each file's name plus the start of its body as
+# the passage. Scores are cached per (query, content hash); if scoring misses
+# its budget we keep the RRF order, and the late scores still land in the
+# cache for the next keystroke. Scoring has its own single worker, so stale
+# reranks never take retrieval_pool threads from vector/BM25 search, and a
+# queued rerank that a newer one has superseded is skipped.
+RERANK_ENABLED = os.environ.get("AI_RERANK", "1") == "1"
+RERANK_CANDIDATES = 30
+RERANK_PASSAGE_CHARS = 1000
+RERANK_CACHE_SIZE = 4096
+SEARCH_RERANK_BUDGET = 0.25 # seconds, on top of SEARCH_BUDGET
+ASK_RERANK_BUDGET = 0.8
+RERANK_MIN_SCORE = -2.0 # ms-marco logit; weaker files are left out of the /ask prompt
+
+rerank_cache = OrderedDict()
+rerank_lock = threading.Lock()
+rerank_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+rerank_ticket = 0 # bumped per rerank request; older queued ones are skipped
+
+def _rerank_key(query, row):
+    return (QueryEmbedder.normalize(query), row['content_hash'])
+
+def _score_passages(query, rows, ticket):
+    """Scores into rerank_cache; False if no reranker is available, None if superseded"""
+    if ticket != rerank_ticket: return None # a newer keystroke wants the worker
+    passages = [f"{row['filename']}\n{content_store.get(row['content_hash'], max_chars=RERANK_PASSAGE_CHARS) or ''}"
+                for row in rows]
+    scores = embed_model.rerank(query, passages)
+    if scores is None: return False # in-process fallback or ai-embed down
+    with rerank_lock:
+        for row, score in zip(rows, scores):
+            rerank_cache[_rerank_key(query, row)] = float(score)
+        while len(rerank_cache) > RERANK_CACHE_SIZE:
+            rerank_cache.popitem(last=False)
+    return True
+
+def rerank_hits(query, hits, budget):
+    """Hits in cross-encoder order (each gets "rerank"), or None to keep RRF order"""
+    global rerank_ticket
+    with rerank_lock:
+        missing = [h["row"] for h in hits if _rerank_key(query, h["row"]) not in rerank_cache]
+        if missing:
+            rerank_ticket += 1
+            ticket = rerank_ticket
+    if missing:
+        fut = rerank_pool.submit(_score_passages, query, missing, ticket)
+        done, _ = wait_futures([fut], timeout=budget)
+        if not done:
+            logging.info(f"Rerank: {len(missing)} passages missed the {budget}s budget, using RRF order")
+            return None
+        try:
+            scored = fut.result()
+            if not scored:
+                if scored is False: logging.info("Rerank: no reranker available, using RRF order")
+                return None
+        except Exception as e:
+            logging.warning(f"Rerank failed: {e}")
+            return None
+    with rerank_lock:
+        for h in hits:
+            key = _rerank_key(query, h["row"])
+            h["rerank"] = rerank_cache.get(key)
+            if key in rerank_cache: rerank_cache.move_to_end(key)
+    if any(h["rerank"] is None for h in hits): return None # evicted meanwhile
+    return sorted(hits, key=lambda h: h["rerank"], reverse=True)
+
+def _vector_candidates(tbl, query, query_vec, limit, where=None):
+    if query_vec is None:
+        query_vec = query_embedder.encode(query)
+    # The matrix has no metadata columns, so filtered searches go to LanceDB
+    rows = vector_matrix.search(query_vec, limit) if where is None else None
+    if rows is None:
+        # Project only the small columns: no vectors, no document bodies, no pandas
+        query_builder = tbl.search(query_vec).select(SEARCH_COLUMNS).limit(limit)
+        if where: query_builder = query_builder.where(where, prefilter=True)
+        rows = query_builder.to_arrow().to_pylist()
+    return [r for r in rows if r.get('_distance', 0) < VECTOR_MAX_DISTANCE]
+
+def _lexical_candidates(text_tbl, query, column, limit, where=None):
+    query_builder = text_tbl.search(query, query_type="fts", fts_columns=column)
+    if where: query_builder = query_builder.where(where, prefilter=True)
+    return query_builder.select(SEARCH_COLUMNS).limit(limit).to_arrow().to_pylist()
+
+# --- METADATA FILTERS ---
+# "notes from last week" -> modified_after/before, pushed down to the daemon's
+# scalar indexes. Read from the query text only where it's meant as a date:
+# /ask questions, and /search when the caller opts in ("time_filter": true).
+# A keystroke query containing "today" is as likely to be about the word.
+# Explicit filters from the caller win over the query text.
+DAY = 86400
+RELATIVE_TIME = [
+    (r"\btoday\b", lambda start: (start, None)),
+    (r"\byesterday\b", lambda start: (start - DAY, start)),
+    (r"\bthis week\b", lambda start: (start - time.localtime(start).tm_wday * DAY, None)),
+    (r"\blast week\b", lambda start: (start - (time.localtime(start).tm_wday + 7) * DAY,
+                                      start - time.localtime(start).tm_wday * DAY)),
+    (r"\bthis month\b", lambda start: (start - (time.localtime(start).tm_mday - 1) * DAY, None)),
+]
+RECENT_DAYS = re.compile(r"\b(?:last|past) (\d+) (day|week)s?\b")
+
+def time_filter(query, now=None):
+    """{"modified_after": ..., "modified_before": ...} for a relative date in the query, or {}"""
+    text = query.lower()
+    t = time.localtime(now or time.time())
+    start = time.mktime((t.tm_year, t.tm_mon, t.tm_mday, 0, 0, 0, 0, 0, -1)) # local midnight
+    match = RECENT_DAYS.search(text)
+    if match:
+        days = int(match.group(1)) * (7 if match.group(2) == "week" else 1)
+        return {"modified_after": start - (days - 1) * DAY}
+    for pattern, window in RELATIVE_TIME:
+        if re.search(pattern, text):
+            after, before = window(start)
+            return {k: v for k, v in (("modified_after", after), ("modified_before", before)) if v is not None}
+    return {}
+
+def retrieve_files(query, limit=3, budget=SEARCH_BUDGET, query_vec=None, rerank_budget=None, filters=None):
+    """Hybrid lexical + vector retrieval, fused with RRF within a time budget,
+    optionally reranked by the cross-encoder within rerank_budget"""
+    # Follows ai-mem-daemon's current.json, so rebuilt indexes show up without a restart
+    tbl, text_tbl = open_index(db_conn)
+    where = filter_sql(filters or {})
+    rerank = RERANK_ENABLED and rerank_budget is not None
+    pool_size = RERANK_CANDIDATES if rerank else max(limit * 3, 10)
+    futures = {retrieval_pool.submit(_vector_candidates, tbl, query, query_vec, pool_size, where): "vector"}
+    for column in FTS_COLUMNS:
+        futures[retrieval_pool.submit(_lexical_candidates, text_tbl, query, column, pool_size, where)] = f"bm25:{column}"
+
+    done, _ = wait_futures(futures, timeout=budget)
+
+    fused = {}
+    for fut, name in futures.items():
+        if fut not in done:
+            logging.info(f"Retrieval: {name} missed the {budget}s budget")
+            continue
+        try:
+            rows = fut.result()
+        except Exception as e:
+            logging.warning(f"Retrieval: {name} failed: {e}")
+            continue
+        for rank, row in enumerate(rows):
+            entry = fused.setdefault(row['path'], {"row": row, "score": 0.0, "sources": []})
+            entry["score"] += 1.0 / (RRF_K + rank + 1)
+            entry["sources"].append(name)
+            if '_distance' in row: entry["row"] = row
+
+    ranked = sorted(fused.values(), key=lambda e: e["score"], reverse=True)
+    if rerank and ranked:
+        ranked = rerank_hits(query, ranked[:RERANK_CANDIDATES], rerank_budget) or ranked
+    return ranked[:limit]
 
 def ensure_fast_model():
     ensure_model_loaded()
@@ -377,6 +638,24 @@ def perform_calculation(expression):
     except Exception as e:
         return f"Error calculating '{expression}': {str(e)}"
 
+def stream_answer(prompt):
+    """/ask with "stream": true - Omni shows the answer while it's generated"""
+    logging.info("Streaming answer with Main Model...")
+    abort_fast_event.clear()
+    try:
+        with main_lock:
+            for chunk in llm(prompt, max_tokens=1024, stop=["<|im_start|>", "<|im_end|>", "<|endoftext|>"],
+                             echo=False, temperature=0.7, stream=True):
+                text = chunk['choices'][0]['text']
+                if text: yield json.dumps({"delta": text}) + "\n"
+        logging.info("Answer streamed.")
+    except GeneratorExit:
+        logging.info("Client went away, generation stopped.")
+        raise
+    except Exception as e:
+        yield json.dumps({"delta": f"Error: {e}"}) + "\n"
+    yield json.dumps({"done": True}) + "\n"
+
 @app.route('/ask', methods=['POST'])
 def ask():
     # Signal Fast Model to STOP immediately
@@ -449,12 +728,22 @@ def ask():
     if decision == "files" and db_conn and embed_model:
         source_type = "Local Files"
         try:
-            tbl = db_conn.open_table("files")
-            res = tbl.search(embed_model.encode(tool_query)).limit(3).to_pandas()
-            if not res.empty:
-                for _, row in res.iterrows():
-                    context_text += f"--- Local File: {row['filename']} ---\n{row['text'][:1500]}\n\n"
-        except: pass
+            # Both legs search tool_query (the router may have rewritten it); encode() serves
+            # the vector /search already cached for that text, if any
+            query_vec = query_embedder.encode(tool_query)
+            # Dates come from the user's own words; the router may have dropped them
+            filters = time_filter(query)
+            if filters: logging.info(f"Date filter from the question: {filters}")
+            hits = retrieve_files(tool_query, limit=3, budget=ASK_BUDGET, query_vec=query_vec,
+                                  rerank_budget=ASK_RERANK_BUDGET, filters=filters)
+            # With reranker scores, weak matches only cost prompt tokens: keep the best one regardless
+            hits = hits[:1] + [h for h in hits[1:] if h.get("rerank") is None or h["rerank"] >= RERANK_MIN_SCORE]
+            for hit in hits:
+                row = hit["row"]
+                body = content_store.get(row['content_hash'], max_chars=1500) or ""
+                context_text += f"--- Local File: {row['filename']} ---\n{body}\n\n"
+        except Exception as e:
+            logging.error(f"File retrieval failed: {e}")
         
     elif decision == "search":
         source_type = "Internet"
@@ -484,6 +773,10 @@ def ask():
         f"<|im_start|>assistant\n"
     )
 
+    if req.get('stream'):
+        # Newline-delimited JSON: {"delta": "..."} per token batch, then {"done": true}
+        return Response(stream_with_context(stream_answer(prompt)), mimetype="application/x-ndjson")
+
     try:
         logging.info("Generating answer with Main Model...")
         # Clear signal so future fast actions work
@@ -513,24 +806,30 @@ def search_endpoint():
     
     query = req.get('query', "").strip()
     if not query: return jsonify({"results": []})
+    # Optional {"folder", "ext", "modified_after", "modified_before"}; see memory_store.filter_sql
+    filters = req.get('filters')
+    if filters is None and req.get('time_filter'):
+        filters = time_filter(query) # opt-in: "today" etc. in the query become a date range
 
     results = []
     try:
-        tbl = db_conn.open_table("files")
-        res = tbl.search(embed_model.encode(query)).limit(3).to_pandas()
-        if not res.empty:
-            for _, row in res.iterrows():
-                if row.get('_distance', 0) < 1.1:
-                    results.append({
-                        "name": row['filename'],
-                        "path": row['path'],
-                        "score": float(row.get('_distance', 0)),
-                        "type": "file"
-                    })
+        for hit in retrieve_files(query, limit=3, budget=SEARCH_BUDGET, rerank_budget=SEARCH_RERANK_BUDGET,
+                                  filters=filters):
+            row = hit["row"]
+            results.append({
+                "name": row['filename'],
+                "path": row['path'],
+                "score": hit["score"],
+                "distance": float(row['_distance']) if '_distance' in row else None,
+                "matched_by": hit["sources"],
+                "rerank_score": hit.get("rerank"),
+                "type": "file"
+            })
     except Exception as e:
         logging.error(f"Search error: {e}")
 
-    return jsonify({"results": results})
+    # The filter actually applied, so the UI can show it
+    return jsonify({"results": results, "filters": filters or {}})
 
 @app.route('/action', methods=['POST'])
 def action_endpoint():
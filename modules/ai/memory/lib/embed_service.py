@@ -0,0 +1,275 @@
+"""Shared MiniLM embedding service (ai-embed) and its client.
+
+One process holds the model for the whole system; ai-mem-daemon and the brain
+send it texts over a Unix socket instead of each loading their own copy.
+
+Protocol, one request per connection:
+  -> {"op": "encode", "texts": [...], "priority": "interactive" | "background"}\\n
+  <- {"ok": true, "shape": [n, 384]}\\n followed by n*384 float32 (little endian)
+  -> {"op": "rerank", "query": "...", "passages": [...]}\\n
+  <- {"ok": true, "shape": [n, 1]}\\n followed by n float32 relevance scores
+  -> {"op": "status"}\\n
+  <- {"ok": true, ...}\\n
+
+Requests are queued per priority. Interactive work (brain queries, CLI
+searches) is always taken first; background work (indexing) is encoded in
+small chunks, so an interactive request waits for at most one chunk. Pending
+requests of the same priority are batched into one encode call. Rerank
+requests share the model thread, so the two never compete for cores, but
+have their own tier between the two: the next keystroke's query encode
+never waits behind the last keystroke's rerank. The cross-encoder is loaded
+on a side thread at startup; until it's there (or if it failed) reranks
+fail fast. Jobs whose client gave up are dropped unprocessed.
+"""
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from embedder import EMBED_DIM, load_embedder, load_reranker
+
+RUNTIME_DIR = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+SOCKET_PATH = os.environ.get("AI_EMBED_SOCKET", os.path.join(RUNTIME_DIR, f"ai-embed-{os.getuid()}.sock"))
+
+PRIORITIES = {"interactive": 0, "rerank": 5, "background": 10}
+MAX_BATCH = {"interactive": 64, "rerank": 32, "background": 16}
+REQUEST_TIMEOUT = 120.0
+RERANK_ENABLED = os.environ.get("AI_RERANK", "1") == "1"
+
+
+class _Job:
+    def __init__(self, texts, priority, kind="encode"):
+        self.texts = texts # strings, or (query, passage) pairs for rerank
+        self.priority = priority
+        self.kind = kind
+        self.offset = 0 # next text to hand to the model
+        self.done = 0
+        self.vectors = np.zeros((len(texts), EMBED_DIM if kind == "encode" else 1), dtype=np.float32)
+        self.error = None
+        self.cancelled = False # client timed out; skip what's left
+        self.event = threading.Event()
+        self.enqueued = time.perf_counter()
+
+
+class EmbeddingService:
+    """Priority queue + single model worker"""
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.reranker = None
+        self.reranker_error = None
+        self.reranker_state = "disabled"
+        self.cond = threading.Condition()
+        self.queues = {p: deque() for p in PRIORITIES}
+        self.stats = {p: {"requests": 0, "texts": 0, "batches": 0, "wait_ms_total": 0.0} for p in PRIORITIES}
+        threading.Thread(target=self._worker, daemon=True).start()
+        if RERANK_ENABLED:
+            self.reranker_state = "loading"
+            threading.Thread(target=self._load_reranker, daemon=True, name="reranker-load").start()
+
+    def _load_reranker(self):
+        """Off the model thread: encodes keep flowing while the cross-encoder loads"""
+        print("🧮 [Embed] Loading reranker...", flush=True)
+        try:
+            self.reranker = load_reranker()
+            self.reranker_state = "ready"
+            print(f"🧮 [Embed] Reranker {self.reranker.name} ready", flush=True)
+        except Exception as e:
+            self.reranker_error = e # kept: later reranks fail fast instead of reloading
+            self.reranker_state = "failed"
+            print(f"⚠️ [Embed] Reranker failed to load: {e}", flush=True)
+
+    def submit(self, texts, priority="background", kind="encode"):
+        if kind == "rerank":
+            priority = "rerank"
+        elif priority not in ("interactive", "background"):
+            priority = "background"
+        job = _Job(texts, priority, kind)
+        if kind == "rerank" and self.reranker is None:
+            job.error = self.reranker_error or RuntimeError(f"reranker {self.reranker_state}")
+        if not texts or job.error:
+            job.event.set()
+            return job
+        with self.cond:
+            self.queues[priority].append(job)
+            self.stats[priority]["requests"] += 1
+            self.cond.notify()
+        return job
+
+    def _next_batch(self):
+        """Slices (job, start, end) from the most urgent non-empty queue"""
+        with self.cond:
+            while not any(self.queues.values()):
+                self.cond.wait()
+            priority = min((p for p in PRIORITIES if self.queues[p]), key=PRIORITIES.get)
+            q = self.queues[priority]
+            while q and q[0].cancelled:
+                q.popleft() # nobody is waiting for it any more
+            if not q:
+                return priority, []
+            budget = MAX_BATCH[priority]
+            kind = q[0].kind
+            slices = []
+            while q and budget > 0 and q[0].kind == kind:
+                job = q[0]
+                if job.cancelled:
+                    q.popleft()
+                    continue
+                take = min(budget, len(job.texts) - job.offset)
+                slices.append((job, job.offset, job.offset + take))
+                job.offset += take
+                budget -= take
+                if job.offset >= len(job.texts):
+                    q.popleft()
+            return priority, slices
+
+    def _run_model(self, kind, texts):
+        if kind == "rerank":
+            return self.reranker.predict(texts, batch_size=len(texts)).reshape(-1, 1)
+        return self.embedder.encode(texts, batch_size=len(texts))
+
+    def _worker(self):
+        while True:
+            priority, slices = self._next_batch()
+            if not slices: continue
+            texts = [t for job, start, end in slices for t in job.texts[start:end]]
+            try:
+                vectors = np.asarray(self._run_model(slices[0][0].kind, texts), dtype=np.float32)
+                error = None
+            except Exception as e:
+                vectors, error = None, e
+
+            stats = self.stats[priority]
+            stats["batches"] += 1
+            stats["texts"] += len(texts)
+            pos = 0
+            for job, start, end in slices:
+                if error is not None:
+                    job.error = error
+                else:
+                    job.vectors[start:end] = vectors[pos:pos + end - start]
+                pos += end - start
+                job.done += end - start
+                if job.done >= len(job.texts) or job.error is not None:
+                    stats["wait_ms_total"] += (time.perf_counter() - job.enqueued) * 1000
+                    job.event.set()
+
+    def status(self):
+        with self.cond:
+            depth = {p: sum(len(j.texts) - j.offset for j in q) for p, q in self.queues.items()}
+        return {"backend": self.embedder.name, "device": self.embedder.device,
+                "reranker": self.reranker.name if self.reranker else self.reranker_state,
+                "queued_texts": depth, "stats": self.stats}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        service = self.server.service
+        try:
+            req = json.loads(self.rfile.readline(16_000_000))
+            op = req.get("op")
+            if op in ("encode", "rerank"):
+                if op == "rerank":
+                    query = str(req.get("query", ""))
+                    job = service.submit([(query, str(p)) for p in req.get("passages", [])], "rerank", "rerank")
+                else:
+                    job = service.submit([str(t) for t in req.get("texts", [])], req.get("priority", "background"))
+                if not job.event.wait(REQUEST_TIMEOUT):
+                    job.cancelled = True # don't compute the rest for nobody
+                    raise TimeoutError(f"{op} timed out")
+                if job.error: raise job.error
+                header = {"ok": True, "shape": list(job.vectors.shape)}
+                self.wfile.write(json.dumps(header).encode("utf-8") + b"\n")
+                self.wfile.write(job.vectors.astype("<f4").tobytes())
+                return
+            if op == "status":
+                response = {"ok": True, **service.status()}
+            else:
+                response = {"ok": False, "error": f"unknown op {op!r}"}
+        except Exception as e:
+            response = {"ok": False, "error": str(e)}
+        self.wfile.write(json.dumps(response, default=str).encode("utf-8") + b"\n")
+
+
+def serve():
+    print("🧮 [Embed] Loading embedding model...", flush=True)
+    embedder = load_embedder(device="auto")
+    if os.path.exists(SOCKET_PATH): os.unlink(SOCKET_PATH)
+    server = socketserver.ThreadingUnixStreamServer(SOCKET_PATH, _Handler)
+    server.daemon_threads = True
+    server.service = EmbeddingService(embedder)
+    os.chmod(SOCKET_PATH, 0o600)
+    print(f"🧮 [Embed] {embedder.name} on {embedder.device} serving {SOCKET_PATH}", flush=True)
+    server.serve_forever()
+
+
+# --- CLIENT ---
+class EmbeddingClient:
+    """Drop-in for the local embedders: encode(str) -> (384,), encode(list) -> (n, 384)"""
+
+    name = "ai-embed"
+    device = "service"
+
+    def __init__(self, priority="background", socket_path=SOCKET_PATH, connect_wait=60.0):
+        self.priority = priority
+        self.socket_path = socket_path
+        self.connect_wait = connect_wait # the service may still be loading the model
+
+    def _connect(self, wait=None):
+        deadline = time.monotonic() + (self.connect_wait if wait is None else wait)
+        while True:
+            try:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(REQUEST_TIMEOUT)
+                sock.connect(self.socket_path)
+                return sock
+            except OSError:
+                sock.close()
+                if time.monotonic() > deadline: raise
+                time.sleep(0.5)
+
+    def _call(self, payload, wait=None):
+        with self._connect(wait) as sock:
+            sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+            reader = sock.makefile("rb")
+            header = json.loads(reader.readline())
+            if not header.get("ok"):
+                raise RuntimeError(header.get("error", "embedding service error"))
+            if "shape" not in header:
+                return header, None
+            rows, dim = header["shape"]
+            data = reader.read(rows * dim * 4)
+            return header, np.frombuffer(data, dtype="<f4").reshape(rows, dim)
+
+    def encode(self, texts, batch_size=None, priority=None):
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        _, vectors = self._call({"op": "encode", "texts": batch, "priority": priority or self.priority})
+        return vectors[0] if single else vectors
+
+    def rerank(self, query, passages):
+        """Cross-encoder relevance score per passage (higher is better), or None
+        if the service is down: reranking is optional, so don't wait for it"""
+        if not passages:
+            return np.zeros(0, dtype=np.float32)
+        try:
+            _, scores = self._call({"op": "rerank", "query": query, "passages": list(passages)}, wait=0)
+        except OSError:
+            return None
+        return scores.reshape(-1)
+
+    def status(self):
+        header, _ = self._call({"op": "status"})
+        return header
+
+
+def embedding_client(priority="background"):
+    """Service client, or a local model if AI_EMBED_SERVICE=0 (debugging)"""
+    if os.environ.get("AI_EMBED_SERVICE", "1") == "0":
+        return load_embedder(device="auto")
+    return EmbeddingClient(priority=priority)
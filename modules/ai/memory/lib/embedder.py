@@ -0,0 +1,307 @@
+"""all-MiniLM-L6-v2 embedding backends shared by ai-mem-daemon and the brain.
+
+Backends (AI_EMBED_BACKEND):
+  torch      sentence-transformers + PyTorch (reference implementation)
+  onnx-int8  the same model exported to ONNX with dynamically quantized int8
+             weights, run by onnxruntime on CPU. No torch import, a fraction
+             of the RAM, faster per-batch on small CPUs.
+  auto       onnx-int8 if the exported model exists, otherwise torch (default)
+
+Compatibility: both backends produce L2-normalised 384-d vectors with the
+same tokenizer, truncation (256 tokens) and mean pooling. The int8 model is
+accepted if every vector has cosine similarity >= ONNX_TOLERANCE with the
+torch vector for the same text, which keeps existing indexes searchable
+without a re-embed. `ai-embed-check` verifies this on the installed model;
+`ai-embed-export` creates it.
+
+The same file holds the optional reranker: a small cross-encoder
+(ms-marco-MiniLM-L-6-v2) that scores (query, passage) pairs, with the same
+torch / onnx-int8 split. Scores are raw relevance logits (higher is better).
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+MAX_SEQ_LENGTH = 256
+EMBED_DIM = 384
+ONNX_TOLERANCE = 0.98
+
+BACKEND = os.environ.get("AI_EMBED_BACKEND", "auto")
+ONNX_DIR = os.environ.get(
+    "AI_EMBED_ONNX_DIR",
+    os.path.join(os.path.expanduser("~"), ".local/share/ai-models", f"{MODEL_NAME}-onnx-int8")
+)
+ONNX_MODEL = os.path.join(ONNX_DIR, "model_int8.onnx")
+ONNX_TOKENIZER = os.path.join(ONNX_DIR, "tokenizer.json")
+
+RERANK_MODEL = 'cross-encoder/ms-marco-MiniLM-L-6-v2'
+RERANK_MAX_LENGTH = 256
+RERANK_ONNX_DIR = os.environ.get(
+    "AI_RERANK_ONNX_DIR",
+    os.path.join(os.path.expanduser("~"), ".local/share/ai-models", "ms-marco-MiniLM-L-6-v2-onnx-int8")
+)
+
+CHECK_SAMPLES = [
+    "hello",
+    "Invoice 2024-117 for IT services, due September 30th",
+    "def index_file(filepath): return extract_text(filepath)",
+    "Notatki ze spotkania: budżet na wrzesień i plan wdrożenia",
+    "How do I configure a NixOS systemd user service with resource limits?",
+    "File Path: /home/user/Documents/taxes/2023/summary.pdf\nFile Name: summary.pdf",
+]
+
+
+class TorchEmbedder:
+    name = "torch"
+
+    def __init__(self, device="cpu"):
+        from sentence_transformers import SentenceTransformer
+        if device == "auto":
+            import torch
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.device = device
+        self.model = SentenceTransformer(MODEL_NAME, device=device)
+
+    def encode(self, texts, batch_size=32, priority=None):
+        return self.model.encode(texts, batch_size=batch_size)
+
+    def rerank(self, query, passages):
+        return None # no cross-encoder in-process; callers keep their order
+
+
+class OnnxEmbedder:
+    name = "onnx-int8"
+
+    def __init__(self, model_path=ONNX_MODEL, tokenizer_path=ONNX_TOKENIZER, threads=None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.device = "cpu"
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, then L2 normalise (same as the ST pipeline)
+        weights = mask[:, :, None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, texts, batch_size=32, priority=None):
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        if not batch:
+            return np.zeros((0, EMBED_DIM), dtype=np.float32)
+        out = np.vstack([self._encode_batch(batch[i:i + batch_size])
+                         for i in range(0, len(batch), batch_size)]).astype(np.float32)
+        return out[0] if single else out
+
+    def rerank(self, query, passages):
+        return None # no cross-encoder in-process; callers keep their order
+
+
+class TorchReranker:
+    name = "torch"
+
+    def __init__(self):
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(RERANK_MODEL)
+        self.model = AutoModelForSequenceClassification.from_pretrained(RERANK_MODEL).eval()
+
+    def predict(self, pairs, batch_size=32):
+        # Raw logits, no sigmoid, so both backends score on the same scale
+        scores = []
+        for i in range(0, len(pairs), batch_size):
+            chunk = pairs[i:i + batch_size]
+            features = self.tokenizer([q for q, _ in chunk], [p for _, p in chunk], padding=True,
+                                      truncation=True, max_length=RERANK_MAX_LENGTH, return_tensors="pt")
+            with self.torch.no_grad():
+                scores.append(self.model(**features).logits.reshape(-1).numpy())
+        return np.concatenate(scores).astype(np.float32) if scores else np.zeros(0, dtype=np.float32)
+
+
+class OnnxReranker:
+    name = "onnx-int8"
+
+    def __init__(self, model_dir=RERANK_ONNX_DIR):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=RERANK_MAX_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(os.path.join(model_dir, "model_int8.onnx"), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def predict(self, pairs, batch_size=32):
+        scores = []
+        for i in range(0, len(pairs), batch_size):
+            encodings = self.tokenizer.encode_batch([tuple(p) for p in pairs[i:i + batch_size]])
+            feeds = {"input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                     "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64)}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+            scores.append(self.session.run(None, feeds)[0].reshape(-1))
+        return np.concatenate(scores).astype(np.float32) if scores else np.zeros(0, dtype=np.float32)
+
+
+def onnx_available():
+    return os.path.exists(ONNX_MODEL) and os.path.exists(ONNX_TOKENIZER)
+
+
+def reranker_onnx_available():
+    return all(os.path.exists(os.path.join(RERANK_ONNX_DIR, f)) for f in ("model_int8.onnx", "tokenizer.json"))
+
+
+def load_reranker(backend=None):
+    """Cross-encoder for the configured backend (same fallback rules as load_embedder)"""
+    backend = backend or BACKEND
+    if backend in ("auto", "onnx-int8") and reranker_onnx_available():
+        try:
+            return OnnxReranker()
+        except Exception as e:
+            print(f"⚠️ [Embed] ONNX reranker failed to load ({e}), using torch", flush=True)
+    return TorchReranker()
+
+
+def load_embedder(backend=None, device="cpu"):
+    """Build the configured backend, degrading to torch if the ONNX model is missing"""
+    backend = backend or BACKEND
+    if backend in ("auto", "onnx-int8"):
+        if onnx_available():
+            try:
+                return OnnxEmbedder()
+            except Exception as e:
+                print(f"⚠️ [Embed] ONNX backend failed to load ({e}), using torch", flush=True)
+        elif backend == "onnx-int8":
+            print(f"⚠️ [Embed] {ONNX_MODEL} missing (run ai-embed-export), using torch", flush=True)
+    return TorchEmbedder(device=device)
+
+
+# --- EXPORT / CHECK (ai-embed-export, ai-embed-check) ---
+def export_onnx(out_dir=ONNX_DIR):
+    """Export MiniLM to ONNX and quantize its weights to int8"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(out_dir, exist_ok=True)
+    st = SentenceTransformer(MODEL_NAME, device="cpu")
+    hf_model = st[0].auto_model.eval()
+    hf_model.config.return_dict = False
+    tokenizer = st.tokenizer
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+    fp32_path = os.path.join(out_dir, "model_fp32.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            hf_model, tuple(sample[n] for n in input_names), fp32_path,
+            input_names=input_names, output_names=["last_hidden_state", "pooler_output"],
+            dynamic_axes=dynamic, opset_version=17
+        )
+    quantize_dynamic(fp32_path, os.path.join(out_dir, "model_int8.onnx"), weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+    tokenizer.save_pretrained(out_dir) # writes tokenizer.json
+    print(f"✅ [Embed] Exported int8 ONNX model to {out_dir}", flush=True)
+
+
+def export_reranker_onnx(out_dir=RERANK_ONNX_DIR):
+    """Export the cross-encoder (sequence classification head) to int8 ONNX"""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(out_dir, exist_ok=True)
+    model = AutoModelForSequenceClassification.from_pretrained(RERANK_MODEL).eval()
+    model.config.return_dict = False
+    tokenizer = AutoTokenizer.from_pretrained(RERANK_MODEL)
+
+    sample = tokenizer(["query"], ["export sample passage"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic["logits"] = {0: "batch"}
+    fp32_path = os.path.join(out_dir, "model_fp32.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[n] for n in input_names), fp32_path,
+            input_names=input_names, output_names=["logits"], dynamic_axes=dynamic, opset_version=17
+        )
+    quantize_dynamic(fp32_path, os.path.join(out_dir, "model_int8.onnx"), weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+    tokenizer.save_pretrained(out_dir)
+    print(f"✅ [Embed] Exported int8 ONNX reranker to {out_dir}", flush=True)
+
+
+def check_backends(texts=CHECK_SAMPLES, tolerance=ONNX_TOLERANCE):
+    """Compare onnx-int8 against torch; returns True if within tolerance"""
+    reference = TorchEmbedder(device="cpu")
+    candidate = OnnxEmbedder()
+
+    t0 = time.perf_counter(); ref = reference.encode(texts); t_ref = time.perf_counter() - t0
+    t0 = time.perf_counter(); got = candidate.encode(texts); t_got = time.perf_counter() - t0
+
+    cosines = np.sum(ref * got, axis=1) / (np.linalg.norm(ref, axis=1) * np.linalg.norm(got, axis=1))
+    for text, cos in zip(texts, cosines):
+        mark = "✅" if cos >= tolerance else "❌"
+        print(f"{mark} {cos:.4f}  {text[:60]!r}")
+
+    # Nearest-neighbour agreement: does each text still retrieve the same neighbour?
+    same_order = int(np.sum(np.argsort(-(ref @ ref.T), axis=1)[:, 1] == np.argsort(-(got @ ref.T), axis=1)[:, 1]))
+    print(f"min cosine {cosines.min():.4f} / mean {cosines.mean():.4f} (tolerance {tolerance})")
+    print(f"nearest-neighbour agreement: {same_order}/{len(texts)}")
+    print(f"batch latency: torch {t_ref * 1000:.1f} ms, onnx-int8 {t_got * 1000:.1f} ms")
+    return bool(cosines.min() >= tolerance)
+
+
+def check_rerankers(query="how do I set resource limits for a systemd service", passages=CHECK_SAMPLES):
+    """The int8 reranker must order passages like the torch one; returns True if so"""
+    pairs = [(query, p) for p in passages]
+    ref = TorchReranker().predict(pairs)
+    got = OnnxReranker().predict(pairs)
+    same = list(np.argsort(-ref)) == list(np.argsort(-got))
+    print(f"reranker: max |score diff| {np.abs(ref - got).max():.3f}, same order: {same}")
+    return same
+
+
+def main(command, args=None):
+    args = sys.argv[1:] if args is None else args
+    if command == "export":
+        missing_only = "--if-missing" in args
+        if not (missing_only and onnx_available()):
+            export_onnx()
+        if not (missing_only and reranker_onnx_available()):
+            export_reranker_onnx()
+    elif command == "check":
+        if not onnx_available():
+            print(f"{ONNX_MODEL} missing, run ai-embed-export first")
+            sys.exit(1)
+        texts = [a for a in args if not a.startswith("--")] or CHECK_SAMPLES
+        ok = check_backends(texts)
+        if reranker_onnx_available():
+            ok = check_rerankers() and ok
+        sys.exit(0 if ok else 1)
@@ -0,0 +1,277 @@
+"""Isolated text extraction for ai-mem-daemon.
+
+Parsers (pypdf, python-docx) run in a small pool of worker subprocesses
+(`python extractor.py --worker`), never on the daemon's own threads:
+
+- every file gets a wall-clock timeout; a worker that overruns is killed and
+  replaced, so one pathological PDF can't stall indexing
+- workers run under an address-space rlimit, so a parser blow-up becomes a
+  MemoryError in the worker instead of an OOM kill of the daemon's cgroup
+- PDFs are read page by page and stop at MAX_PDF_PAGES / MAX_TEXT_CHARS;
+  PDF/DOCX files over MAX_FILE_BYTES are not opened at all
+- large plain-text files are read through mmap, only up to the char limit
+
+Files that fail are recorded in a Quarantine keyed by (path, mtime, size).
+A failure can be transient (a timeout under load, a file still being
+written), so a file is retried a few times with backoff before it is
+skipped until it actually changes.
+"""
+import json
+import os
+import selectors
+import subprocess
+import sys
+import threading
+import time
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+MAX_FILE_BYTES = int(os.environ.get("AI_MEM_MAX_FILE_BYTES", 64 * 1024 * 1024))
+MAX_TEXT_CHARS = 2_000_000
+MAX_PDF_PAGES = 500
+MMAP_THRESHOLD = 1024 * 1024
+QUARANTINE_RETRY = 600 # seconds before the first retry, doubled after each failure
+QUARANTINE_ATTEMPTS = 3 # then skipped until the file changes...
+QUARANTINE_TTL = 30 * 86400 # ...or this long has passed (parsers get fixed too)
+EXTRACT_TIMEOUT = float(os.environ.get("AI_MEM_EXTRACT_TIMEOUT", 30))
+WORKER_MEMORY_LIMIT = 512 * 1024 * 1024 # per worker, inside the ai-memory cgroup
+WORKER_MAX_JOBS = 200 # recycle workers, pypdf fragments the heap
+DEFAULT_WORKERS = 2
+
+
+class ExtractionFailed(Exception):
+    pass
+
+
+# --- PARSERS (worker side) ---
+def _extract_pdf(filepath, max_chars, max_pages):
+    from pypdf import PdfReader
+    reader = PdfReader(filepath)
+    parts, total, pages = [], 0, 0
+    for page in reader.pages: # pages are parsed lazily, one at a time
+        if pages >= max_pages or total >= max_chars: break
+        pages += 1
+        txt = page.extract_text()
+        if txt:
+            parts.append(txt)
+            total += len(txt) + 1
+    return "\n".join(parts)[:max_chars], {"pages": pages, "total_pages": len(reader.pages)}
+
+
+def _extract_docx(filepath, max_chars):
+    import docx
+    doc = docx.Document(filepath)
+    parts, total = [], 0
+    for para in doc.paragraphs:
+        if total >= max_chars: break
+        parts.append(para.text)
+        total += len(para.text) + 1
+    return "\n".join(parts)[:max_chars], {}
+
+
+def _extract_plain(filepath, max_chars):
+    size = os.path.getsize(filepath)
+    limit = max_chars * 4 # worst case UTF-8
+    if size > MMAP_THRESHOLD:
+        import mmap
+        with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data = mm[:limit]
+    else:
+        with open(filepath, 'rb') as f:
+            data = f.read(limit)
+    return data.decode('utf-8', errors='ignore')[:max_chars], {"mmap": size > MMAP_THRESHOLD}
+
+
+def extract_text(filepath, max_chars=MAX_TEXT_CHARS, max_pages=MAX_PDF_PAGES):
+    """Extract up to max_chars of text; raises on parser errors"""
+    lower = filepath.lower()
+    if lower.endswith(('.pdf', '.docx')) and os.path.getsize(filepath) > MAX_FILE_BYTES:
+        raise ExtractionFailed(f"file larger than {MAX_FILE_BYTES} bytes")
+    if lower.endswith('.pdf'):
+        return _extract_pdf(filepath, max_chars, max_pages)
+    if lower.endswith('.docx'):
+        return _extract_docx(filepath, max_chars)
+    return _extract_plain(filepath, max_chars)
+
+
+def _worker_main(memory_limit):
+    import resource
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    for line in sys.stdin:
+        job = json.loads(line)
+        started = time.perf_counter()
+        try:
+            text, info = extract_text(job["path"])
+            reply = {"ok": True, "text": text, "info": info}
+        except MemoryError:
+            reply = {"ok": False, "error": "memory limit exceeded"}
+        except BaseException as e:
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        reply["seconds"] = time.perf_counter() - started
+        sys.stdout.write(json.dumps(reply) + "\n")
+        sys.stdout.flush()
+
+
+# --- POOL (daemon side) ---
+class _Worker:
+    def __init__(self):
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker", str(WORKER_MEMORY_LIMIT)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0
+        )
+        self.jobs = 0
+        self.buffer = b""
+
+    def run(self, path, timeout):
+        self.jobs += 1
+        self.proc.stdin.write(json.dumps({"path": path}).encode("utf-8") + b"\n")
+        deadline = time.monotonic() + timeout
+        with selectors.DefaultSelector() as sel:
+            sel.register(self.proc.stdout, selectors.EVENT_READ)
+            while b"\n" not in self.buffer:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not sel.select(remaining):
+                    raise ExtractionFailed(f"timed out after {timeout:.0f}s")
+                chunk = os.read(self.proc.stdout.fileno(), 1 << 20)
+                if not chunk:
+                    raise ExtractionFailed(f"worker died (exit {self.proc.wait()})")
+                self.buffer += chunk
+        line, _, self.buffer = self.buffer.partition(b"\n")
+        return json.loads(line)
+
+    def kill(self):
+        try:
+            self.proc.kill()
+            self.proc.wait(timeout=5)
+        except Exception:
+            pass
+
+
+class ExtractionPool:
+    """Bounded pool of extraction subprocesses with per-file timeouts"""
+
+    def __init__(self, workers=DEFAULT_WORKERS, timeout=EXTRACT_TIMEOUT):
+        self.size = workers
+        self.timeout = timeout
+        self.idle = queue.Queue()
+        for _ in range(workers):
+            self.idle.put(None) # started lazily
+        self.threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="extract")
+
+    def extract(self, path):
+        """(text, info) for path; raises ExtractionFailed on timeout/crash/parser error"""
+        worker = self.idle.get()
+        try:
+            if worker is None or worker.proc.poll() is not None or worker.jobs >= WORKER_MAX_JOBS:
+                if worker: worker.kill()
+                worker = _Worker()
+            try:
+                reply = worker.run(path, self.timeout)
+            except (ExtractionFailed, OSError) as e:
+                worker.kill()
+                worker = None
+                raise ExtractionFailed(str(e))
+            if not reply.get("ok"):
+                raise ExtractionFailed(reply.get("error", "unknown error"))
+            info = reply.get("info", {})
+            info["seconds"] = reply.get("seconds", 0.0)
+            return reply["text"], info
+        finally:
+            self.idle.put(worker)
+
+    def extract_many(self, paths):
+        """Yield (path, text, info, error) as extractions finish, in parallel"""
+        futures = {self.threads.submit(self.extract, p): p for p in paths}
+        for fut in as_completed(futures):
+            path = futures[fut]
+            try:
+                text, info = fut.result()
+                yield path, text, info, None
+            except Exception as e:
+                yield path, None, None, e
+
+    def shutdown(self):
+        while not self.idle.empty():
+            worker = self.idle.get_nowait()
+            if worker: worker.kill()
+
+
+class Quarantine:
+    """Persistent skip list of files that failed extraction, keyed by (path, mtime, size)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.requeued = set() # (path, retry_at) already handed out by due()
+        try:
+            with open(path, "r") as f:
+                entries = json.load(f)
+        except Exception:
+            entries = {}
+        # Older files were keyed "path\0mtime"; those entries just get retried
+        self.entries = {k: v for k, v in entries.items() if isinstance(v, dict) and "size" in v}
+
+    def contains(self, filepath, mtime, size):
+        """Skip this version of the file for now?"""
+        entry = self.entries.get(filepath)
+        if entry is None or entry["mtime"] != mtime or entry["size"] != size:
+            return False # never failed, or changed since: try it
+        now = time.time()
+        if now - entry["since"] > QUARANTINE_TTL:
+            return False
+        return entry["attempts"] >= QUARANTINE_ATTEMPTS or now < entry["retry_at"]
+
+    def add(self, filepath, mtime, size, reason):
+        with self.lock:
+            entry = self.entries.get(filepath)
+            now = time.time()
+            if entry is None or entry["mtime"] != mtime or entry["size"] != size:
+                entry = {"mtime": mtime, "size": size, "since": now, "attempts": 0}
+            entry["attempts"] += 1
+            entry["retry_at"] = now + QUARANTINE_RETRY * 2 ** (entry["attempts"] - 1)
+            entry["reason"] = reason
+            self.entries[filepath] = entry
+            self._save()
+        return entry["attempts"] >= QUARANTINE_ATTEMPTS
+
+    def discard(self, filepath):
+        """Extracted fine after all"""
+        if filepath not in self.entries: return
+        with self.lock:
+            if self.entries.pop(filepath, None) is not None: self._save()
+
+    def due(self):
+        """Files whose next retry has come; each retry is handed out once"""
+        now = time.time()
+        with self.lock:
+            ready = [(p, e["retry_at"]) for p, e in self.entries.items()
+                     if e["attempts"] < QUARANTINE_ATTEMPTS and e["retry_at"] <= now]
+            ready = [r for r in ready if r not in self.requeued]
+            self.requeued.update(ready)
+        return [p for p, _ in ready]
+
+    def purge(self):
+        """Drop entries for deleted files and past QUARANTINE_TTL; returns how many"""
+        now = time.time()
+        with self.lock:
+            stale = [p for p, e in self.entries.items()
+                     if now - e["since"] > QUARANTINE_TTL or not os.path.exists(p)]
+            for p in stale:
+                del self.entries[p]
+            self.requeued = {r for r in self.requeued if r[0] in self.entries}
+            if stale: self._save()
+        return len(stale)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+if __name__ == "__main__" and len(sys.argv) > 2 and sys.argv[1] == "--worker":
+    _worker_main(int(sys.argv[2]))
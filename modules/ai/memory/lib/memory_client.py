@@ -0,0 +1,145 @@
+"""Local query protocol for ai-mem-daemon, and the ai-mem-* CLIs built on it.
+
+One request per connection: the client sends a JSON object terminated by a
+newline ({"op": "search" | "list" | "status" | "metrics" | "rebuild", ...}) and reads a single JSON
+line back ({"ok": true, ...} or {"ok": false, "error": "..."}).
+
+This module only uses the standard library, so the CLIs start instantly; the
+heavy imports (lancedb, the embedding model) only happen in direct mode,
+when the daemon isn't running.
+"""
+import json
+import os
+import socket
+import sys
+
+RUNTIME_DIR = os.environ.get("XDG_RUNTIME_DIR") or "/tmp"
+SOCKET_PATH = os.environ.get("AI_MEM_SOCKET", os.path.join(RUNTIME_DIR, f"ai-memory-{os.getuid()}.sock"))
+
+
+class DaemonUnavailable(Exception):
+    pass
+
+
+def request(payload, timeout=10.0):
+    """Send one request to the daemon and return the decoded response"""
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(SOCKET_PATH)
+    except OSError as e:
+        raise DaemonUnavailable(str(e))
+
+    with sock:
+        sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+        buf = b""
+        while not buf.endswith(b"\n"):
+            chunk = sock.recv(65536)
+            if not chunk: break
+            buf += chunk
+    response = json.loads(buf.decode("utf-8"))
+    if not response.get("ok"):
+        raise RuntimeError(response.get("error", "unknown daemon error"))
+    return response
+
+
+# --- DIRECT MODE (daemon down) ---
+def _direct(payload):
+    import lancedb
+    from memory_store import DB_PATH, SEARCH_COLUMNS, ContentStore, list_files, open_index
+
+    tbl, _ = open_index(lancedb.connect(DB_PATH))
+    op = payload["op"]
+    if op == "search":
+        os.environ["TOKENIZERS_PARALLELISM"] = "false"
+        from embed_service import EmbeddingClient
+        try:
+            query_vec = EmbeddingClient(priority="interactive", connect_wait=1.0).encode(payload["query"])
+        except OSError:
+            from embedder import load_embedder
+            query_vec = load_embedder().encode(payload["query"])
+        rows = tbl.search(query_vec).select(SEARCH_COLUMNS) \
+                  .limit(payload.get("limit", 5)).to_arrow().to_pylist()
+        return {"ok": True, "results": rows}
+    if op == "list":
+        rows = list_files(tbl, offset=payload.get("offset", 0), limit=payload.get("limit", 50))
+        return {"ok": True, "total": tbl.count_rows(), "files": rows}
+    if op == "status":
+        return {"ok": True, "daemon": "down", "rows": tbl.count_rows(), "content": ContentStore().stats()}
+    if op in ("metrics", "rebuild"):
+        raise RuntimeError(f"{op} needs ai-mem-daemon to be running")
+    raise ValueError(f"unknown op {op}")
+
+
+def query(payload):
+    """Ask the daemon; fall back to opening the index ourselves"""
+    try:
+        return request(payload)
+    except DaemonUnavailable:
+        print("(ai-mem-daemon not reachable, using direct mode)", file=sys.stderr)
+        return _direct(payload)
+
+
+# --- CLIs ---
+def _search(args):
+    if not args:
+        print("Usage: ai-mem-search 'your query'")
+        sys.exit(1)
+    query_text = args[0]
+    results = query({"op": "search", "query": query_text, "limit": 5})["results"]
+    if not results:
+        print("No results found.")
+        return
+    print(f"\n🔍 Search Results for: '{query_text}'\n")
+    for row in results:
+        print(f"📄 {row['filename']}")
+        print(f"📂 {row['path']}")
+        print("-" * 40)
+
+
+def _list(args):
+    # Usage: ai-mem-list [page] [page_size]
+    page = int(args[0]) if len(args) > 0 else 1
+    page_size = int(args[1]) if len(args) > 1 else 50
+    response = query({"op": "list", "offset": (page - 1) * page_size, "limit": page_size})
+    total = response["total"]
+    if total == 0:
+        print("Index is empty.")
+        return
+    pages = (total + page_size - 1) // page_size
+    print(f"Found {total} files in index (page {page}/{pages}):")
+    for row in response["files"]:
+        print(f"- {row['filename']} ({row['path']})")
+
+
+def _status(args):
+    response = query({"op": "status"})
+    response.pop("ok", None)
+    for key, value in response.items():
+        print(f"{key}: {value}")
+
+
+def _metrics(args):
+    # Usage: ai-mem-metrics [--json]   (default: Prometheus text format)
+    if "--json" in args:
+        print(json.dumps(query({"op": "metrics"})["metrics"], indent=2, default=str))
+    else:
+        sys.stdout.write(query({"op": "metrics", "format": "prometheus"})["text"])
+
+
+def _rebuild(args):
+    spec = query({"op": "rebuild"})["building"]
+    print(f"Rebuilding into index v{spec['version']}; the current index serves until it is done.")
+    print("Progress: ai-mem-status")
+
+
+COMMANDS = {"search": _search, "list": _list, "status": _status, "metrics": _metrics, "rebuild": _rebuild}
+
+
+def main(command, args=None):
+    args = sys.argv[1:] if args is None else args
+    try:
+        COMMANDS[command](args)
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
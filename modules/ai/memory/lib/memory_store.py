@@ -0,0 +1,204 @@
+"""Storage layout shared by ai-mem-daemon, the ai-mem-* CLIs and the brain.
+
+The vector table ("files") only holds what search needs: the vector plus
+small metadata columns. Document bodies live in a compressed content store
+addressed by content hash, and a separate "files_text" table carries the
+(capped) text for the BM25 indexes.
+
+Index builds are versioned. DB_PATH/current.json names the table pair that
+serves queries ("current") and, while one is running, the shadow build that
+will replace it ("building"). The daemon rebuilds into the shadow tables
+(new schema, new model, or on request) while the old pair keeps serving,
+then swaps the pointer with an atomic rename. Readers resolve the pointer
+on every request via open_index(), so nobody needs a restart.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+HOME_DIR = os.path.expanduser("~")
+DB_PATH = os.path.join(HOME_DIR, ".local/share/ai-memory-db")
+CONTENT_PATH = os.path.join(DB_PATH, "content.sqlite")
+POINTER_PATH = os.path.join(DB_PATH, "current.json")
+
+# Unversioned names: the layout before current.json existed
+FILES_TABLE = "files"
+TEXT_TABLE = "files_text"
+SCHEMA_VERSION = 3 # bump with FILES_COLUMNS / TEXT_COLUMNS
+
+FILES_COLUMNS = ["vector", "path", "filename", "ext", "last_mod", "content_hash"]
+TEXT_COLUMNS = ["path", "filename", "ext", "last_mod", "content_hash", "text"]
+FTS_COLUMNS = ("text", "filename")
+
+# Scalar indexes the daemon maintains: per-path deletes/updates and the
+# search filters below become index lookups instead of scans
+FILES_SCALAR_INDEXES = [("path", "BTREE"), ("filename", "BTREE"), ("ext", "BITMAP"), ("last_mod", "BTREE")]
+TEXT_SCALAR_INDEXES = [("path", "BTREE"), ("ext", "BITMAP"), ("last_mod", "BTREE")]
+
+# Columns each consumer actually reads (never the vector, never the body)
+SEARCH_COLUMNS = ["path", "filename", "content_hash"]
+LIST_COLUMNS = ["path", "filename", "last_mod"]
+
+# BM25 doesn't need the whole of a 500-page PDF
+LEXICAL_MAX_CHARS = 100_000
+
+
+def sql_str(value):
+    """Quote a string literal for LanceDB filter predicates"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def file_ext(path):
+    return os.path.splitext(path)[1].lower()
+
+
+def filter_sql(filters):
+    """LanceDB predicate for search filters, or None if there are none.
+
+    filters: {"folder": str | [str], "ext": str | [str],
+              "modified_after": epoch seconds, "modified_before": epoch seconds}
+    Works on both tables (they share path/ext/last_mod).
+    """
+    if not filters: return None
+    clauses = []
+    as_list = lambda v: [v] if isinstance(v, str) else list(v)
+    if filters.get("folder"):
+        folders = [os.path.expanduser(f).rstrip("/") + "/" for f in as_list(filters["folder"])]
+        clauses.append("(" + " OR ".join(f"starts_with(path, {sql_str(f)})" for f in folders) + ")")
+    if filters.get("ext"):
+        exts = ["." + e.lower().lstrip(".") for e in as_list(filters["ext"])]
+        clauses.append(f"ext IN ({', '.join(sql_str(e) for e in exts)})")
+    if filters.get("modified_after") is not None:
+        clauses.append(f"last_mod >= {float(filters['modified_after'])}")
+    if filters.get("modified_before") is not None:
+        clauses.append(f"last_mod < {float(filters['modified_before'])}")
+    return " AND ".join(clauses) or None
+
+
+def versioned_names(version):
+    return f"{FILES_TABLE}_v{version}", f"{TEXT_TABLE}_v{version}"
+
+
+_pointer_cache = {"mtime": None, "pointer": None}
+
+def read_pointer(path=POINTER_PATH):
+    """{"current": {...}, "building": {...} | None}, or None before the first build"""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    if _pointer_cache["mtime"] != mtime:
+        try:
+            with open(path, "r") as f:
+                _pointer_cache["pointer"] = json.load(f)
+            _pointer_cache["mtime"] = mtime
+        except (OSError, ValueError):
+            return _pointer_cache["pointer"]
+    return _pointer_cache["pointer"]
+
+
+def write_pointer(pointer, path=POINTER_PATH):
+    """Atomically replace the pointer (readers see the old or the new one, never half)"""
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(pointer, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def current_names():
+    """(files table, text table) currently serving queries"""
+    pointer = read_pointer()
+    current = (pointer or {}).get("current")
+    if current:
+        return current["files"], current["text"]
+    return FILES_TABLE, TEXT_TABLE
+
+
+def open_index(db):
+    """Open the serving table pair; cheap enough to call per request"""
+    files, text = current_names()
+    return db.open_table(files), db.open_table(text)
+
+
+def list_files(tbl, offset=0, limit=50, columns=LIST_COLUMNS):
+    """One page of index rows as a list of dicts (Arrow projection, no pandas)"""
+    query = tbl.search().select(columns).limit(limit)
+    if offset:
+        query = query.offset(offset)
+    return query.to_arrow().to_pylist()
+
+
+def scan_columns(tbl, columns):
+    """Every row, projected to the given columns, as an Arrow table"""
+    return tbl.search().select(columns).limit(max(tbl.count_rows(), 1)).to_arrow()
+
+
+class ContentStore:
+    """zlib-compressed document bodies in SQLite, keyed by content hash.
+
+    Reads go through SQLite's mmap I/O, and get() can stop decompressing once
+    it has the prefix the caller asked for, so pulling 1500 chars of LLM
+    context out of a huge document stays cheap. Identical bodies are stored
+    once.
+    """
+
+    MMAP_SIZE = 256 * 1024 * 1024
+
+    def __init__(self, path=CONTENT_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA mmap_size={self.MMAP_SIZE}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS content ("
+            "id TEXT PRIMARY KEY, body BLOB NOT NULL, raw_size INTEGER NOT NULL, stored REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def put(self, content_id, text):
+        raw = text.encode("utf-8", errors="ignore")
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO content (id, body, raw_size, stored) VALUES (?, ?, ?, ?)",
+                (content_id, zlib.compress(raw, 6), len(raw), time.time())
+            )
+            self.conn.commit()
+
+    def get(self, content_id, max_chars=None):
+        with self.lock:
+            row = self.conn.execute("SELECT body FROM content WHERE id = ?", (content_id,)).fetchone()
+        if row is None:
+            return None
+        if max_chars is None:
+            return zlib.decompress(row[0]).decode("utf-8", errors="ignore")
+        # UTF-8 is at most 4 bytes per char; only inflate what we need
+        raw = zlib.decompressobj().decompress(row[0], max_chars * 4)
+        return raw.decode("utf-8", errors="ignore")[:max_chars]
+
+    def contains(self, content_id):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM content WHERE id = ?", (content_id,)).fetchone() is not None
+
+    def prune(self, live_ids):
+        """Drop bodies no index row points at any more; returns the count removed"""
+        live_ids = set(live_ids)
+        with self.lock:
+            stored = [r[0] for r in self.conn.execute("SELECT id FROM content")]
+            dead = [(i,) for i in stored if i not in live_ids]
+            if dead:
+                self.conn.executemany("DELETE FROM content WHERE id = ?", dead)
+                self.conn.commit()
+        return len(dead)
+
+    def stats(self):
+        with self.lock:
+            count, raw, packed = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(LENGTH(body)), 0) FROM content"
+            ).fetchone()
+        return {"documents": count, "raw_bytes": raw, "stored_bytes": packed}
@@ -0,0 +1,184 @@
+"""In-process metrics for ai-mem-daemon: counters, gauges, histograms, rates.
+
+Everything lives in one Registry. snapshot() feeds the "metrics" op on the
+query socket (JSON), and prometheus() renders the same data in the
+Prometheus text exposition format, for `ai-mem-metrics` or a node-exporter
+textfile collector. Standard library only, like memory_client.
+"""
+import bisect
+import threading
+import time
+from collections import deque
+
+# Seconds; covers a cache-hit encode (~1 ms) up to a timed-out PDF (30 s)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Index freshness can be minutes to hours during a backfill
+LAG_BUCKETS = (0.5, 1, 2, 5, 10, 30, 60, 300, 900, 3600, 4 * 3600, 24 * 3600)
+
+
+def _labels(labels):
+    return ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bucket bound containing the q-quantile (coarse, like Prometheus)"""
+        if not self.count: return None
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank: return bound
+        return float("inf")
+
+    def snapshot(self):
+        return {"count": self.count, "sum": round(self.sum, 4),
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95)}
+
+
+class Meter:
+    """Events per second over a sliding window"""
+
+    def __init__(self, window=300):
+        self.window = window
+        self.events = deque() # (monotonic time, n)
+        self.total = 0
+
+    def mark(self, n=1):
+        self.events.append((time.monotonic(), n))
+        self.total += n
+
+    def rate(self):
+        now = time.monotonic()
+        while self.events and now - self.events[0][0] > self.window:
+            self.events.popleft()
+        if not self.events: return 0.0
+        span = max(now - self.events[0][0], 1.0)
+        return sum(n for _, n in self.events) / span
+
+
+class Registry:
+    def __init__(self, prefix="ai_mem"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.counters = {} # (name, labels) -> value
+        self.histograms = {} # (name, labels) -> Histogram
+        self.meters = {}
+        self.gauges = {} # name -> (callable returning a number or {label value: number}, label name)
+        self.help = {}
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def inc(self, name, n=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def time(self, name, **labels):
+        """with metrics.time("encode_seconds"): ..."""
+        registry = self
+        class _Timer:
+            def __enter__(self):
+                self.started = time.perf_counter()
+            def __exit__(self, *exc):
+                registry.observe(name, time.perf_counter() - self.started, **labels)
+        return _Timer()
+
+    def mark(self, name, n=1):
+        with self.lock:
+            meter = self.meters.get(name)
+            if meter is None:
+                meter = self.meters[name] = Meter()
+            meter.mark(n)
+
+    def rate(self, name):
+        with self.lock:
+            meter = self.meters.get(name)
+            return meter.rate() if meter else 0.0
+
+    def gauge(self, name, fn, label="key"):
+        self.gauges[name] = (fn, label)
+
+    def _read_gauges(self):
+        values = {}
+        for name, (fn, _) in self.gauges.items():
+            try:
+                values[name] = fn()
+            except Exception:
+                values[name] = None
+        return values
+
+    def snapshot(self):
+        """Nested dict for the JSON socket"""
+        out = {"gauges": self._read_gauges()}
+        with self.lock:
+            out["counters"] = {self._key(n, l): v for (n, l), v in self.counters.items()}
+            out["histograms"] = {self._key(n, l): h.snapshot() for (n, l), h in self.histograms.items()}
+            out["rates_per_s"] = {n: round(m.rate(), 3) for n, m in self.meters.items()}
+        return out
+
+    @staticmethod
+    def _key(name, labels):
+        return f"{name}{{{_labels(dict(labels))}}}" if labels else name
+
+    def prometheus(self):
+        """Prometheus text exposition format"""
+        lines = []
+        def header(name, kind):
+            full = f"{self.prefix}_{name}"
+            if name in self.help: lines.append(f"# HELP {full} {self.help[name]}")
+            lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        for name, value in sorted(self._read_gauges().items()):
+            if value is None: continue
+            full = header(name, "gauge")
+            if isinstance(value, dict):
+                label = self.gauges[name][1]
+                for label_value, v in sorted(value.items()):
+                    if v is not None: lines.append(f'{full}{{{label}="{label_value}"}} {v}')
+            else:
+                lines.append(f"{full} {value}")
+
+        with self.lock:
+            seen = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in seen:
+                    header(name, "counter"); seen.add(name)
+                lines.append(f"{self.prefix}_{name}{{{_labels(dict(labels))}}} {value}" if labels
+                             else f"{self.prefix}_{name} {value}")
+            for (name, labels), hist in sorted(self.histograms.items(), key=lambda kv: kv[0]):
+                if name not in seen:
+                    header(name, "histogram"); seen.add(name)
+                full = f"{self.prefix}_{name}"
+                cumulative = 0
+                for bound, n in zip(hist.buckets + (float("inf"),), hist.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{full}_bucket{{{_labels({**dict(labels), "le": le})}}} {cumulative}')
+                base = f"{{{_labels(dict(labels))}}}" if labels else ""
+                lines.append(f"{full}_sum{base} {hist.sum}")
+                lines.append(f"{full}_count{base} {hist.count}")
+            for name, meter in sorted(self.meters.items()):
+                full = header(f"{name}_per_second", "gauge")
+                lines.append(f"{full} {meter.rate()}")
+        return "\n".join(lines) + "\n"
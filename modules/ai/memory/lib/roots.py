@@ -0,0 +1,191 @@
+"""Which files ai-mem-daemon indexes: roots, extensions and ignore rules.
+
+Configured in ~/.config/ai-memory/roots.json (AI_MEM_CONFIG overrides):
+
+  {
+    "roots": [
+      {"path": "~/Documents"},
+      {"path": "~/src", "extensions": [".py", ".md", ".nix"], "exclude": ["vendor/"]}
+    ],
+    "exclude": ["*.log"],        extra patterns for every root
+    "gitignore": true,           also honour .gitignore files inside the roots
+    "poll_interval": 120         seconds, for subtrees over the inotify budget
+  }
+
+Patterns use gitignore syntax: "dir/" only matches directories, a pattern
+with a slash is anchored to its root (or .gitignore), "**" spans
+directories, "!" re-includes, and the last matching pattern wins. Without a
+config file the daemon indexes ~/Documents as before.
+"""
+import json
+import os
+import re
+
+HOME_DIR = os.path.expanduser("~")
+CONFIG_PATH = os.environ.get("AI_MEM_CONFIG", os.path.join(HOME_DIR, ".config/ai-memory/roots.json"))
+
+DEFAULT_EXTENSIONS = ('.txt', '.md', '.py', '.nix', '.pdf', '.docx')
+DEFAULT_EXCLUDES = [
+    ".*", "*~", "*.tmp", "*.swp",       # hidden files/dirs, editor droppings
+    "node_modules/", "__pycache__/", "*.egg-info/",
+    "venv/", "site-packages/",          # virtualenvs (.venv is hidden already)
+    "build/", "dist/", "target/", "result", "result-*",  # build outputs, nix-build links
+]
+DEFAULT_POLL_INTERVAL = 120
+
+
+def _translate(pattern):
+    """gitignore glob -> regex body (no anchors)"""
+    out, i = [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?"); i += 3; continue
+        if pattern.startswith("**", i):
+            out.append(".*"); i += 2; continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[" and "]" in pattern[i + 1:]:
+            end = pattern.index("]", i + 1)
+            body = pattern[i + 1:end]
+            out.append("[" + ("^" + body[1:] if body.startswith("!") else body) + "]")
+            i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """One ordered list of gitignore-style patterns, relative to one directory"""
+
+    def __init__(self, patterns):
+        self.rules = []
+        for raw in patterns:
+            pattern = raw.strip()
+            if not pattern or pattern.startswith("#"): continue
+            negate = pattern.startswith("!")
+            if negate: pattern = pattern[1:]
+            dir_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            anchored = "/" in pattern
+            body = _translate(pattern.lstrip("/"))
+            regex = re.compile(("^" if anchored else "^(?:.*/)?") + body + "$")
+            self.rules.append((regex, negate, dir_only))
+
+    def match(self, relpath, is_dir):
+        """True (ignore), False (re-included) or None (no pattern matched)"""
+        result = None
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir: continue
+            if regex.match(relpath):
+                result = not negate
+        return result
+
+    @classmethod
+    def from_file(cls, path):
+        try:
+            with open(path, "r", errors="ignore") as f:
+                return cls(f.read().splitlines())
+        except OSError:
+            return None
+
+
+class Root:
+    """One indexed directory tree with its extensions and ignore rules"""
+
+    def __init__(self, path, extensions=DEFAULT_EXTENSIONS, exclude=(), use_gitignore=True):
+        self.path = os.path.abspath(os.path.expanduser(path)).rstrip("/")
+        self.extensions = tuple(e.lower() for e in extensions)
+        self.rules = IgnoreRules(list(DEFAULT_EXCLUDES) + list(exclude))
+        self.use_gitignore = use_gitignore
+        self.gitignores = {} # dir -> (mtime, IgnoreRules | None)
+
+    def __repr__(self):
+        return f"Root({self.path!r})"
+
+    def contains(self, path):
+        return path == self.path or path.startswith(self.path + "/")
+
+    def _gitignore(self, directory):
+        path = os.path.join(directory, ".gitignore")
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            self.gitignores.pop(directory, None)
+            return None
+        cached = self.gitignores.get(directory)
+        if cached is None or cached[0] != mtime:
+            cached = self.gitignores[directory] = (mtime, IgnoreRules.from_file(path))
+        return cached[1]
+
+    def _entry_ignored(self, path, is_dir):
+        """Rules for this entry alone; callers make sure its parents aren't ignored"""
+        ignored = self.rules.match(os.path.relpath(path, self.path), is_dir)
+        if self.use_gitignore:
+            # Deeper .gitignore files override shallower ones
+            directory = os.path.dirname(path)
+            chain = []
+            while self.contains(directory):
+                chain.append(directory)
+                if directory == self.path: break
+                directory = os.path.dirname(directory)
+            for base in reversed(chain):
+                rules = self._gitignore(base)
+                if rules is None: continue
+                verdict = rules.match(os.path.relpath(path, base), is_dir)
+                if verdict is not None: ignored = verdict
+        return bool(ignored)
+
+    def is_ignored(self, path, is_dir=False):
+        """Full check for one path, including every parent directory"""
+        if path == self.path: return False
+        if not self.contains(path): return True
+        parts = os.path.relpath(path, self.path).split(os.sep)
+        current = self.path
+        for i, part in enumerate(parts):
+            current = os.path.join(current, part)
+            last = i == len(parts) - 1
+            if self._entry_ignored(current, is_dir if last else True):
+                return True
+        return False
+
+    def wants_file(self, path):
+        return path.lower().endswith(self.extensions) and not self.is_ignored(path)
+
+    def walk(self, top=None):
+        """(dirpath, indexable files) for every non-ignored directory under top"""
+        for dirpath, dirs, files in os.walk(top or self.path):
+            dirs[:] = [d for d in dirs if not self._entry_ignored(os.path.join(dirpath, d), True)]
+            yield dirpath, [os.path.join(dirpath, f) for f in files
+                            if f.lower().endswith(self.extensions)
+                            and not self._entry_ignored(os.path.join(dirpath, f), False)]
+
+
+def load_config(path=CONFIG_PATH):
+    """(roots, poll_interval) from the config file, or the ~/Documents default"""
+    try:
+        with open(path, "r") as f:
+            config = json.load(f)
+        print(f"⚙️ [Memory] Loaded roots from {path}", flush=True)
+    except FileNotFoundError:
+        config = {}
+    except Exception as e:
+        print(f"⚠️ [Memory] Bad config {path} ({e}), using defaults", flush=True)
+        config = {}
+
+    extra = config.get("exclude", [])
+    use_gitignore = config.get("gitignore", True)
+    entries = config.get("roots") or [{"path": os.path.join(HOME_DIR, "Documents")}]
+    roots = [Root(e["path"], e.get("extensions", DEFAULT_EXTENSIONS),
+                  extra + e.get("exclude", []), use_gitignore)
+             for e in entries]
+    return roots, config.get("poll_interval", DEFAULT_POLL_INTERVAL)
+
+
+def root_for(roots, path):
+    """Innermost root containing path (roots may nest)"""
+    matches = [r for r in roots if r.contains(path)]
+    return max(matches, key=lambda r: len(r.path)) if matches else None
@@ -0,0 +1,268 @@
+"""Activity-aware indexing scheduler for ai-mem-daemon.
+
+Files wait in a priority queue instead of being indexed in os.walk order:
+
+  LIVE      filesystem events (a note that was just saved)
+  RECENT    opened recently (recently-used.xbel) or modified in RECENT_WINDOW
+  BACKFILL  everything else, newest first
+
+LIVE work is always taken first and is never paused, so fresh edits become
+searchable within seconds even in the middle of a large backfill. Everything
+else runs in batches sized by a plan() over the current system state: load
+average per CPU, seconds since the last user input, and whether we run on
+battery. Under pressure the batch size shrinks, and at the limit backfill
+pauses until the machine is quiet again.
+"""
+import heapq
+import itertools
+import os
+import subprocess
+import threading
+import time
+from urllib.parse import unquote, urlparse
+
+from metrics import LAG_BUCKETS
+
+LIVE, RECENT, BACKFILL = 0, 1, 2
+TIER_NAMES = {LIVE: "live", RECENT: "recent", BACKFILL: "backfill"}
+
+RECENT_WINDOW = 7 * 86400
+RECENTLY_USED = os.path.join(os.path.expanduser("~"), ".local/share/recently-used.xbel")
+POWER_SUPPLY_DIR = "/sys/class/power_supply"
+
+MAX_BATCH = 32
+PAUSE_POLL = 10.0 # seconds between re-checks while paused
+PROBE_TTL = 5.0
+
+
+# --- SYSTEM PROBES ---
+def load_per_cpu():
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except OSError:
+        return 0.0
+
+
+def on_battery():
+    """True only if there is a battery and no mains adapter is online"""
+    try:
+        supplies = os.listdir(POWER_SUPPLY_DIR)
+    except OSError:
+        return False
+    has_battery = False
+    for name in supplies:
+        base = os.path.join(POWER_SUPPLY_DIR, name)
+        try:
+            with open(os.path.join(base, "type")) as f:
+                kind = f.read().strip()
+            if kind == "Mains":
+                with open(os.path.join(base, "online")) as f:
+                    if f.read().strip() == "1": return False
+            elif kind == "Battery":
+                has_battery = True
+        except OSError:
+            continue
+    return has_battery
+
+
+def user_idle_seconds():
+    """Seconds since the last keyboard/mouse input, or None if unknown.
+
+    Asks the session's org.freedesktop.ScreenSaver (KDE implements
+    GetSessionIdleTime), then logind's IdleHint for the user.
+    """
+    try:
+        out = subprocess.run(
+            ["busctl", "--user", "call", "org.freedesktop.ScreenSaver", "/ScreenSaver",
+             "org.freedesktop.ScreenSaver", "GetSessionIdleTime"],
+            capture_output=True, text=True, timeout=2
+        )
+        if out.returncode == 0 and out.stdout.startswith("u "):
+            return float(out.stdout.split()[1])
+    except (OSError, subprocess.SubprocessError, ValueError):
+        pass
+    try:
+        out = subprocess.run(
+            ["loginctl", "show-user", str(os.getuid()), "-p", "IdleHint", "-p", "IdleSinceHintMonotonic"],
+            capture_output=True, text=True, timeout=2
+        )
+        props = dict(line.split("=", 1) for line in out.stdout.splitlines() if "=" in line)
+        if props.get("IdleHint") == "no":
+            return 0.0
+        since = int(props.get("IdleSinceHintMonotonic", "0"))
+        if since:
+            return max(0.0, time.monotonic() - since / 1e6)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        pass
+    return None
+
+
+def recently_opened(path=RECENTLY_USED):
+    """Local files from the freedesktop recently-used list"""
+    import xml.etree.ElementTree as ET
+    try:
+        root = ET.parse(path).getroot()
+    except (OSError, ET.ParseError):
+        return set()
+    return {unquote(urlparse(b.get("href", "")).path)
+            for b in root.iter("bookmark") if b.get("href", "").startswith("file://")}
+
+
+class SystemActivity:
+    """Cached snapshot of the probes (they fork busctl, so not on every file)"""
+
+    def __init__(self, ttl=PROBE_TTL):
+        self.ttl = ttl
+        self.checked = 0.0
+        self.last = {}
+
+    def snapshot(self):
+        if time.monotonic() - self.checked > self.ttl:
+            self.last = {"load_per_cpu": round(load_per_cpu(), 2),
+                         "user_idle_s": user_idle_seconds(),
+                         "on_battery": on_battery()}
+            self.checked = time.monotonic()
+        return self.last
+
+
+def plan(state):
+    """(batch_size, reason) for non-live work; batch_size 0 means pause"""
+    load, idle = state["load_per_cpu"], state["user_idle_s"]
+    if state["on_battery"]:
+        return 0, "on battery"
+    if load > 1.0:
+        return 0, f"load {load:.2f}/cpu"
+    if load > 0.6:
+        return 1, f"load {load:.2f}/cpu"
+    if idle is not None and idle < 30:
+        return 2, "user active"
+    if idle is not None and idle > 300:
+        return MAX_BATCH, "user idle"
+    return 8, "normal"
+
+
+# --- SCHEDULER ---
+class IndexScheduler:
+    """Priority queue of paths feeding process(paths) on one worker thread"""
+
+    def __init__(self, process, activity=None, metrics=None):
+        self.process = process
+        self.activity = activity or SystemActivity()
+        self.metrics = metrics
+        self.cond = threading.Condition()
+        self.heap = []
+        self.entries = {} # path -> current heap key, stale heap items are skipped
+        self.queued_at = {} # path -> first push, for the freshness lag
+        self.seq = itertools.count()
+        self.state = {"batch": 0, "reason": "starting", "processed": 0, "batches": 0}
+        self.busy = False
+
+    def _key(self, tier, mtime):
+        return (tier, -mtime, next(self.seq))
+
+    def push(self, path, tier=LIVE, mtime=None):
+        if mtime is None:
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                mtime = time.time()
+        key = self._key(tier, mtime)
+        with self.cond:
+            current = self.entries.get(path)
+            if current is not None and current[:2] <= key[:2]:
+                return # already queued at least as urgently
+            self.entries[path] = key
+            self.queued_at.setdefault(path, time.monotonic())
+            heapq.heappush(self.heap, (key, path))
+            self.cond.notify()
+
+    def push_scan(self, paths):
+        """Queue a startup scan: recently opened/modified files first"""
+        opened = recently_opened()
+        cutoff = time.time() - RECENT_WINDOW
+        for path in paths:
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            self.push(path, RECENT if path in opened or mtime > cutoff else BACKFILL, mtime)
+
+    def _pop(self, limit, live_only=False):
+        """Up to limit paths, most urgent first (lock held)"""
+        batch = []
+        while self.heap and len(batch) < limit:
+            key, path = self.heap[0]
+            if self.entries.get(path) != key:
+                heapq.heappop(self.heap) # superseded
+                continue
+            if live_only and key[0] != LIVE:
+                break
+            heapq.heappop(self.heap)
+            del self.entries[path]
+            batch.append((path, key[0], self.queued_at.pop(path, time.monotonic())))
+        return batch
+
+    def _next_batch(self):
+        with self.cond:
+            while True:
+                while not self.entries:
+                    self.state.update(batch=0, reason="idle")
+                    self.cond.wait()
+                live = self._pop(MAX_BATCH, live_only=True)
+                if live:
+                    self.busy = True # same step as the pop, so drained() never sees neither
+                    return live
+                size, reason = plan(self.activity.snapshot())
+                self.state.update(batch=size, reason=reason)
+                if size:
+                    batch = self._pop(size)
+                    if batch:
+                        self.busy = True
+                        return batch
+                self.cond.wait(PAUSE_POLL) # a LIVE push wakes us up early
+
+    def _run(self):
+        while True:
+            batch = self._next_batch() # marks us busy
+            try:
+                self.process([path for path, _, _ in batch])
+            except Exception as e:
+                print(f"⚠️ [Memory] Index batch failed: {e}", flush=True)
+            finally:
+                with self.cond:
+                    self.busy = False
+            self.state["processed"] += len(batch)
+            self.state["batches"] += 1
+            if self.metrics:
+                done = time.monotonic()
+                self.metrics.mark("files", len(batch))
+                self.metrics.observe("batch_size", len(batch), buckets=(1, 2, 4, 8, 16, 32))
+                for _, tier, queued in batch:
+                    self.metrics.observe("index_lag_seconds", done - queued, buckets=LAG_BUCKETS,
+                                         tier=TIER_NAMES[tier])
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True, name="index-scheduler").start()
+
+    def pending(self):
+        with self.cond:
+            return len(self.entries)
+
+    def depth(self):
+        with self.cond:
+            by_tier = {name: 0 for name in TIER_NAMES.values()}
+            for key in self.entries.values():
+                by_tier[TIER_NAMES[key[0]]] += 1
+        return by_tier
+
+    def oldest_pending_seconds(self):
+        with self.cond:
+            return time.monotonic() - min(self.queued_at.values()) if self.queued_at else 0.0
+
+    def drained(self):
+        """Nothing queued and no batch in flight (one look under the lock)"""
+        with self.cond:
+            return not self.busy and not self.entries
+
+    def status(self):
+        return {"queued": self.depth(), **self.state, "system": self.activity.last}
@@ -0,0 +1,259 @@
+"""Brute-force vector search over a memory-mapped float16 matrix.
+
+For a personal corpus of a few thousand files, one matrix-vector product is
+cheaper than LanceDB's query planning plus Arrow conversion. ai-mem-daemon
+keeps, per index version:
+
+  matrix_vN.json        sidecar: dim, row count, path/filename/hash per row
+  matrix_vN.<gen>.f16   row-major float16 vectors, append-only
+
+Changed files get a new row at the end and their old row becomes a tombstone
+(path None), so rows a reader has already mapped never change under it. When
+a third of the rows are tombstones the daemon compacts into a new generation
+file and the sidecar (replaced atomically) points at it. Above
+MATRIX_MAX_ROWS the matrix is not kept and readers use LanceDB instead.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+from memory_store import DB_PATH, read_pointer
+
+MATRIX_MAX_ROWS = int(os.environ.get("AI_MEM_MATRIX_MAX_ROWS", "20000"))
+COMPACT_FRACTION = 1 / 3
+
+
+def sidecar_path(version, db_path=DB_PATH):
+    return os.path.join(db_path, f"matrix_v{version}.json")
+
+
+def remove_matrices(keep_versions, db_path=DB_PATH):
+    """Delete matrix files of index versions that no longer exist"""
+    removed = 0
+    for name in os.listdir(db_path):
+        if not name.startswith("matrix_v"): continue
+        try:
+            version = int(name[len("matrix_v"):].split(".")[0])
+        except ValueError:
+            continue
+        if version not in keep_versions:
+            os.unlink(os.path.join(db_path, name))
+            removed += 1
+    return removed
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class MatrixWriter:
+    """The daemon's side: mirrors one index version's vectors into the matrix"""
+
+    def __init__(self, version, dim, max_rows=MATRIX_MAX_ROWS, db_path=DB_PATH):
+        self.version, self.dim, self.max_rows, self.db_path = version, dim, max_rows, db_path
+        self.meta_path = sidecar_path(version, db_path)
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.enabled = True
+        self.meta = None
+        self.index = {} # path -> row
+        try:
+            with open(self.meta_path, "r") as f:
+                meta = json.load(f)
+            if meta.get("dim") == dim and os.path.exists(self._data_path(meta["generation"])):
+                self._adopt(meta)
+        except (OSError, ValueError, KeyError):
+            pass
+        if self.meta is None:
+            self._adopt(self._empty(0))
+
+    def _data_path(self, generation):
+        return os.path.join(self.db_path, f"matrix_v{self.version}.{generation}.f16")
+
+    def _empty(self, generation):
+        return {"version": self.version, "dim": self.dim, "generation": generation,
+                "data": os.path.basename(self._data_path(generation)),
+                "rows": 0, "paths": [], "filenames": [], "hashes": []}
+
+    def _adopt(self, meta):
+        self.meta = meta
+        self.index = {p: i for i, p in enumerate(meta["paths"]) if p is not None}
+        # Rows appended after the last flush are garbage: cut them off
+        with open(self._data_path(meta["generation"]), "ab") as f:
+            f.truncate(meta["rows"] * self.dim * 2)
+
+    def live(self):
+        """{path: content_hash} for comparing against the table"""
+        with self.lock:
+            return {p: self.meta["hashes"][i] for p, i in self.index.items()}
+
+    # --- WRITES (buffered until flush) ---
+    def _append(self, rows):
+        """rows: [(path, filename, content_hash, vector)] (lock held)"""
+        if not rows: return
+        block = np.vstack([_normalize(v) for _, _, _, v in rows]).astype(np.float16)
+        with open(self._data_path(self.meta["generation"]), "ab") as f:
+            f.write(block.tobytes())
+        for path, filename, content_hash, _ in rows:
+            self._tombstone(path)
+            self.index[path] = self.meta["rows"]
+            self.meta["paths"].append(path)
+            self.meta["filenames"].append(filename)
+            self.meta["hashes"].append(content_hash)
+            self.meta["rows"] += 1
+        self.dirty = True
+
+    def _tombstone(self, path):
+        row = self.index.pop(path, None)
+        if row is not None:
+            self.meta["paths"][row] = None
+            self.dirty = True
+
+    def load(self, rows):
+        """Rebuild from scratch out of table rows (dicts with vector/path/filename/content_hash)"""
+        rows = [(r["path"], r["filename"], r["content_hash"], r["vector"]) for r in rows]
+        with self.lock:
+            if len(rows) > self.max_rows:
+                self._disable()
+                return
+            self.enabled = True
+            old = self._data_path(self.meta["generation"])
+            self._adopt(self._empty(self.meta["generation"] + 1))
+            self._append(rows)
+            self.dirty = True
+            self._flush()
+            if os.path.exists(old): os.unlink(old)
+
+    def put(self, path, filename, content_hash, vector):
+        with self.lock:
+            if not self.enabled: return
+            self._append([(path, filename, content_hash, vector)])
+            if len(self.index) > self.max_rows:
+                self._disable()
+
+    def remove(self, path):
+        with self.lock:
+            self._tombstone(path)
+
+    def rename(self, src, dest, filename):
+        with self.lock:
+            row = self.index.pop(src, None)
+            if row is None: return
+            self._tombstone(dest)
+            self.meta["paths"][row] = dest
+            self.meta["filenames"][row] = filename
+            self.index[dest] = row
+            self.dirty = True
+
+    def _disable(self):
+        """Too big for brute force: remove the files, readers fall back to LanceDB"""
+        self.enabled = False
+        self.dirty = False
+        self.index = {}
+        for name in os.listdir(self.db_path):
+            if name.startswith(f"matrix_v{self.version}."):
+                os.unlink(os.path.join(self.db_path, name))
+        print(f"📐 [Memory] Over {self.max_rows} files, vector matrix disabled (LanceDB search only)", flush=True)
+
+    # --- PUBLISH ---
+    def _compact(self):
+        """Copy live rows into a new generation file (lock held)"""
+        old_meta = self.meta
+        source = np.memmap(self._data_path(old_meta["generation"]), dtype=np.float16, mode="r",
+                           shape=(old_meta["rows"], self.dim))
+        keep = [i for i, p in enumerate(old_meta["paths"]) if p is not None]
+        meta = self._empty(old_meta["generation"] + 1)
+        with open(self._data_path(meta["generation"]), "wb") as f:
+            f.write(np.ascontiguousarray(source[keep]).tobytes())
+        for key in ("paths", "filenames", "hashes"):
+            meta[key] = [old_meta[key][i] for i in keep]
+        meta["rows"] = len(keep)
+        del source
+        self._adopt(meta)
+        return self._data_path(old_meta["generation"])
+
+    def _flush(self):
+        stale = None
+        tombstones = self.meta["rows"] - len(self.index)
+        if self.meta["rows"] and tombstones > self.meta["rows"] * COMPACT_FRACTION:
+            stale = self._compact()
+        with open(self._data_path(self.meta["generation"]), "ab") as f:
+            os.fsync(f.fileno())
+        tmp = f"{self.meta_path}.tmp-{os.getpid()}"
+        with open(tmp, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self.meta_path)
+        self.dirty = False
+        # Readers that mapped the old generation keep it alive until they're done
+        if stale: os.unlink(stale)
+
+    def flush(self):
+        """Publish pending changes to readers"""
+        with self.lock:
+            if self.enabled and self.dirty:
+                self._flush()
+
+
+class MatrixReader:
+    """The brain's side: cached float32 copy of the serving version's matrix.
+
+    numpy has no BLAS path for float16, so rows are upcast once (and only
+    the appended tail when the daemon adds files) instead of per query.
+    """
+
+    def __init__(self, max_rows=MATRIX_MAX_ROWS, db_path=DB_PATH):
+        self.max_rows, self.db_path = max_rows, db_path
+        self.lock = threading.Lock()
+        self.key = None # (sidecar path, mtime_ns)
+        self.state = None # (meta, float32 matrix, live row mask)
+
+    def _load(self):
+        current = (read_pointer() or {}).get("current")
+        path = sidecar_path(current["version"] if current else 0, self.db_path)
+        try:
+            key = (path, os.stat(path).st_mtime_ns)
+        except OSError:
+            self.key = self.state = None
+            return None
+        with self.lock:
+            if key == self.key: return self.state
+            with open(path, "r") as f:
+                meta = json.load(f)
+            rows, dim = meta["rows"], meta["dim"]
+            if rows > self.max_rows * 2: # tombstones included
+                self.key, self.state = key, None
+                return None
+            data = np.memmap(os.path.join(self.db_path, meta["data"]), dtype=np.float16, mode="r",
+                             shape=(rows, dim)) if rows else np.zeros((0, dim), dtype=np.float16)
+            old = self.state
+            if old and old[0]["data"] == meta["data"] and old[0]["rows"] <= rows:
+                # Append-only within a generation: upcast just the new tail
+                matrix = np.vstack([old[1], data[old[0]["rows"]:].astype(np.float32)])
+            else:
+                matrix = np.asarray(data, dtype=np.float32)
+            live = np.array([p is not None for p in meta["paths"]], dtype=bool)
+            self.key, self.state = key, (meta, matrix, live)
+            return self.state
+
+    def search(self, query_vec, limit):
+        """Rows like a LanceDB vector search (path, filename, content_hash,
+        _distance), or None when there is no usable matrix"""
+        try:
+            state = self._load()
+        except (OSError, ValueError, KeyError):
+            return None
+        if state is None: return None
+        meta, matrix, live = state
+        if not live.any(): return []
+        scores = matrix @ _normalize(query_vec)
+        scores[~live] = -np.inf
+        k = min(limit, int(live.sum()))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        # Same metric as LanceDB's default L2 on unit vectors
+        return [{"path": meta["paths"][i], "filename": meta["filenames"][i],
+                 "content_hash": meta["hashes"][i], "_distance": float(2.0 - 2.0 * scores[i])}
+                for i in top]
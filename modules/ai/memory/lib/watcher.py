@@ -0,0 +1,224 @@
+"""Filesystem watching for ai-mem-daemon within the inotify watch budget.
+
+watchdog's recursive observer puts a watch on every directory under a root,
+node_modules and build trees included, and each watched directory uses one
+of the user's fs.inotify.max_user_watches (shared with the IDE, the file
+manager, Dropbox...). Instead we use one inotify fd and only watch
+directories the root's ignore rules keep. Subtrees that don't fit in our
+share of the budget are polled every poll_interval seconds instead.
+"""
+import ctypes
+import ctypes.util
+import os
+import struct
+import threading
+import time
+
+from roots import root_for
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF | IN_ONLYDIR
+EVENT_HEADER = struct.Struct("iIII") # wd, mask, cookie, name length
+
+MAX_USER_WATCHES = "/proc/sys/fs/inotify/max_user_watches"
+BUDGET_FRACTION = float(os.environ.get("AI_MEM_INOTIFY_FRACTION", "0.5"))
+BUDGET_RESERVE = 1024 # always leave this many for everyone else
+MOVE_PAIR_WINDOW = 1.0
+
+
+def _watches_in_use():
+    """inotify watches held by this user's other processes (best effort)"""
+    used, uid, me = 0, os.getuid(), os.getpid()
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit() or int(pid) == me: continue
+        try:
+            if os.stat(f"/proc/{pid}").st_uid != uid: continue
+            for fd in os.listdir(f"/proc/{pid}/fd"):
+                if os.readlink(f"/proc/{pid}/fd/{fd}") != "anon_inode:inotify": continue
+                with open(f"/proc/{pid}/fdinfo/{fd}") as f:
+                    used += sum(1 for line in f if line.startswith("inotify wd:"))
+        except OSError:
+            continue
+    return used
+
+
+def inotify_budget():
+    """How many directories we may watch; (budget, limit, used by others)"""
+    try:
+        with open(MAX_USER_WATCHES) as f:
+            limit = int(f.read())
+    except (OSError, ValueError):
+        limit = 8192
+    used = _watches_in_use()
+    return max(0, min(int(limit * BUDGET_FRACTION), limit - used - BUDGET_RESERVE)), limit, used
+
+
+class Watcher:
+    """inotify for what fits, mtime polling for the rest.
+
+    Callbacks (called from the watcher threads):
+      on_change(path)           a wanted file was written or appeared
+      on_move(src, dest)        a file was renamed inside the roots
+      on_rescan()               the kernel queue overflowed, events were lost
+      is_stale(path, mtime)     polling: does this file need indexing?
+    """
+
+    def __init__(self, roots, on_change, on_move, on_rescan, is_stale, poll_interval=120):
+        self.roots = roots
+        self.on_change, self.on_move, self.on_rescan, self.is_stale = on_change, on_move, on_rescan, is_stale
+        self.poll_interval = poll_interval
+        self.budget, self.limit, self.used_by_others = inotify_budget()
+
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.lock = threading.Lock()
+        self.wds = {} # wd -> directory
+        self.dirs = {} # directory -> wd
+        self.polled = [] # (root, subtree) over budget
+        self.moves = {} # cookie -> (src path, is_dir, time)
+
+    # --- WATCH SET ---
+    def _add(self, directory):
+        if len(self.dirs) >= self.budget: return False
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            return False # ENOSPC (budget raced), EACCES, vanished
+        with self.lock:
+            self.wds[wd] = directory
+            self.dirs[directory] = wd
+        return True
+
+    def assign(self, root, directories):
+        """Watch a root's (already filtered) directories, smallest subtrees
+        first; subtrees that don't fit are polled"""
+        self._add(root.path)
+        subtrees = {}
+        for d in directories:
+            if d == root.path: continue
+            top = os.path.join(root.path, os.path.relpath(d, root.path).split(os.sep)[0])
+            subtrees.setdefault(top, []).append(d)
+        for top, dirs in sorted(subtrees.items(), key=lambda kv: len(kv[1])):
+            if len(self.dirs) + len(dirs) <= self.budget:
+                for d in dirs: self._add(d)
+            else:
+                self.polled.append((root, top))
+        if self.polled:
+            print(f"⚠️ [Memory] inotify budget {self.budget} reached, polling "
+                  f"{len(self.polled)} subtree(s) every {self.poll_interval}s", flush=True)
+
+    def _watch_new_tree(self, root, top):
+        """A directory appeared: watch it (if possible) and report its files"""
+        fits = True
+        for dirpath, files in root.walk(top):
+            if fits and not self._add(dirpath):
+                fits = False
+                self.polled.append((root, dirpath))
+            for f in files: self.on_change(f)
+
+    def _rename_tree(self, src, dest):
+        """A watched directory was renamed: its watches move with it"""
+        inside = lambda d: d == src or d.startswith(src + "/")
+        with self.lock:
+            for d in [d for d in self.dirs if inside(d)]:
+                wd = self.dirs.pop(d)
+                moved = dest + d[len(src):]
+                self.dirs[moved] = wd
+                self.wds[wd] = moved
+            self.polled = [(r, dest + top[len(src):] if inside(top) else top) for r, top in self.polled]
+
+    # --- EVENTS ---
+    def _handle(self, wd, mask, cookie, name):
+        if mask & IN_Q_OVERFLOW:
+            print("⚠️ [Memory] inotify queue overflowed, rescanning", flush=True)
+            self.on_rescan()
+            return
+        if mask & IN_IGNORED:
+            with self.lock:
+                directory = self.wds.pop(wd, None)
+                if directory: self.dirs.pop(directory, None)
+            return
+        directory = self.wds.get(wd)
+        if directory is None or not name: return
+        path = os.path.join(directory, name)
+        is_dir = bool(mask & IN_ISDIR)
+        root = root_for(self.roots, path)
+        if root is None: return
+
+        if mask & IN_MOVED_FROM:
+            self.moves[cookie] = (path, is_dir, time.monotonic())
+            return
+        if mask & IN_MOVED_TO:
+            src = self.moves.pop(cookie, None)
+            if not is_dir:
+                # on_move also drops the old rows when the new name isn't wanted
+                if src: self.on_move(src[0], path)
+                elif root.wants_file(path): self.on_change(path)
+            elif root.is_ignored(path, True):
+                return
+            elif src:
+                self._rename_tree(src[0], path)
+                for _, files in root.walk(path):
+                    for f in files: self.on_move(src[0] + f[len(path):], f)
+            else:
+                self._watch_new_tree(root, path)
+            return
+        if is_dir and mask & IN_CREATE:
+            if not root.is_ignored(path, True): self._watch_new_tree(root, path)
+            return
+        if not is_dir and mask & IN_CLOSE_WRITE and root.wants_file(path):
+            self.on_change(path)
+
+    def _read_loop(self):
+        while True:
+            try:
+                data = os.read(self.fd, 256 * 1024)
+            except OSError as e:
+                print(f"⚠️ [Memory] inotify read failed: {e}", flush=True)
+                time.sleep(1)
+                continue
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                try:
+                    self._handle(wd, mask, cookie, name)
+                except Exception as e:
+                    print(f"⚠️ [Memory] Watch event failed: {e}", flush=True)
+            # Unpaired MOVED_FROM: the file left the watched area
+            now = time.monotonic()
+            for cookie in [c for c, m in self.moves.items() if now - m[2] > MOVE_PAIR_WINDOW]:
+                del self.moves[cookie]
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(self.poll_interval)
+            for root, top in list(self.polled):
+                for _, files in root.walk(top):
+                    for f in files:
+                        try:
+                            if self.is_stale(f, os.path.getmtime(f)): self.on_change(f)
+                        except OSError:
+                            continue
+
+    def start(self):
+        threading.Thread(target=self._read_loop, daemon=True, name="inotify").start()
+        threading.Thread(target=self._poll_loop, daemon=True, name="poller").start()
+
+    def status(self):
+        return {"inotify_watches": len(self.dirs), "inotify_budget": self.budget,
+                "max_user_watches": self.limit, "watches_used_elsewhere": self.used_by_others,
+                "polled_subtrees": [top for _, top in self.polled]}
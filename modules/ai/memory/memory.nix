@@ -0,0 +1,144 @@
+{ config, pkgs, lib, ... }:
+
+let
+  memoryPython = pkgs.python3.withPackages (ps: with ps; [
+    lancedb
+    sentence-transformers
+    pandas
+    numpy
+    pyarrow
+    pypdf
+    python-docx
+    onnxruntime # int8 embedding backend (lib/embedder.py)
+    tokenizers
+  ]);
+
+  # Shared index layout / content store (also used by the brain)
+  memoryLib = ./lib;
+
+  # --- INDEXER DAEMON ---
+  indexerScript = pkgs.writeScriptBin "ai-mem-daemon" ''
+    #!${memoryPython}/bin/python
+    import sys; sys.path.insert(0, "${memoryLib}")
+    ${builtins.readFile ./memory.py}
+  '';
+
+  # --- EMBEDDING BACKEND TOOLS ---
+  # Export MiniLM to int8 ONNX once, then compare it against the torch backend
+  embedExportScript = pkgs.writeScriptBin "ai-embed-export" ''
+    #!${memoryPython}/bin/python
+    import sys; sys.path.insert(0, "${memoryLib}")
+    from embedder import main; main("export")
+  '';
+
+  embedCheckScript = pkgs.writeScriptBin "ai-embed-check" ''
+    #!${memoryPython}/bin/python
+    import sys; sys.path.insert(0, "${memoryLib}")
+    from embedder import main; main("check")
+  '';
+
+  # --- SHARED EMBEDDING SERVICE ---
+  embedServiceScript = pkgs.writeScriptBin "ai-embed-service" ''
+    #!${memoryPython}/bin/python
+    import sys; sys.path.insert(0, "${memoryLib}")
+    from embed_service import serve; serve()
+  '';
+
+  # --- CLIs (thin clients of the daemon's query socket) ---
+  searchScript = pkgs.writeScriptBin "ai-mem-search" ''
+    #!${memoryPython}/bin/python
+    import sys; sys.path.insert(0, "${memoryLib}")
+    from memory_client import main; main("search")
+  '';
+
+  statusScript = pkgs.writeScriptBin "ai-mem-status" ''
+    #!${pkgs.bash}/bin/bash
+    echo "=== 1. Service Status ==="
+    systemctl --user status ai-memory --no-pager
+    
+    echo -e "\n=== 2. Recent Logs ==="
+    journalctl --user -u ai-memory -n 20 --no-pager
+    
+    echo -e "\n=== 3. Documents Folder Content ==="
+    ls -R ~/Documents 2>/dev/null || echo "No Documents folder found"
+    
+    echo -e "\n=== 4. Index Status ==="
+    ${memoryPython}/bin/python -c "import sys; sys.path.insert(0, '${memoryLib}'); from memory_client import main; main('status')"
+
+    echo -e "\n=== 5. Indexer Metrics ==="
+    ${memoryPython}/bin/python -c "import sys; sys.path.insert(0, '${memoryLib}'); from memory_client import main; main('metrics', ['--json'])"
+
+    echo -e "\n=== 6. Index Content (first page) ==="
+    ${memoryPython}/bin/python -c "import sys; sys.path.insert(0, '${memoryLib}'); from memory_client import main; main('list', ['1', '20'])"
+  '';
+
+  # Prometheus text format, e.g. for a node-exporter textfile collector
+  metricsScript = pkgs.writeScriptBin "ai-mem-metrics" ''
+    #!${memoryPython}/bin/python
+    import sys; sys.path.insert(0, "${memoryLib}")
+    from memory_client import main; main("metrics")
+  '';
+
+  # Re-index into a shadow table while the current one keeps serving
+  rebuildScript = pkgs.writeScriptBin "ai-mem-rebuild" ''
+    #!${memoryPython}/bin/python
+    import sys; sys.path.insert(0, "${memoryLib}")
+    from memory_client import main; main("rebuild")
+  '';
+
+  listScript = pkgs.writeScriptBin "ai-mem-list" ''
+    #!${memoryPython}/bin/python
+    import sys; sys.path.insert(0, "${memoryLib}")
+    from memory_client import main; main("list")
+  '';
+
+in
+{
+  environment.systemPackages = [ indexerScript searchScript listScript statusScript metricsScript rebuildScript embedExportScript embedCheckScript ];
+
+  # One MiniLM for the whole system. Not idle-scheduled: the brain's interactive
+  # queries go through it, and indexing is held back by its own queue priority.
+  systemd.user.services.ai-embed = {
+    enable = true;
+    description = "OmniOS Embedding Service";
+    wantedBy = [ "graphical-session.target" ];
+    partOf = [ "graphical-session.target" ];
+    environment = { PYTHONUNBUFFERED = "1"; AI_EMBED_BACKEND = "auto"; };
+    serviceConfig = {
+      # One-off torch export in a short-lived process; the service itself then runs onnx-int8
+      ExecStartPre = "-${embedExportScript}/bin/ai-embed-export --if-missing";
+      TimeoutStartSec = 600;
+      ExecStart = "${embedServiceScript}/bin/ai-embed-service";
+      Restart = "always";
+      RestartSec = 5;
+      # --- RESOURCE LIMITS ---
+      CPUQuota = "100%";
+      MemoryHigh = "768M";
+      MemoryMax = "1024M";
+      Nice = 5;
+    };
+  };
+
+  systemd.user.services.ai-memory = {
+    enable = true; # RE-ENABLED
+    description = "OmniOS Semantic Memory Service";
+    wantedBy = [ "graphical-session.target" ];
+    partOf = [ "graphical-session.target" ];
+    wants = [ "ai-embed.service" ];
+    after = [ "ai-embed.service" ];
+    environment = { PYTHONUNBUFFERED = "1"; };
+    serviceConfig = {
+      ExecStart = "${indexerScript}/bin/ai-mem-daemon";
+      Restart = "always";
+      RestartSec = 5;
+      # --- RESOURCE LIMITS ---
+      CPUQuota = "20%";
+      MemoryHigh = "1024M";
+      MemoryMax = "1536M";
+      Nice = 19;
+      CPUSchedulingPolicy = "idle";
+      IOSchedulingClass = "idle";
+      IOSchedulingPriority = 7;
+    };
+  };
+}
\ No newline at end of file
@@ -0,0 +1,673 @@
+import sys
+import time
+import os
+import hashlib
+import sqlite3
+import threading
+import json
+import socketserver
+
+sys.stdout.reconfigure(line_buffering=True)
+
+print("🚀 [INIT] Script starting...", flush=True)
+
+import numpy as np
+import lancedb
+from memory_store import (DB_PATH, FILES_TABLE, TEXT_TABLE, FILES_COLUMNS, TEXT_COLUMNS,
+                          FILES_SCALAR_INDEXES, TEXT_SCALAR_INDEXES, file_ext, FTS_COLUMNS, SEARCH_COLUMNS, LEXICAL_MAX_CHARS, SCHEMA_VERSION, ContentStore,
+                          list_files, scan_columns, sql_str, read_pointer, write_pointer, versioned_names)
+from memory_client import SOCKET_PATH
+from embedder import MODEL_NAME, EMBED_DIM
+from embed_service import embedding_client
+from extractor import ExtractionPool, Quarantine
+from scheduler import IndexScheduler, LIVE, BACKFILL
+from metrics import Registry
+from roots import load_config, root_for
+from watcher import Watcher
+from vector_matrix import MatrixWriter, remove_matrices
+
+# --- CONFIG ---
+HOME_DIR = os.path.expanduser("~")
+# Roots, extensions and ignore rules: ~/.config/ai-memory/roots.json (lib/roots.py)
+ROOTS, POLL_INTERVAL = load_config()
+
+# Content-addressed embedding cache (survives restarts, renames and touches)
+CACHE_PATH = os.path.join(HOME_DIR, ".cache/ai-memory/embeddings.sqlite")
+CACHE_MAX_ENTRIES = int(os.environ.get("AI_MEM_CACHE_MAX", "50000"))
+
+# BM25 full-text indexes, rebuilt once writes have been quiet for a while
+FTS_REFRESH_DELAY = 30 # seconds
+FTS_MAX_STALENESS = 300 # ...but not later than this during a long backfill
+
+# Parsers run in worker subprocesses (extractor.py); files that time out or
+# crash them are skipped until their mtime changes
+EXTRACT_WORKERS = int(os.environ.get("AI_MEM_EXTRACT_WORKERS", "2"))
+QUARANTINE_PATH = os.path.join(HOME_DIR, ".cache/ai-memory/quarantine.json")
+
+for _root in ROOTS:
+    os.makedirs(_root.path, exist_ok=True)
+
+
+class EmbeddingCache:
+    """Persistent, bounded cache of vectors keyed by model + content hash.
+
+    Entries are evicted least-recently-used first once the cache grows past
+    max_entries. Hit/miss counters are kept for the lifetime of the process.
+    """
+
+    def __init__(self, path, max_entries):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings(last_used)")
+        self.conn.commit()
+        self.entries = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def key(content_hash):
+        return f"{MODEL_NAME}:{content_hash}"
+
+    def get(self, content_hash):
+        key = self.key(content_hash)
+        with self.lock:
+            row = self.conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute("UPDATE embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+        return np.frombuffer(row[0], dtype=np.float32).copy()
+
+    def put(self, content_hash, vector):
+        key = self.key(content_hash)
+        blob = np.asarray(vector, dtype=np.float32).tobytes()
+        with self.lock:
+            exists = self.conn.execute("SELECT 1 FROM embeddings WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                (key, blob, time.time())
+            )
+            if not exists:
+                self.entries += 1
+            if self.entries > self.max_entries:
+                # Trim to 90% so we don't evict on every single insert
+                excess = self.entries - int(self.max_entries * 0.9)
+                self.conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)", (excess,)
+                )
+                self.entries -= excess
+            self.conn.commit()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "entries": self.entries,
+            "max_entries": self.max_entries,
+        }
+
+    def log_stats(self):
+        s = self.stats()
+        print(f"📊 [Memory] Embedding cache: {s['hits']} hits / {s['misses']} misses "
+              f"({s['hit_rate']:.0%}), {s['entries']}/{s['max_entries']} entries", flush=True)
+
+
+# Vectors come from the shared ai-embed service (background priority), so
+# the daemon holds no model of its own
+print(f"🧠 [Memory] Using {MODEL_NAME} via the embedding service...", flush=True)
+model = embedding_client(priority="background")
+cache = EmbeddingCache(CACHE_PATH, CACHE_MAX_ENTRIES)
+
+# Counters/histograms for ai-mem-status and ai-mem-metrics (lib/metrics.py)
+metrics = Registry()
+
+# --- DB SETUP ---
+# Each index version is a table pair: "files_vN" holds vectors + metadata only
+# (bodies go to the content store), "files_text_vN" a capped copy of the text
+# for BM25. current.json says which pair serves queries (memory_store.py).
+def create_tables(db, spec):
+    dummy_vec = model.encode("init")
+    new_tbl = db.create_table(spec["files"], [{"vector": dummy_vec, "path": "init", "filename": "init", "ext": "",
+                                               "last_mod": 0.0, "content_hash": "init"}], mode="overwrite")
+    new_tbl.delete("path = 'init'")
+    new_text_tbl = db.create_table(spec["text"], [{"path": "init", "filename": "init", "ext": "", "last_mod": 0.0,
+                                                   "content_hash": "init", "text": "init"}], mode="overwrite")
+    new_text_tbl.delete("path = 'init'")
+    return new_tbl, new_text_tbl
+
+def open_tables(db, spec):
+    files, text = db.open_table(spec["files"]), db.open_table(spec["text"])
+    # Older schemas may keep serving while their replacement builds
+    if spec.get("schema") == SCHEMA_VERSION and (files.schema.names != FILES_COLUMNS or text.schema.names != TEXT_COLUMNS):
+        raise ValueError("schema mismatch")
+    return files, text
+
+def new_spec(after):
+    """Description of the next table pair; versions only ever go up"""
+    version = max([s["version"] for s in after if s] + [0]) + 1
+    files, text = versioned_names(version)
+    return {"version": version, "files": files, "text": text,
+            "model": MODEL_NAME, "schema": SCHEMA_VERSION, "created": time.time()}
+
+def up_to_date(spec):
+    return bool(spec) and spec.get("model") == MODEL_NAME and spec.get("schema") == SCHEMA_VERSION
+
+try:
+    db = lancedb.connect(DB_PATH)
+    db.table_names()
+except Exception as e:
+    # Keep the broken copy for inspection instead of deleting it
+    broken = f"{DB_PATH}.broken-{int(time.time())}"
+    print(f"⚠️ [Memory] DB unreadable ({e}), moving it to {broken}", flush=True)
+    if os.path.exists(DB_PATH): os.rename(DB_PATH, broken)
+    db = lancedb.connect(DB_PATH)
+
+pointer = read_pointer() or {}
+current = pointer.get("current")
+building = pointer.get("building")
+if current is None and FILES_TABLE in db.table_names():
+    # Unversioned tables from before current.json: adopt them as version 0
+    current = {"version": 0, "files": FILES_TABLE, "text": TEXT_TABLE,
+               "model": MODEL_NAME, "schema": 2, "created": 0}
+
+# What queries read (serve_*) vs. what indexing writes (tbl/text_tbl)
+serve_tbl = serve_text_tbl = None
+if current:
+    try:
+        serve_tbl, serve_text_tbl = open_tables(db, current)
+    except Exception as e:
+        print(f"⚠️ [Memory] Index v{current['version']} not usable ({e}), rebuilding", flush=True)
+        current = None
+
+tbl = text_tbl = None
+if serve_tbl is not None and up_to_date(current):
+    building = None
+    tbl, text_tbl = serve_tbl, serve_text_tbl
+else:
+    if up_to_date(building):
+        try:
+            tbl, text_tbl = open_tables(db, building)
+            print(f"🏗️ [Memory] Resuming shadow build v{building['version']}", flush=True)
+        except Exception:
+            building = None
+    if tbl is None:
+        building = new_spec([current, building])
+        tbl, text_tbl = create_tables(db, building)
+        print(f"🏗️ [Memory] Building index v{building['version']} ({MODEL_NAME}, schema {SCHEMA_VERSION})", flush=True)
+    if serve_tbl is None:
+        # Nothing usable to serve meanwhile: let queries see the new build fill up
+        current, building = building, None
+        serve_tbl, serve_text_tbl = tbl, text_tbl
+    else:
+        print(f"📚 [Memory] Index v{current['version']} keeps serving until the rebuild is done", flush=True)
+write_pointer({"current": current, "building": building})
+
+content_store = ContentStore()
+
+# path -> (last_mod, content_hash) mirror of the table, so unchanged files
+# (startup scan, moves, touches) never hit the extractor or the model
+known = {}
+try:
+    for row in scan_columns(tbl, ["path", "last_mod", "content_hash"]).to_pylist():
+        known[row["path"]] = (row["last_mod"], row["content_hash"])
+except Exception as e:
+    print(f"⚠️ [Memory] Could not load index metadata: {e}", flush=True)
+
+# float16 copy of the write target's vectors for the brain's brute-force
+# search on small corpora (vector_matrix.py), kept in step with the table
+def sync_matrix():
+    if vectors.live() == {path: h for path, (_, h) in known.items()}: return
+    try:
+        vectors.load(scan_columns(tbl, ["vector", "path", "filename", "content_hash"]).to_pylist())
+        print(f"📐 [Memory] Vector matrix rebuilt ({len(known)} files)", flush=True)
+    except Exception as e:
+        print(f"⚠️ [Memory] Vector matrix rebuild failed: {e}", flush=True)
+
+vectors = MatrixWriter((building or current)["version"], EMBED_DIM)
+sync_matrix()
+
+# --- FULL-TEXT INDEX ---
+fts_dirty = threading.Event()
+last_write = 0.0
+dirty_since = 0.0
+
+def mark_fts_dirty():
+    global last_write, dirty_since
+    last_write = time.time()
+    if not fts_dirty.is_set(): dirty_since = last_write
+    fts_dirty.set()
+
+def fts_refresh_due():
+    now = time.time()
+    return fts_dirty.is_set() and (now - last_write > FTS_REFRESH_DELAY or now - dirty_since > FTS_MAX_STALENESS)
+
+def rebuild_fts_index():
+    """(Re)build the lexical indexes the brain fuses with vector search"""
+    fts_dirty.clear()
+    try:
+        if text_tbl.count_rows() == 0: return
+        for column in FTS_COLUMNS:
+            text_tbl.create_fts_index(column, replace=True, use_tantivy=False)
+        print(f"🔤 [Memory] Full-text index refreshed ({', '.join(FTS_COLUMNS)})", flush=True)
+    except Exception as e:
+        print(f"⚠️ [Memory] Full-text index failed: {e}", flush=True)
+    refresh_scalar_indexes()
+
+def refresh_scalar_indexes():
+    """B-tree/bitmap indexes for per-path writes and search filters; rows
+    added since the last refresh are still found, just by a scan"""
+    try:
+        if tbl.count_rows() == 0: return
+        for t, indexes in ((tbl, FILES_SCALAR_INDEXES), (text_tbl, TEXT_SCALAR_INDEXES)):
+            for column, kind in indexes:
+                t.create_scalar_index(column, index_type=kind, replace=True)
+    except Exception as e:
+        print(f"⚠️ [Memory] Scalar index refresh failed: {e}", flush=True)
+
+extractor = ExtractionPool(workers=EXTRACT_WORKERS)
+quarantine = Quarantine(QUARANTINE_PATH)
+
+def wanted(filepath):
+    root = root_for(ROOTS, filepath)
+    return root is not None and root.wants_file(filepath)
+
+def file_size(filepath):
+    try:
+        return os.path.getsize(filepath)
+    except OSError:
+        return None
+
+def is_stale(filepath, mtime):
+    """Polling: changed since we indexed it (and not a known poison file)?"""
+    previous = known.get(filepath)
+    if previous is not None and previous[0] == mtime: return False
+    return not quarantine.contains(filepath, mtime, file_size(filepath))
+
+def pending_mtime(filepath):
+    """mtime if the file needs (re)indexing, None if it can be skipped"""
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    previous = known.get(filepath)
+    if previous and previous[0] == st.st_mtime:
+        return None # Already indexed at this mtime
+    if quarantine.contains(filepath, st.st_mtime, st.st_size):
+        return None # Poison file (or waiting for its retry), wait for it to change
+    return st.st_mtime
+
+def quarantine_file(filepath, last_mod, error):
+    # Size as of now: if the file is still being written, this won't match next time
+    final = quarantine.add(filepath, last_mod, file_size(filepath), str(error))
+    when = "until it changes" if final else "for now, will retry"
+    print(f"☣️ [Memory] Extraction failed, quarantined {os.path.basename(filepath)} {when}: {error}", flush=True)
+
+def requeue_quarantined():
+    """Queue retries that came due; forget entries for files that are gone"""
+    for path in quarantine.due():
+        scheduler.push(path, BACKFILL)
+    quarantine.purge()
+
+# Index writes come from the scheduler thread, moves from the watcher thread
+write_lock = threading.RLock()
+
+def embed(filepath, filename, content, content_hash):
+    vector = cache.get(content_hash)
+    if vector is not None:
+        return vector
+
+    # --- ZMIANA: KONTEKST ŚCIEŻKI ---
+    # Łączymy ścieżkę z treścią, aby AI "widziało" foldery
+    # Np: "Path: /Documents/Wrzesień/faktura.pdf Content: Usługa IT..."
+    # (A cached vector keeps the path context it was first embedded with.)
+    full_context = f"File Path: {filepath}\nFile Name: {filename}\nFile Content:\n{content}"
+
+    # Tworzymy wektor z CAŁOŚCI
+    with metrics.time("encode_seconds"):
+        vector = model.encode(full_context[:8000])
+    cache.put(content_hash, vector)
+    return vector
+
+def index_files(paths, chunk=16):
+    """One scheduler batch: extract in parallel across the pool, write sequentially"""
+    pending = [(p, pending_mtime(p)) for p in paths]
+    pending = [(p, m) for p, m in pending if m is not None]
+    # Chunked so extracted text can't pile up faster than we embed it
+    for i in range(0, len(pending), chunk):
+        mtimes = dict(pending[i:i + chunk])
+        for path, text, info, error in extractor.extract_many(list(mtimes)):
+            ext = os.path.splitext(path)[1].lower() or "none"
+            if error is not None:
+                metrics.inc("extract_failures_total", ext=ext)
+                quarantine_file(path, mtimes[path], error)
+                continue
+            metrics.observe("extract_seconds", info.get("seconds", 0.0), ext=ext)
+            quarantine.discard(path)
+            print(f"👁️ [Memory] Processing: {os.path.basename(path)}", flush=True)
+            store_file(path, mtimes[path], text)
+
+def store_file(filepath, last_mod, content):
+    if not content or not content.strip():
+        metrics.inc("files_total", result="empty")
+        return
+    filename = os.path.basename(filepath)
+    content_hash = hashlib.sha256(content.encode('utf-8', errors='ignore')).hexdigest()
+
+    with write_lock:
+        # Read under the lock: start_rebuild may swap in a fresh known/tbl meanwhile
+        previous = known.get(filepath)
+        _store(filepath, filename, last_mod, content, content_hash, previous)
+
+def _store(filepath, filename, last_mod, content, content_hash, previous):
+    try:
+        if previous and previous[1] == content_hash:
+            # Touched but not changed: metadata only
+            with metrics.time("write_seconds", op="touch"):
+                for t in (tbl, text_tbl):
+                    t.update(where=f"path = {sql_str(filepath)}", values={"last_mod": last_mod})
+            known[filepath] = (last_mod, content_hash)
+            metrics.inc("files_total", result="unchanged")
+            print(f"⏭️ [Memory] Unchanged content, updated mtime: {filename}", flush=True)
+            return
+
+        vector = embed(filepath, filename, content, content_hash)
+        # Zapisujemy samą treść do czytania przez człowieka/LLM
+        with metrics.time("write_seconds", op="index"):
+            content_store.put(content_hash, content)
+            where = f"path = {sql_str(filepath)}"
+            tbl.delete(where)
+            tbl.add([{
+                "vector": vector,
+                "path": filepath,
+                "filename": filename,
+                "ext": file_ext(filepath),
+                "last_mod": last_mod,
+                "content_hash": content_hash
+            }])
+            text_tbl.delete(where)
+            text_tbl.add([{
+                "path": filepath,
+                "filename": filename,
+                "ext": file_ext(filepath),
+                "last_mod": last_mod,
+                "content_hash": content_hash,
+                "text": content[:LEXICAL_MAX_CHARS]
+            }])
+            vectors.put(filepath, filename, content_hash, vector)
+        known[filepath] = (last_mod, content_hash)
+        mark_fts_dirty()
+        metrics.inc("files_total", result="indexed")
+        print(f"✅ [Memory] Indexed with path context: {filename}", flush=True)
+    except Exception as e:
+        metrics.inc("files_total", result="write_failed")
+        print(f"⚠️ Write failed: {e}", flush=True)
+
+def move_file(src_path, dest_path):
+    """Rename rows in place; only re-index if the destination really changed"""
+    with write_lock:
+        _move(src_path, dest_path)
+    # mtime is preserved by a rename, so this is a no-op unless the file was also edited
+    if wanted(dest_path): scheduler.push(dest_path, LIVE)
+
+def _move(src_path, dest_path):
+    previous = known.pop(src_path, None)
+    if previous is None or not wanted(dest_path):
+        try:
+            tbl.delete(f"path = {sql_str(src_path)}")
+            text_tbl.delete(f"path = {sql_str(src_path)}")
+            vectors.remove(src_path)
+            mark_fts_dirty()
+        except: pass
+        return
+
+    try:
+        renamed = {"path": dest_path, "filename": os.path.basename(dest_path), "ext": file_ext(dest_path)}
+        for t in (tbl, text_tbl):
+            t.delete(f"path = {sql_str(dest_path)}")
+            t.update(where=f"path = {sql_str(src_path)}", values=renamed)
+        vectors.rename(src_path, dest_path, renamed["filename"])
+        known[dest_path] = previous
+        mark_fts_dirty()
+        print(f"🔀 [Memory] Moved without re-embedding: {os.path.basename(dest_path)}", flush=True)
+    except Exception as e:
+        print(f"⚠️ Move failed: {e}", flush=True)
+
+# Recently saved/opened files first, backfill when the machine is quiet
+scheduler = IndexScheduler(index_files, metrics=metrics)
+
+def fragment_count(t):
+    try:
+        return t.stats()["fragment_stats"]["num_fragments"]
+    except Exception:
+        return len(t.to_lance().get_fragments())
+
+def backfill_eta():
+    """Seconds until the queue drains at the recent indexing rate"""
+    rate = metrics.rate("files")
+    return round(scheduler.pending() / rate) if rate > 0 else None
+
+metrics.gauge("queue_depth", scheduler.depth, label="tier")
+metrics.gauge("oldest_pending_seconds", lambda: round(scheduler.oldest_pending_seconds(), 1))
+metrics.gauge("backfill_eta_seconds", backfill_eta)
+metrics.gauge("rows", lambda: {"files": tbl.count_rows(), "files_text": text_tbl.count_rows()}, label="table")
+metrics.gauge("fragments", lambda: {"files": fragment_count(tbl), "files_text": fragment_count(text_tbl)}, label="table")
+metrics.gauge("fts_stale_seconds", lambda: round(time.time() - dirty_since) if fts_dirty.is_set() else 0)
+metrics.gauge("embedding_cache_hit_rate", lambda: round(cache.stats()["hit_rate"], 4))
+metrics.gauge("quarantined_files", lambda: len(quarantine))
+metrics.gauge("index_batch_size", lambda: scheduler.state["batch"])
+metrics.describe("index_lag_seconds", "Time from a file being queued to it being searchable")
+metrics.describe("extract_seconds", "Text extraction time per file, by extension")
+metrics.describe("encode_seconds", "Embedding service round trip for a document (cache misses)")
+metrics.describe("write_seconds", "LanceDB + content store write time per file")
+metrics.describe("files_per_second", "Files processed per second over the last 5 minutes")
+
+# --- INDEX VERSIONS ---
+# Retired table pairs are dropped after a grace period, so a brain query that
+# opened them just before the swap can still finish
+GC_GRACE = 120 # seconds
+retired = [] # (spec, retired_at)
+rebuild_scanning = False # start_rebuild's walk is still queueing files
+
+def live_content_ids():
+    ids = set()
+    for t in {id(t): t for t in (serve_tbl, tbl) if t is not None}.values():
+        ids.update(scan_columns(t, ["content_hash"]).column("content_hash").to_pylist())
+    return ids
+
+def prune_content():
+    """Drop orphaned bodies. Under write_lock: _store puts a body before its row
+    exists, so a body written mid-prune would otherwise look orphaned."""
+    with write_lock:
+        pruned = content_store.prune(live_content_ids())
+    if pruned: print(f"🧹 [Memory] Dropped {pruned} orphaned document bodies", flush=True)
+
+def start_rebuild():
+    """Re-index everything into a fresh shadow table pair; the current one keeps serving"""
+    global building, tbl, text_tbl, known, vectors, rebuild_scanning
+    with write_lock:
+        if building: return building
+        rebuild_scanning = True # no swap before the walk has queued everything
+        building = new_spec([current])
+        tbl, text_tbl = create_tables(db, building)
+        known = {}
+        vectors = MatrixWriter(building["version"], EMBED_DIM)
+        sync_matrix()
+        write_pointer({"current": current, "building": building})
+    print(f"🏗️ [Memory] Rebuilding into index v{building['version']}", flush=True)
+
+    def scan():
+        global daemon_state, rebuild_scanning
+        try:
+            scan_roots()
+        finally:
+            with write_lock:
+                rebuild_scanning = False
+                daemon_state = "rebuilding" # the main loop swaps once the queue drains
+    threading.Thread(target=scan, daemon=True).start()
+    return building
+
+def swap_index():
+    """Shadow build complete: point readers at it and retire the old pair"""
+    global current, building, serve_tbl, serve_text_tbl
+    rebuild_fts_index()
+    with write_lock:
+        if current: retired.append((current, time.time()))
+        current, building = building, None
+        serve_tbl, serve_text_tbl = tbl, text_tbl
+        write_pointer({"current": current, "building": None})
+    print(f"🔁 [Memory] Index v{current['version']} is now serving", flush=True)
+
+def gc_indexes():
+    """Drop retired pairs past their grace period and tables no pointer refers to"""
+    now = time.time()
+    keep = {n for spec in (current, building) if spec for n in (spec["files"], spec["text"])}
+    keep |= {n for spec, at in retired if now - at < GC_GRACE for n in (spec["files"], spec["text"])}
+    retired[:] = [(spec, at) for spec, at in retired if now - at < GC_GRACE]
+    dropped = 0
+    for name in db.table_names():
+        ours = name in (FILES_TABLE, TEXT_TABLE) or name.startswith((FILES_TABLE + "_v", TEXT_TABLE + "_v"))
+        if not ours or name in keep: continue
+        try:
+            db.drop_table(name)
+            dropped += 1
+            print(f"🧹 [Memory] Dropped old index table {name}", flush=True)
+        except Exception as e:
+            print(f"⚠️ [Memory] Could not drop {name}: {e}", flush=True)
+    remove_matrices({spec["version"] for spec in (current, building) if spec} |
+                    {spec["version"] for spec, _ in retired})
+    if dropped:
+        prune_content()
+
+# --- QUERY SOCKET ---
+# ai-mem-search / ai-mem-list / ai-mem-status talk to us here instead of
+# loading MiniLM and LanceDB themselves (protocol: memory_client.py)
+started_at = time.time()
+daemon_state = "starting"
+
+def handle_query(req):
+    op = req.get("op")
+    if op == "search":
+        text = (req.get("query") or "").strip()
+        if not text: return {"ok": True, "results": []}
+        rows = serve_tbl.search(model.encode(text, priority="interactive")).select(SEARCH_COLUMNS) \
+                  .limit(int(req.get("limit", 5))).to_arrow().to_pylist()
+        return {"ok": True, "results": rows}
+    if op == "list":
+        rows = list_files(serve_tbl, offset=int(req.get("offset", 0)), limit=int(req.get("limit", 50)))
+        return {"ok": True, "total": serve_tbl.count_rows(), "files": rows}
+    if op == "rebuild":
+        return {"ok": True, "building": start_rebuild()}
+    if op == "status":
+        return {
+            "ok": True,
+            "daemon": daemon_state,
+            "uptime_s": int(time.time() - started_at),
+            "embed_backend": model.name,
+            "roots": [r.path for r in ROOTS],
+            "watching": watcher.status() if watcher else None,
+            "rows": serve_tbl.count_rows(),
+            "index_version": current["version"] if current else None,
+            "shadow_build": {"version": building["version"], "rows": tbl.count_rows()} if building else None,
+            "tracked_files": len(known),
+            "vector_matrix": vectors.enabled,
+            "fts_pending": fts_dirty.is_set(),
+            "quarantined": len(quarantine),
+            "indexing": scheduler.status(),
+            "files_per_s": round(metrics.rate("files"), 2),
+            "backfill_eta_s": backfill_eta(),
+            "embedding_cache": cache.stats(),
+            "content": content_store.stats(),
+        }
+    if op == "metrics":
+        if req.get("format") == "prometheus":
+            return {"ok": True, "text": metrics.prometheus()}
+        return {"ok": True, "metrics": metrics.snapshot()}
+    return {"ok": False, "error": f"unknown op {op!r}"}
+
+class QueryHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            response = handle_query(json.loads(self.rfile.readline(1_000_000)))
+        except Exception as e:
+            response = {"ok": False, "error": str(e)}
+        self.wfile.write(json.dumps(response, default=str).encode("utf-8") + b"\n")
+
+def start_query_server():
+    if os.path.exists(SOCKET_PATH): os.unlink(SOCKET_PATH)
+    server = socketserver.ThreadingUnixStreamServer(SOCKET_PATH, QueryHandler)
+    server.daemon_threads = True
+    os.chmod(SOCKET_PATH, 0o600)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"🔌 [Memory] Query socket listening on {SOCKET_PATH}", flush=True)
+
+# --- SCANNING / WATCHING ---
+watcher = None
+
+def scan_roots():
+    """Queue every indexable file; returns the non-ignored directories per root"""
+    files, directories = [], {}
+    for root in ROOTS:
+        directories[root] = []
+        for dirpath, found in root.walk():
+            directories[root].append(dirpath)
+            files.extend(found)
+    scheduler.push_scan(files)
+    return directories
+
+def rescan():
+    # Lost events (inotify overflow): walk again, unchanged files are skipped cheaply
+    threading.Thread(target=scan_roots, daemon=True).start()
+
+if __name__ == "__main__":
+    start_query_server()
+    scheduler.start()
+    gc_indexes()
+    quarantine.purge() # files deleted while we were down
+    print("🔎 [Memory] Performing startup scan...", flush=True)
+    directories = scan_roots()
+    daemon_state = "rebuilding" if building else "scanning"
+    print(f"📥 [Memory] Queued {scheduler.pending()} files for indexing", flush=True)
+    prune_content() # indexing already runs, so this takes write_lock
+
+    watcher = Watcher(ROOTS, on_change=lambda path: scheduler.push(path, LIVE), on_move=move_file,
+                      on_rescan=rescan, is_stale=is_stale, poll_interval=POLL_INTERVAL)
+    for root, dirs in directories.items():
+        watcher.assign(root, dirs)
+    watcher.start()
+    status = watcher.status()
+    print(f"👀 [Memory] WATCHER STARTED on {', '.join(r.path for r in ROOTS)} "
+          f"({status['inotify_watches']}/{status['inotify_budget']} inotify watches)", flush=True)
+    try:
+        last_stats = time.time()
+        while True:
+            time.sleep(1)
+            if daemon_state in ("scanning", "rebuilding") and not rebuild_scanning and scheduler.drained():
+                daemon_state = "watching"
+                print("✅ [Memory] Backfill complete", flush=True)
+                cache.log_stats()
+                if building: swap_index() # builds the FTS index first
+                else: rebuild_fts_index()
+            if retired and time.time() - retired[0][1] > GC_GRACE:
+                gc_indexes()
+            vectors.flush()
+            if fts_refresh_due():
+                rebuild_fts_index()
+            if time.time() - last_stats > 600:
+                cache.log_stats()
+                requeue_quarantined()
+                last_stats = time.time()
+    except KeyboardInterrupt:
+        pass
+    extractor.shutdown()
@@ -0,0 +1,145 @@
+"""Incremental parser for /ask answers, fed as the brain streams them.
+
+The answer mixes three things: a <think>...</think> block (possibly
+never closed), the visible answer, and an optional JSON action (in a
+```json fence or as a bare {...} object). Earlier, regexes split them
+once the whole answer was in. AnswerStream does the same split on the
+fly, so every delta can go straight to the screen:
+
+  feed(delta) -> [("text" | "think", str), ...]  safe to show now
+  finish()    -> remaining events; .action holds the parsed JSON action
+
+Input that could still turn out to be a marker ("<thi", "``") or a bare
+object is held back until it's decided. Trailing dots and spaces are
+also held, as the final answer has them stripped.
+"""
+import json
+
+THINK_OPEN, THINK_CLOSE = "<think>", "</think>"
+FENCE_OPEN, FENCE_CLOSE = "```json", "```"
+TRAILING = ".… " # stripped from the end of the answer
+
+
+def _held_suffix(data, markers):
+    """Length of the longest tail of data that is the start of a marker"""
+    for n in range(min(len(data), max(len(m) for m in markers) - 1), 0, -1):
+        tail = data[-n:]
+        if any(m.startswith(tail) for m in markers): return n
+    return 0
+
+
+class AnswerStream:
+    def __init__(self):
+        self.state = "text" # text | think | fence | brace
+        self.pending = "" # undecided input, re-read with the next delta
+        self.buffer = "" # JSON being collected (fence/brace)
+        self.depth, self.in_string, self.escape = 0, False, False
+        self.started = False # leading whitespace of the answer is dropped
+        self.text = "" # visible answer so far
+        self.thinking = ""
+        self.action = None
+
+    # --- OUTPUT ---
+    def _text(self, events, text):
+        if not self.started:
+            text = text.lstrip()
+            if not text: return
+            self.started = True
+        self.text += text
+        events.append(("text", text))
+
+    def _think(self, events, text):
+        if not text: return
+        self.thinking += text
+        events.append(("think", text))
+
+    def _json(self, events, raw, fallback_to_text):
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = None
+        if isinstance(value, dict) and self.action is None:
+            self.action = value
+        elif fallback_to_text:
+            self._text(events, raw) # braces in prose, not an action
+
+    # --- STATES ---
+    def feed(self, delta):
+        events = []
+        data, self.pending = self.pending + delta, ""
+        while data:
+            data = getattr(self, f"_in_{self.state}")(data, events)
+        return events
+
+    def _in_text(self, data, events):
+        hits = [(data.find(m), m) for m in (THINK_OPEN, FENCE_OPEN, "{")]
+        hits = [(i, m) for i, m in hits if i >= 0]
+        if hits:
+            i, marker = min(hits)
+            self._text(events, data[:i])
+            self.state = {THINK_OPEN: "think", FENCE_OPEN: "fence", "{": "brace"}[marker]
+            if marker == "{":
+                self.buffer, self.depth, self.in_string, self.escape = "", 0, False, False
+                return data[i:]
+            self.buffer = ""
+            return data[i + len(marker):]
+        held = _held_suffix(data, (THINK_OPEN, FENCE_OPEN))
+        if not held: # the end might still be stripped
+            held = len(data) - len(data.rstrip(TRAILING))
+        self._text(events, data[:len(data) - held])
+        self.pending = data[len(data) - held:]
+        return ""
+
+    def _in_think(self, data, events):
+        i = data.find(THINK_CLOSE)
+        if i >= 0:
+            self._think(events, data[:i])
+            self.state = "text"
+            return data[i + len(THINK_CLOSE):]
+        held = _held_suffix(data, (THINK_CLOSE,))
+        self._think(events, data[:len(data) - held])
+        self.pending = data[len(data) - held:]
+        return ""
+
+    def _in_fence(self, data, events):
+        i = data.find(FENCE_CLOSE)
+        if i >= 0:
+            self._json(events, (self.buffer + data[:i]).strip(), fallback_to_text=False)
+            self.state = "text"
+            return data[i + len(FENCE_CLOSE):]
+        held = _held_suffix(data, (FENCE_CLOSE,))
+        self.buffer += data[:len(data) - held]
+        self.pending = data[len(data) - held:]
+        return ""
+
+    def _in_brace(self, data, events):
+        for i, c in enumerate(data):
+            if self.in_string:
+                if self.escape: self.escape = False
+                elif c == "\\": self.escape = True
+                elif c == '"': self.in_string = False
+            elif c == '"': self.in_string = True
+            elif c == "{": self.depth += 1
+            elif c == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    self._json(events, self.buffer + data[:i + 1], fallback_to_text=True)
+                    self.state = "text"
+                    return data[i + 1:]
+        self.buffer += data
+        return ""
+
+    def finish(self):
+        """End of the answer: flush what was held back"""
+        events = []
+        pending, self.pending = self.pending, ""
+        if self.state == "think":
+            self._think(events, pending) # never closed: the rest was thinking
+        elif self.state == "fence":
+            self._json(events, (self.buffer + pending).strip(), fallback_to_text=False)
+        elif self.state == "brace":
+            self._text(events, (self.buffer + pending).rstrip(TRAILING)) # unbalanced, so just text
+        elif pending.rstrip(TRAILING):
+            self._text(events, pending.rstrip(TRAILING))
+        self.state = "text"
+        return events
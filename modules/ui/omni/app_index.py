@@ -0,0 +1,240 @@
+"""Installed applications for the Omni launcher, cached between launches.
+
+Parsing every .desktop file on each start is the slow part of opening
+Omni. The parsed entries are kept in ~/.cache/omni/apps.json along with a
+signature of each applications directory (resolved path, inode, mtime).
+A NixOS switch swaps /run/current-system, so the resolved path changes.
+Installing into a profile changes the directory mtime. Startup only stats
+the directories; if nothing moved it loads the cache, and otherwise it
+re-parses just the files whose store path or mtime changed. While Omni
+runs, inotify triggers the same incremental refresh.
+
+match() ranks with ranking.FuzzyMatcher (subsequence-fuzzy on the name,
+plus GenericName, Keywords, the Exec binary and initials, "vsc" -> Visual
+Studio Code), rebuilt whenever the list changes, and adds the launch
+history from ranking.Frecency, so habits win over alphabetical order.
+"""
+import json
+import locale
+import logging
+import os
+import threading
+
+import numpy as np
+
+from inotify import Inotify, IN_CLOSE_WRITE, IN_CREATE, IN_DELETE, IN_MOVED_FROM, IN_MOVED_TO, IN_ONLYDIR
+from ranking import Frecency, FuzzyMatcher
+
+APP_DIRS = [
+    "/run/current-system/sw/share/applications",
+    f"/etc/profiles/per-user/{os.environ.get('USER', '')}/share/applications",
+    os.path.expanduser("~/.nix-profile/share/applications"),
+    os.path.expanduser("~/.local/share/applications"),
+]
+CACHE_PATH = os.path.expanduser("~/.cache/omni/apps.json")
+CACHE_VERSION = 1
+WATCH_MASK = IN_CLOSE_WRITE | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR
+LOOKUP_MIN_SCORE = 1.5 # lookup(): per query char; below it the letters are just scattered
+EXEC_FIELD_CODES = ("%f", "%F", "%u", "%U", "%d", "%D", "%n", "%N", "%i", "%c", "%k", "%v", "%m")
+
+
+def locale_keys():
+    """Key suffixes to try for localized values, most specific first: pl_PL, pl"""
+    lang = os.environ.get("LC_MESSAGES") or os.environ.get("LANG") or locale.getlocale()[0] or ""
+    lang = lang.split(".")[0].split("@")[0]
+    return [k for k in (lang, lang.split("_")[0]) if k and k != "C"]
+
+
+def parse_desktop_file(path, langs):
+    """Entry dict for one .desktop file, or None if it shouldn't be listed"""
+    fields = {}
+    try:
+        with open(path, "r", errors="ignore") as f:
+            in_entry = False
+            for line in f:
+                stripped = line.strip()
+                if stripped.startswith("["):
+                    if in_entry: break # Stop parsing if we hit a new section (e.g. Actions)
+                    in_entry = stripped == "[Desktop Entry]"
+                    continue
+                if in_entry and "=" in stripped and not stripped.startswith("#"):
+                    key, value = stripped.split("=", 1)
+                    fields[key.strip()] = value.strip()
+    except OSError:
+        return None
+    if fields.get("NoDisplay") == "true" or fields.get("Hidden") == "true": return None
+    if fields.get("Type", "Application") != "Application": return None
+
+    def localized(key):
+        for lang in langs:
+            if f"{key}[{lang}]" in fields: return fields[f"{key}[{lang}]"]
+        return fields.get(key, "")
+
+    filename = os.path.basename(path)
+    name = localized("Name") or filename.replace(".desktop", "").replace("-", " ").title()
+    exec_line = fields.get("Exec", "")
+    for code in EXEC_FIELD_CODES: exec_line = exec_line.replace(code, "")
+    keywords = {k for k in (localized("Keywords") + ";" + fields.get("Keywords", "")).split(";") if k}
+    return {
+        "name": name,
+        "name_en": fields.get("Name", name),
+        "generic": localized("GenericName"),
+        "keywords": sorted(keywords),
+        "exec": exec_line.strip(),
+        "icon": fields.get("Icon", "application-x-executable"),
+        "terminal": fields.get("Terminal") == "true",
+        "path": path,
+        "type": "app",
+    }
+
+
+def _dir_signature(directory):
+    try:
+        real = os.path.realpath(directory)
+        st = os.stat(real)
+        return [real, st.st_ino, st.st_mtime_ns]
+    except OSError:
+        return None
+
+
+class AppIndex:
+    def __init__(self, dirs=APP_DIRS, cache_path=CACHE_PATH):
+        self.dirs = dirs
+        self.cache_path = cache_path
+        self.langs = locale_keys()
+        self.lock = threading.Lock()
+        self.signatures = {} # dir -> [realpath, inode, mtime_ns]
+        self.files = {} # .desktop path -> [stamp, entry or None]
+        self.apps = []
+        self.matcher = FuzzyMatcher([])
+        self.frecency = Frecency()
+        self.on_change = None
+        self._load_cache()
+        self.refresh()
+
+    # --- CACHE ---
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                cache = json.load(f)
+            if cache.get("version") == CACHE_VERSION and cache.get("langs") == self.langs:
+                self.signatures, self.files = cache["signatures"], cache["files"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _save_cache(self):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp = f"{self.cache_path}.tmp-{os.getpid()}"
+        with open(tmp, "w") as f:
+            json.dump({"version": CACHE_VERSION, "langs": self.langs,
+                       "signatures": self.signatures, "files": self.files}, f, separators=(",", ":"))
+        os.replace(tmp, self.cache_path)
+
+    # --- REFRESH ---
+    def refresh(self):
+        """Re-read whatever changed on disk; True if the app list changed"""
+        with self.lock:
+            changed = False
+            for directory in self.dirs:
+                signature = _dir_signature(directory)
+                if signature == self.signatures.get(directory): continue
+                changed |= self._rescan_dir(directory, signature)
+            if changed or not self.apps:
+                self._rebuild_list()
+            if changed:
+                try:
+                    self._save_cache()
+                except OSError as e:
+                    logging.warning(f"App cache not saved: {e}")
+        return changed
+
+    def _rescan_dir(self, directory, signature):
+        """Lock held: sync self.files for one directory, parsing only changed files"""
+        self.signatures[directory] = signature
+        prefix = directory + "/"
+        present = set()
+        changed = False
+        if signature:
+            try:
+                names = [n for n in os.listdir(directory) if n.endswith(".desktop")]
+            except OSError:
+                names = []
+            for name in names:
+                path = prefix + name
+                present.add(path)
+                try:
+                    # Nix store files all have mtime 1; their store path says if they changed
+                    stamp = f"{os.path.realpath(path)}:{os.stat(path).st_mtime_ns}"
+                except OSError:
+                    continue
+                cached = self.files.get(path)
+                if cached is None or cached[0] != stamp:
+                    self.files[path] = [stamp, parse_desktop_file(path, self.langs)]
+                    changed = True
+        for path in [p for p in self.files if p.startswith(prefix) and p not in present]:
+            del self.files[path]
+            changed = True
+        return changed
+
+    def _rebuild_list(self):
+        """Lock held: one entry per Name, earlier directories win"""
+        apps, seen = [], set()
+        for directory in self.dirs:
+            prefix = directory + "/"
+            for path in sorted(p for p in self.files if p.startswith(prefix)):
+                entry = self.files[path][1]
+                if entry is None or entry["name"] in seen: continue
+                seen.add(entry["name"])
+                apps.append(entry)
+        self.apps = sorted(apps, key=lambda x: x['name'])
+        self.matcher = FuzzyMatcher(self.apps)
+
+    # --- WATCHER ---
+    def watch(self, on_change=None):
+        """Keep the index current in a background thread; on_change() after updates"""
+        self.on_change = on_change
+        try:
+            inotify = Inotify()
+        except (OSError, AttributeError) as e:
+            logging.warning(f"App index watcher unavailable: {e}")
+            return
+        for directory in self.dirs:
+            inotify.add_watch(directory, WATCH_MASK)
+        # `nixos-rebuild switch` replaces the /run/current-system symlink
+        inotify.add_watch("/run", IN_CREATE | IN_MOVED_TO | IN_ONLYDIR)
+
+        def loop():
+            for _, _, name in inotify.events():
+                if name and not (name.endswith(".desktop") or name == "current-system"): continue
+                if name == "current-system":
+                    for directory in self.dirs: inotify.add_watch(directory, WATCH_MASK) # new target
+                if self.refresh() and self.on_change:
+                    self.on_change()
+        threading.Thread(target=loop, daemon=True, name="app-index").start()
+
+    # --- QUERIES ---
+    def match(self, query, limit=9):
+        """Apps ranked by how well query fits them, plus how often it led to them"""
+        matcher = self.matcher # swapped whole by refresh(), keep one snapshot
+        apps = matcher.entries
+        q = query.strip().lower()
+        scores = matcher.scores(q) # zeros for an empty bar: most used, then alphabetical
+        for path, boost in self.frecency.boosts(q).items():
+            i = matcher.index.get(path)
+            if i is not None: scores[i] += boost
+        hits = np.flatnonzero(scores > -np.inf)
+        ranked = hits[np.lexsort((hits, -scores[hits]))[:limit]] # apps are alphabetical, so ties are too
+        return [apps[i] for i in ranked]
+
+    def lookup(self, name):
+        """The installed app a free-form name refers to ("firefox", "VS Code"), or None"""
+        results = self.match(name, limit=1)
+        if not results: return None
+        matcher = self.matcher
+        i = matcher.index.get(results[0]['path'])
+        if i is None: return None # list changed in between
+        return results[0] if matcher.scores(name)[i] >= LOOKUP_MIN_SCORE * len(name.strip()) else None
+
+    def record_launch(self, app, query=""):
+        """Remember that query led to app, for the next match()"""
+        self.frecency.record(app['path'], query)
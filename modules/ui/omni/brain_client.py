@@ -0,0 +1,147 @@
+"""One long-lived I/O thread for Omni's calls to the brain (127.0.0.1:5500).
+
+Requests go out on channels ("search", "action", "ask"). A channel has at
+most one request in flight: submitting a new one cancels the previous
+request, closing its socket so the brain can stop early, before the new
+one is sent. Fast typing therefore produces one live request per
+channel, not a pile of threads waiting on stale answers. Replies reach
+the UI through the `response` signal, tagged with the submitter's
+generation. A call made with stream=True reads the brain's NDJSON reply
+("stream": true on /ask) as it arrives: every {"delta": ...} line goes
+out through `partial`, then `response` carries the whole answer.
+
+Plain asyncio streams, no extra dependency. The brain runs the Flask dev
+server, which closes connections after every reply, so each request
+opens its own loopback socket.
+"""
+import asyncio
+import json
+import logging
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+
+class BrainError(Exception):
+    pass
+
+
+class BrainClient(QThread):
+    response = pyqtSignal(str, int, object, str) # channel, generation, decoded JSON or None, error
+    partial = pyqtSignal(str, int, str) # channel, generation, text delta (streamed calls only)
+
+    def __init__(self, host="127.0.0.1", port=5500):
+        super().__init__()
+        self.host, self.port = host, port
+        # Created here so submit() works before the thread is up; calls just queue
+        self.loop = asyncio.new_event_loop()
+        self.inflight = {} # channel -> asyncio.Task, loop thread only
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    # --- UI THREAD ---
+    def submit(self, channel, path, payload, generation, timeout, stream=False):
+        """Send payload to path; supersedes whatever the channel was waiting for.
+        With stream=True, timeout is the longest silence allowed between deltas."""
+        self.loop.call_soon_threadsafe(self._start, channel, path, payload, generation, timeout, stream)
+
+    def cancel(self, channel):
+        self.loop.call_soon_threadsafe(self._cancel, channel)
+
+    # --- LOOP THREAD ---
+    def _cancel(self, channel):
+        task = self.inflight.pop(channel, None)
+        if task is not None: task.cancel()
+
+    def _start(self, channel, path, payload, generation, timeout, stream):
+        self._cancel(channel)
+        task = self.loop.create_task(self._call(channel, path, payload, generation, timeout, stream))
+        self.inflight[channel] = task
+
+    async def _call(self, channel, path, payload, generation, timeout, stream):
+        try:
+            if stream:
+                data = await self._stream(channel, path, payload, generation, timeout)
+            else:
+                data = await asyncio.wait_for(self._post(path, payload), timeout)
+            self.response.emit(channel, generation, data, "")
+        except asyncio.CancelledError:
+            return # superseded; nobody wants this answer
+        except (ConnectionRefusedError, ConnectionResetError):
+            self.response.emit(channel, generation, None, "offline")
+        except asyncio.TimeoutError:
+            self.response.emit(channel, generation, None, "timeout")
+        except Exception as e:
+            logging.warning(f"Brain {path} failed: {e}")
+            self.response.emit(channel, generation, None, str(e))
+        finally:
+            if self.inflight.get(channel) is asyncio.current_task():
+                del self.inflight[channel]
+
+    async def _request(self, path, payload):
+        """Send the POST and read the head -> (reader, writer, status, headers)"""
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            body = json.dumps(payload).encode()
+            writer.write((f"POST {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                          f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                          f"Connection: close\r\n\r\n").encode() + body)
+            await writer.drain()
+            head = await reader.readuntil(b"\r\n\r\n")
+        except BaseException:
+            writer.close()
+            raise
+        status_line, *header_lines = head.decode("latin-1").split("\r\n")
+        status = int(status_line.split(" ", 2)[1])
+        headers = {k.strip().lower(): v.strip() for k, _, v in (l.partition(":") for l in header_lines if l)}
+        return reader, writer, status, headers
+
+    async def _post(self, path, payload):
+        reader, writer, status, headers = await self._request(path, payload)
+        try:
+            content = b"".join([piece async for piece in self._body(reader, headers)])
+            if status != 200:
+                raise BrainError(f"HTTP {status}")
+            return json.loads(content)
+        finally:
+            writer.close()
+
+    async def _stream(self, channel, path, payload, generation, timeout):
+        reader, writer, status, headers = await asyncio.wait_for(self._request(path, payload), timeout)
+        try:
+            if status != 200:
+                raise BrainError(f"HTTP {status}")
+            body = self._body(reader, headers)
+            if "ndjson" not in headers.get("content-type", ""):
+                # Early replies (nothing to search, errors) are still one JSON object
+                return json.loads(b"".join([piece async for piece in body]))
+            answer, rest = [], b""
+            while True:
+                try:
+                    piece = await asyncio.wait_for(body.__anext__(), timeout)
+                except StopAsyncIteration:
+                    break
+                # Split on bytes, so a multi-byte character cut between pieces stays whole
+                *lines, rest = (rest + piece).split(b"\n")
+                for line in lines:
+                    if not line.strip(): continue
+                    delta = json.loads(line).get("delta")
+                    if delta:
+                        answer.append(delta)
+                        self.partial.emit(channel, generation, delta)
+            return {"answer": "".join(answer), "streamed": True}
+        finally:
+            writer.close()
+
+    async def _body(self, reader, headers):
+        """Body pieces as they arrive: chunked, or up to EOF (Connection: close)"""
+        if headers.get("transfer-encoding", "").lower() != "chunked":
+            while piece := await reader.read(65536):
+                yield piece
+            return
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0: break
+            yield await reader.readexactly(size)
+            await reader.readline() # CRLF after each chunk
@@ -0,0 +1,151 @@
+"""Favicon cache for Omni's link cards.
+
+Icons come from google.com/s2/favicons, one per domain. They are kept
+in memory as QPixmaps (LRU) and on disk under ~/.cache/omni/favicons/
+for FAVICON_TTL. Domains that failed are remembered for a shorter
+while, so they aren't retried on every keystroke. Misses are fetched by
+a small thread pool. Concurrent requests for the same domain share one
+download. A card whose domain is already cached gets its pixmap straight
+from lookup(), with no thread and no network.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtGui import QPixmap
+
+CACHE_DIR = os.path.expanduser("~/.cache/omni/favicons")
+FAVICON_URL = "https://www.google.com/s2/favicons?domain={domain}&sz=64"
+FAVICON_TTL = 7 * 86400
+FAILURE_TTL = 86400 # an empty file on disk marks a domain without an icon
+MEMORY_ITEMS = 256
+FETCH_WORKERS = 4
+FETCH_TIMEOUT = 3
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+
+def favicon_domain(url):
+    """'https://www.github.com/x' / 'github.com' -> 'github.com', or None"""
+    if not url: return None
+    clean_url = url.strip().strip('<>').strip('"').strip("'")
+    # Add schema if missing for parsing
+    if not clean_url.startswith("http") and not clean_url.startswith("//"):
+        clean_url = "https://" + clean_url
+    parsed = urlparse(clean_url)
+    domain = parsed.netloc
+    # Fallback for simple strings like "google.com" passed through logic
+    if not domain and parsed.path:
+        possible = parsed.path.split('/')[0]
+        if '.' in possible: domain = possible
+    domain = domain.lower().split("@")[-1].split(":")[0]
+    # Normalize domain (strip www.) for better favicon hit rate
+    if domain.startswith("www."): domain = domain[4:]
+    if not domain or "/" in domain or domain.startswith("."): return None
+    return domain
+
+
+class FaviconCache(QObject):
+    _fetched = pyqtSignal(str, object) # domain, bytes or None; worker -> UI thread
+
+    def __init__(self):
+        super().__init__()
+        self.memory = OrderedDict() # domain -> QPixmap
+        self.waiting = {} # domain -> [callback], one download per domain
+        self.pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="favicon")
+        self.sessions = threading.local()
+        self._fetched.connect(self._deliver)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+
+    # --- UI THREAD ---
+    def lookup(self, url, callback):
+        """QPixmap if cached; otherwise None and callback(pixmap) once it arrives"""
+        domain = favicon_domain(url)
+        if not domain: return None
+        pixmap = self.memory.get(domain)
+        if pixmap is not None:
+            self.memory.move_to_end(domain)
+            return pixmap
+        state, data = self._read_disk(domain)
+        if state == "hit":
+            pixmap = self._remember(domain, data)
+            if pixmap is not None: return pixmap
+        elif state == "failed":
+            return None
+        if domain in self.waiting:
+            self.waiting[domain].append(callback)
+        else:
+            self.waiting[domain] = [callback]
+            self.pool.submit(self._download, domain)
+        return None
+
+    def _remember(self, domain, data):
+        pixmap = QPixmap()
+        pixmap.loadFromData(data)
+        if pixmap.isNull(): return None
+        self.memory[domain] = pixmap
+        if len(self.memory) > MEMORY_ITEMS: self.memory.popitem(last=False)
+        return pixmap
+
+    def _deliver(self, domain, data):
+        callbacks = self.waiting.pop(domain, [])
+        pixmap = self._remember(domain, data) if data else None
+        if pixmap is None: return
+        for callback in callbacks:
+            try:
+                callback(pixmap)
+            except RuntimeError:
+                pass # card was deleted while we waited
+
+    # --- DISK ---
+    @staticmethod
+    def _path(domain):
+        return os.path.join(CACHE_DIR, domain)
+
+    def _read_disk(self, domain):
+        """('hit', bytes) / ('failed', None) / ('miss', None)"""
+        path = self._path(domain)
+        try:
+            st = os.stat(path)
+            age = time.time() - st.st_mtime
+            if st.st_size == 0:
+                return ("failed", None) if age < FAILURE_TTL else ("miss", None)
+            if age >= FAVICON_TTL: return "miss", None
+            with open(path, "rb") as f:
+                return "hit", f.read()
+        except OSError:
+            return "miss", None
+
+    # --- POOL ---
+    def _download(self, domain):
+        try:
+            session = getattr(self.sessions, "session", None)
+            if session is None:
+                session = self.sessions.session = requests.Session()
+            r = session.get(FAVICON_URL.format(domain=domain), headers={"User-Agent": USER_AGENT}, timeout=FETCH_TIMEOUT)
+            data = r.content if r.status_code == 200 and r.content else None
+        except requests.RequestException:
+            # Offline or slow: not the domain's fault, try again next time
+            self._fetched.emit(domain, None)
+            return
+        try:
+            tmp = f"{self._path(domain)}.tmp-{threading.get_ident()}"
+            with open(tmp, "wb") as f:
+                f.write(data or b"") # empty = no icon for this domain
+            os.replace(tmp, self._path(domain))
+        except OSError:
+            pass
+        self._fetched.emit(domain, data)
+
+
+_shared = None
+
+def favicons():
+    """The process-wide cache (created on first use, after QApplication)"""
+    global _shared
+    if _shared is None: _shared = FaviconCache()
+    return _shared
@@ -0,0 +1,320 @@
+"""In-process filename index for the Omni launcher.
+
+Replaces running `fd` over $HOME on every keystroke. A background thread
+walks the home directory once and keeps a trigram index of lowercased file
+and folder names; inotify keeps it current while Omni runs. search() only
+touches memory, so it is safe to call from the Qt UI thread:
+
+  3+ chars   substring match: intersect the rarest trigram posting lists,
+             then verify the few candidates
+  1-2 chars  name prefix match
+  fuzzy      if substring matching finds too little, names sharing some of
+             the query's trigrams, ranked by similarity (typos, swapped letters)
+
+Hidden entries and dependency/build trees are skipped, like `fd` did.
+"""
+import heapq
+import logging
+import os
+import threading
+import time
+from array import array
+from collections import Counter
+from difflib import SequenceMatcher
+
+from inotify import (Inotify, IN_CREATE, IN_DELETE, IN_MOVED_FROM, IN_MOVED_TO,
+                     IN_Q_OVERFLOW, IN_IGNORED, IN_ONLYDIR, IN_ISDIR)
+
+HOME = os.path.expanduser("~")
+SKIP_DIRS = {"node_modules", "__pycache__", "site-packages", "venv", "result"}
+MAX_ENTRIES = int(os.environ.get("OMNI_FILE_INDEX_MAX", "500000"))
+WATCH_LIMIT = 8192 # directories; the memory daemon needs its share of inotify too
+RESCAN_INTERVAL = 600 # seconds, for whatever didn't get a watch
+FUZZY_CANDIDATES = 200
+FUZZY_MIN_RATIO = 0.75
+FUZZY_MAX_POSTING = 50000 # trigrams this common say nothing, skip them
+
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def skipped(name):
+    return name.startswith(".") or name in SKIP_DIRS
+
+
+class FileIndex:
+    def __init__(self, root=HOME):
+        self.root = root
+        self.lock = threading.Lock() # the index arrays
+        self.ready = False
+        self._reset()
+        self.inotify = None
+        self.watch_lock = threading.Lock() # wds/watched, shared by the maintain and events threads
+        self.wds = {} # wd -> directory
+        self.watched = {} # directory -> wd
+        self.unwatched = set() # directories without a watch (over budget, no inotify): rescanned
+        self.replay = None # during a quiet rebuild: event changes to re-apply to the fresh index
+        self.rebuild_again = False # another overflow hit while rebuilding
+
+    def _reset(self):
+        self.paths = [] # id -> path, None once deleted
+        self.names = [] # id -> lowercased basename
+        self.is_dir = array("b")
+        self.depth = array("H") # id -> number of "/" in the path, for ranking
+        self.ids = {} # path -> id
+        self.grams = {} # trigram -> array of ids
+        self.prefixes = {} # first 1 and 2 chars -> array of ids
+        self.dead = 0
+
+    # --- BUILD / UPDATE ---
+    def _add(self, path, is_dir):
+        """Lock held"""
+        if self.replay is not None: self.replay.append((True, path, is_dir))
+        if path in self.ids or len(self.ids) >= MAX_ENTRIES: return
+        i = len(self.paths)
+        name = os.path.basename(path).lower()
+        self.paths.append(path)
+        self.names.append(name)
+        self.is_dir.append(is_dir)
+        self.depth.append(min(path.count("/"), 65535))
+        self.ids[path] = i
+        for gram in trigrams(name):
+            self.grams.setdefault(gram, array("I")).append(i)
+        for key in {name[:1], name[:2]}:
+            self.prefixes.setdefault(key, array("I")).append(i)
+
+    def _remove_tree(self, path):
+        """Lock held; posting lists keep the id, search skips dead entries"""
+        if self.replay is not None: self.replay.append((False, path, None))
+        i = self.ids.pop(path, None)
+        if i is None: return
+        self.paths[i] = None
+        self.dead += 1
+        if self.is_dir[i]:
+            prefix = path + "/"
+            for p in [p for p in self.ids if p.startswith(prefix)]:
+                self.paths[self.ids.pop(p)] = None
+                self.dead += 1
+
+    def _walk(self, top, watch=True, into=None):
+        """Index a tree, one directory per lock acquisition so searches interleave.
+        into: another FileIndex to fill (quiet rebuild); watches are still ours."""
+        target = into or self
+        for dirpath, dirs, files in os.walk(top):
+            dirs[:] = [d for d in dirs if not skipped(d)]
+            if watch: self._watch(dirpath)
+            with target.lock:
+                if dirpath != self.root: target._add(dirpath, True)
+                for d in dirs: target._add(os.path.join(dirpath, d), True)
+                for f in files:
+                    if not skipped(f): target._add(os.path.join(dirpath, f), False)
+                if len(target.ids) >= MAX_ENTRIES: return
+
+    def build(self):
+        started = time.time()
+        with self.lock:
+            self._reset()
+        self._walk(self.root)
+        self.ready = True
+        logging.info(f"File index: {len(self.ids)} entries, {len(self.wds)} watches in {time.time() - started:.1f}s")
+
+    # --- INOTIFY ---
+    def _watch(self, directory):
+        """Watch directory unless it already is; over budget it joins the rescanned set"""
+        with self.watch_lock:
+            if directory in self.watched: return
+            if self.inotify is None or len(self.wds) >= WATCH_LIMIT:
+                self.unwatched.add(directory)
+                return
+            wd = self.inotify.add_watch(directory, WATCH_MASK)
+            if wd >= 0:
+                self.wds[wd] = directory
+                self.watched[directory] = wd
+                self.unwatched.discard(directory)
+            else:
+                self.unwatched.add(directory)
+
+    def _unwatch_tree(self, path):
+        prefix = path + "/"
+        with self.watch_lock:
+            gone = [(w, d) for w, d in self.wds.items() if d == path or d.startswith(prefix)]
+            for w, d in gone:
+                del self.wds[w]
+                self.watched.pop(d, None)
+            self.unwatched = {d for d in self.unwatched if d != path and not d.startswith(prefix)}
+        for w, _ in gone:
+            self.inotify.rm_watch(w)
+
+    def _handle(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            # Events were lost: rebuild aside and swap, searches keep the current index
+            threading.Thread(target=self._rebuild_quietly, daemon=True, name="file-index-rebuild").start()
+            return
+        with self.watch_lock:
+            if mask & IN_IGNORED:
+                directory = self.wds.pop(wd, None)
+                if directory is not None and self.watched.get(directory) == wd: del self.watched[directory]
+                return
+            directory = self.wds.get(wd)
+        if directory is None or not name or skipped(name): return
+        path = os.path.join(directory, name)
+        is_dir = bool(mask & IN_ISDIR)
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            with self.lock:
+                self._remove_tree(path)
+            if is_dir: self._unwatch_tree(path)
+        elif mask & (IN_CREATE | IN_MOVED_TO):
+            if is_dir:
+                with self.lock:
+                    self._add(path, True)
+                self._walk(path)
+            else:
+                with self.lock:
+                    self._add(path, False)
+
+    def _read_loop(self):
+        for wd, mask, name in self.inotify.events():
+            try:
+                self._handle(wd, mask, name)
+            except Exception as e:
+                logging.warning(f"File index event failed: {e}")
+
+    def _maintain(self):
+        self.build()
+        while True:
+            time.sleep(RESCAN_INTERVAL)
+            try:
+                # Deleted entries pile up in the posting lists; rebuild now and then
+                if self.dead > len(self.ids) // 4:
+                    self._rebuild_quietly()
+                # No events come from directories over the watch budget: look at just those
+                elif self.unwatched:
+                    self._rescan_unwatched()
+            except Exception as e:
+                logging.warning(f"File index maintenance failed: {e}")
+
+    def _rebuild_quietly(self):
+        """Walk into a fresh index while this one keeps serving, then swap.
+        Changes from events handled meanwhile are logged and replayed onto it."""
+        with self.lock:
+            if self.replay is not None: # already rebuilding; it goes round once more
+                self.rebuild_again = True
+                return
+            self.replay = []
+        try:
+            while True:
+                fresh = FileIndex(self.root)
+                # Watch what lacks a watch: after an overflow, new directories may have none
+                self._walk(self.root, into=fresh)
+                with self.lock:
+                    for added, path, is_dir in self.replay:
+                        if added: fresh._add(path, is_dir)
+                        else: fresh._remove_tree(path)
+                    for attr in ("paths", "names", "is_dir", "depth", "ids", "grams", "prefixes", "dead"):
+                        setattr(self, attr, getattr(fresh, attr))
+                    self.replay = []
+                    if not self.rebuild_again: break
+                    self.rebuild_again = False
+        finally:
+            with self.lock:
+                self.replay = None
+
+    def _rescan_unwatched(self):
+        """Sync the entries of each unwatched directory with what is on disk now"""
+        with self.watch_lock:
+            directories = list(self.unwatched)
+        for directory in directories:
+            self._watch(directory) # budget may have freed up; events from here on
+        wanted = set(directories)
+        with self.lock:
+            known = list(self.ids)
+        children = {}
+        for path in known:
+            parent = os.path.dirname(path)
+            if parent in wanted: children.setdefault(parent, set()).add(path)
+        for directory in directories:
+            try:
+                entries = [(e.path, e.is_dir()) for e in os.scandir(directory) if not skipped(e.name)]
+            except OSError: # gone; a rescan of its parent or an event removes the entry
+                with self.watch_lock:
+                    self.unwatched.discard(directory)
+                continue
+            present = {path for path, _ in entries}
+            new_dirs = []
+            with self.lock:
+                for path in children.get(directory, set()) - present:
+                    self._remove_tree(path)
+                for path, is_dir in entries:
+                    if path in self.ids: continue
+                    self._add(path, is_dir)
+                    if is_dir: new_dirs.append(path)
+            for path in new_dirs:
+                self._walk(path)
+
+    def start(self):
+        try:
+            self.inotify = Inotify()
+        except (OSError, AttributeError):
+            self.inotify = None
+        if self.inotify is not None:
+            threading.Thread(target=self._read_loop, daemon=True, name="file-index-events").start()
+        threading.Thread(target=self._maintain, daemon=True, name="file-index").start()
+
+    # --- QUERIES ---
+    def _entry(self, i):
+        path = self.paths[i]
+        return {"name": os.path.basename(path) or path, "path": path,
+                "icon": "folder" if self.is_dir[i] else "text-x-generic", "type": "file"}
+
+    def _rank(self, ids, q, limit):
+        """Name prefix first, then shallow paths, then short names"""
+        names, depth = self.names, self.depth
+        return heapq.nsmallest(limit, ids, key=lambda i: (not names[i].startswith(q), depth[i], len(names[i])))
+
+    def search(self, query, limit=5):
+        q = query.strip().lower()
+        if not q: return []
+        with self.lock:
+            if len(q) < 3:
+                # The whole list: every entry in it starts with q, ranked by depth then length
+                paths, names, depth = self.paths, self.names, self.depth
+                hits = (i for i in self.prefixes.get(q, ()) if paths[i] is not None)
+                best = heapq.nsmallest(limit, hits, key=lambda i: (depth[i], len(names[i])))
+                return [self._entry(i) for i in best]
+
+            postings = sorted((self.grams.get(g, ()) for g in trigrams(q)), key=len)
+            if postings and postings[0]:
+                candidates = set(postings[0])
+                if len(postings) > 1 and len(candidates) > 64:
+                    candidates.intersection_update(postings[1])
+                hits = [i for i in candidates if self.paths[i] is not None and q in self.names[i]]
+            else:
+                hits = []
+            results = self._rank(hits, q, limit)
+            if len(results) < limit:
+                seen = set(results)
+                results += [i for i in self._fuzzy(q, limit) if i not in seen][:limit - len(results)]
+            return [self._entry(i) for i in results]
+
+    def _fuzzy(self, q, limit):
+        """Lock held: names close to q (typos, swapped letters), best first.
+        Trigram overlap picks a short list, difflib ranks it."""
+        grams = trigrams(q)
+        shared = Counter()
+        for g in grams:
+            posting = self.grams.get(g, ())
+            if len(posting) <= FUZZY_MAX_POSTING: shared.update(posting)
+        need = max(1, len(grams) // 3)
+        scored = []
+        for i, n in shared.most_common(FUZZY_CANDIDATES):
+            if n < need: break
+            if self.paths[i] is None: continue
+            name = self.names[i]
+            # Compare against every window of the name the query could be a typo of
+            ratio = max(SequenceMatcher(None, q, name[s:s + len(q) + 1]).ratio()
+                        for s in range(max(1, len(name) - len(q) + 1)))
+            if ratio >= FUZZY_MIN_RATIO: scored.append((-ratio, i))
+        return [i for _, i in sorted(scored)[:limit]]
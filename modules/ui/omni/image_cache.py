@@ -0,0 +1,154 @@
+"""Image cache for Omni's Person/Place cards.
+
+There are two tiers. Raw bytes live on disk under ~/.cache/omni/images/,
+keyed by a hash of the URL and kept for IMAGE_TTL. Finished card
+pixmaps (scaled to cover, center-cropped, rounded) stay in memory,
+keyed by URL, size and corner radius. Downloading, decoding and
+rounding happen in a small thread pool on QImage. QImageReader decodes
+big JPEGs at reduced size straight away. The UI thread only turns the
+finished QImage into a QPixmap. Concurrent requests for the same card
+image share one job. Showing a cached card again costs a dict lookup.
+"""
+import base64
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PyQt6.QtCore import QObject, QBuffer, QByteArray, QIODevice, QSize, Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader, QPainter, QPainterPath, QPixmap
+
+CACHE_DIR = os.path.expanduser("~/.cache/omni/images")
+IMAGE_TTL = 30 * 86400
+MEMORY_ITEMS = 64
+FETCH_WORKERS = 3
+FETCH_TIMEOUT = 10
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8"
+}
+
+
+def rounded_cover(data, w, h, radius):
+    """Encoded image bytes -> w x h QImage: scaled to cover, centered, rounded corners.
+    Safe off the UI thread (QImage only)."""
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+    reader = QImageReader(buffer)
+    size = reader.size()
+    if size.isValid() and size.width() > 2 * w and size.height() > 2 * h:
+        # Let the decoder skip detail we'd throw away (JPEG decodes at 1/2, 1/4, 1/8 cheaply)
+        reader.setScaledSize(size.scaled(2 * w, 2 * h, Qt.AspectRatioMode.KeepAspectRatioByExpanding))
+    image = reader.read()
+    if image.isNull(): return None
+
+    # Scale to cover (KeepAspectRatioByExpanding), then center crop
+    scaled = image.scaled(w, h, Qt.AspectRatioMode.KeepAspectRatioByExpanding, Qt.TransformationMode.SmoothTransformation)
+    x = (scaled.width() - w) // 2
+    y = (scaled.height() - h) // 2
+
+    rounded = QImage(QSize(w, h), QImage.Format.Format_ARGB32_Premultiplied)
+    rounded.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(rounded)
+    try:
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        path = QPainterPath()
+        path.addRoundedRect(0, 0, w, h, radius, radius)
+        painter.setClipPath(path)
+        painter.drawImage(-x, -y, scaled)
+    finally:
+        painter.end()
+    return rounded
+
+
+class ImageCache(QObject):
+    _finished = pyqtSignal(object, object) # key, QImage or None; worker -> UI thread
+
+    def __init__(self):
+        super().__init__()
+        self.memory = OrderedDict() # (url, w, h, radius) -> QPixmap
+        self.waiting = {} # key -> [callback], one job per key
+        self.pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="image")
+        self.sessions = threading.local()
+        self._finished.connect(self._deliver)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+
+    # --- UI THREAD ---
+    def lookup(self, url, w, h, radius, callback):
+        """Finished QPixmap if cached; otherwise None and callback(pixmap) once it's ready"""
+        if not url: return None
+        key = (url, w, h, radius)
+        pixmap = self.memory.get(key)
+        if pixmap is not None:
+            self.memory.move_to_end(key)
+            return pixmap
+        if key in self.waiting:
+            self.waiting[key].append(callback)
+        else:
+            self.waiting[key] = [callback]
+            self.pool.submit(self._job, key)
+        return None
+
+    def _deliver(self, key, image):
+        callbacks = self.waiting.pop(key, [])
+        if image is None: return
+        pixmap = QPixmap.fromImage(image)
+        self.memory[key] = pixmap
+        if len(self.memory) > MEMORY_ITEMS: self.memory.popitem(last=False)
+        for callback in callbacks:
+            try:
+                callback(pixmap)
+            except RuntimeError:
+                pass # card was deleted while we waited
+
+    # --- POOL ---
+    def _job(self, key):
+        url, w, h, radius = key
+        image = None
+        try:
+            data = self._bytes(url)
+            if data: image = rounded_cover(data, w, h, radius)
+        except Exception as e:
+            print(f"Image load error: {e}")
+        self._finished.emit(key, image)
+
+    def _bytes(self, url):
+        # Data URIs (base64) carry the image themselves
+        if url.startswith("data:"):
+            return base64.b64decode(url.split(",", 1)[1])
+
+        path = os.path.join(CACHE_DIR, hashlib.sha1(url.encode()).hexdigest())
+        try:
+            if time.time() - os.stat(path).st_mtime < IMAGE_TTL:
+                with open(path, "rb") as f:
+                    return f.read()
+        except OSError:
+            pass
+
+        session = getattr(self.sessions, "session", None)
+        if session is None:
+            session = self.sessions.session = requests.Session()
+        # verify=False to avoid SSL issues
+        r = session.get(url, headers=HEADERS, timeout=FETCH_TIMEOUT, verify=False)
+        if r.status_code != 200 or not r.content: return None
+        try:
+            tmp = f"{path}.tmp-{threading.get_ident()}"
+            with open(tmp, "wb") as f:
+                f.write(r.content)
+            os.replace(tmp, path)
+        except OSError:
+            pass
+        return r.content
+
+
+_shared = None
+
+def images():
+    """The process-wide cache (created on first use, after QApplication)"""
+    global _shared
+    if _shared is None: _shared = ImageCache()
+    return _shared
@@ -0,0 +1,52 @@
+"""Minimal inotify (ctypes, one fd) for Omni's background indexes"""
+import ctypes
+import ctypes.util
+import os
+import struct
+import time
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+EVENT_HEADER = struct.Struct("iIII") # wd, mask, cookie, name length
+
+
+class Inotify:
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path, mask):
+        """Watch descriptor, or -1 (no permission, vanished, out of watches)"""
+        return self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+
+    def rm_watch(self, wd):
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def events(self):
+        """Blocking generator of (wd, mask, name)"""
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except OSError:
+                time.sleep(1)
+                continue
+            offset = 0
+            while offset + EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                yield wd, mask, name
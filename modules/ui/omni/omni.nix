@@ -2,19 +2,28 @@
 
 let
   # 1. SETUP: Python with requests app and PyQt6
-  omniPython = pkgs.python3.withPackages (ps: with ps; [ requests pyqt6 ]);
+  omniPython = pkgs.python3.withPackages (ps: with ps; [ requests pyqt6 numpy ]);
 
   # --- 2. LOGIC & UI (Custom Qt Launcher) ---
+  # Whole directory, so omni.py can import its helper modules (file_index.py)
+  omniSrc = ./.;
+
   omniLauncher = pkgs.writeScriptBin "omni-launcher" ''
+    export PATH="${pkgs.coreutils}/bin:${pkgs.xclip}/bin:${pkgs.kdePackages.kservice}/bin:${pkgs.libnotify}/bin:$PATH"
     export OMNI_LOGO="${../../../assets/logo-trans.png}"
     export OMNI_STYLE="${./omni.css}"
-    ${omniPython}/bin/python ${./omni.py}
+    exec ${omniPython}/bin/python ${omniSrc}/omni.py "$@"
   '';
 
   # --- 3. WRAPPER ---
+  # Tiny client: asks the resident Omni (see omni-daemon below) to show itself.
+  # Only if nobody answers does it pay for starting Python + Qt.
   openOmniScript = pkgs.writeShellScriptBin "open-omni" ''
-    export PATH="${pkgs.coreutils}/bin:${pkgs.xclip}/bin:${pkgs.kdePackages.kservice}/bin:${pkgs.libnotify}/bin:$PATH"
-    ${omniLauncher}/bin/omni-launcher
+    sock="''${XDG_RUNTIME_DIR:-/tmp}/omni-$(${pkgs.coreutils}/bin/id -u).sock"
+    token="''${XDG_ACTIVATION_TOKEN:-$DESKTOP_STARTUP_ID}"
+    if ! printf '%s %s\n' "''${1:-show}" "$token" | ${pkgs.socat}/bin/socat -u - UNIX-CONNECT:"$sock" 2>/dev/null; then
+      exec ${omniLauncher}/bin/omni-launcher --daemon
+    fi
   '';
 
   omniDesktopItem = pkgs.makeDesktopItem {
@@ -30,8 +39,24 @@ let
 in
 {
   environment.systemPackages = with pkgs; [
-    omniLauncher omniDesktopItem xclip libnotify kdePackages.kservice papirus-icon-theme fd dex
+    omniLauncher openOmniScript omniDesktopItem xclip libnotify kdePackages.kservice papirus-icon-theme fd dex
   ];
+  # Resident instance, so the hotkey only has to show an already built window
+  systemd.user.services.omni-daemon = {
+    enable = true;
+    description = "Omni Launcher (resident)";
+    wantedBy = [ "graphical-session.target" ];
+    partOf = [ "graphical-session.target" ];
+    after = [ "graphical-session.target" ];
+    environment = { PYTHONUNBUFFERED = "1"; };
+    serviceConfig = {
+      ExecStart = "${omniLauncher}/bin/omni-launcher --daemon --hidden";
+      Restart = "on-failure";
+      RestartSec = 2;
+      Nice = 5;
+    };
+  };
+
   # Manrope: A modern, geometric sans-serif that is excellent for UI clarity and style.
   fonts.packages = with pkgs; [ manrope ];
 }
\ No newline at end of file
@@ -4,16 +4,25 @@ import subprocess
 import requests
 import threading
 from urllib.parse import urlparse
-from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, 
-                             QListWidget, QListWidgetItem, QFrame, QAbstractItemView,
-                             QGraphicsDropShadowEffect, QLabel, QScrollArea, QProgressBar)
+from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QLineEdit, 
+                             QListWidget, QListWidgetItem, QListView, QFrame, QAbstractItemView,
+                             QGraphicsDropShadowEffect, QLabel, QScrollArea, QProgressBar, QTextEdit)
 from PyQt6.QtCore import Qt, QSize, QThread, pyqtSignal, QPropertyAnimation, QEasingCurve, QPoint, QRect, QEvent, QTimer
-from PyQt6.QtGui import QColor, QFont, QIcon, QPixmap, QPainter, QPainterPath, QBrush
+from PyQt6.QtGui import QColor, QFont, QIcon, QBrush, QTextCursor, QTextBlockFormat
+from PyQt6.QtNetwork import QLocalServer
+import socket
 import traceback
 import json
 import re
 import logging
 import random
+import ast
+import operator
+from file_index import FileIndex
+from app_index import AppIndex
+from brain_client import BrainClient
+from answer_stream import AnswerStream
+from result_list import ResultModel, CardDelegate, person_card
 
 # --- LOGGING SETUP ---
 logging.basicConfig(
@@ -32,6 +41,8 @@ sys.excepthook = exception_hook
 # CONFIG
 BRAIN_URL = "http://127.0.0.1:5500/ask"
 LOGO_PATH = os.environ.get("OMNI_LOGO", "")
+# Resident mode: open-omni talks to the running instance here instead of starting Python
+SOCKET_PATH = os.path.join(os.environ.get("XDG_RUNTIME_DIR") or "/tmp", f"omni-{os.getuid()}.sock")
 
 # --- DESIGN SYSTEM ---
 STYLE_SHEET_PATH = os.environ.get("OMNI_STYLE", "")
@@ -40,419 +51,72 @@ if STYLE_SHEET_PATH and os.path.exists(STYLE_SHEET_PATH):
     with open(STYLE_SHEET_PATH, "r") as f:
         STYLE_SHEET = f.read()
 
-class AIWorker(QThread):
-    finished = pyqtSignal(str)
-
-    def __init__(self, query):
+# --- LOCAL CALCULATOR ---
+# Plain arithmetic is answered in-process; anything else goes to the brain
+CALC_CHARS = re.compile(r"[\d\s.+\-*/()%^]+")
+CALC_OPERATOR = re.compile(r"[\d)]\s*[-+*/%^]\s*[\d(.]")
+CALC_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+            ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow}
+
+def _calc_eval(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _calc_eval(node.operand)
+        return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.BinOp) and type(node.op) in CALC_OPS:
+        left, right = _calc_eval(node.left), _calc_eval(node.right)
+        if isinstance(node.op, ast.Pow) and (abs(right) > 100 or abs(left) > 1e6):
+            raise ValueError("too big")
+        return CALC_OPS[type(node.op)](left, right)
+    raise ValueError("not arithmetic")
+
+def local_calc(query):
+    expr = query.strip().rstrip("=").strip()
+    if not CALC_CHARS.fullmatch(expr) or not CALC_OPERATOR.search(expr): return []
+    try:
+        value = _calc_eval(ast.parse(expr.replace("^", "**"), mode="eval").body)
+    except (SyntaxError, ValueError, ArithmeticError):
+        return []
+    if isinstance(value, float):
+        value = int(value) if value.is_integer() and abs(value) < 1e15 else round(value, 10)
+    return [{"type": "calc", "content": str(value)}]
+
+class LocalSearchWorker(QThread):
+    """Calculator, apps and files for the latest keystroke, off the UI thread.
+    Each provider's results are emitted as soon as they're ready; if a newer
+    query comes in meanwhile the remaining providers are skipped."""
+    results_ready = pyqtSignal(int, str, list) # generation, provider, results
+
+    def __init__(self, match_apps, search_files):
         super().__init__()
-        self.query = query
-
-    def run(self):
-        try:
-            r = requests.post(BRAIN_URL, json={"query": self.query}, timeout=120)
-            answer = r.json().get("answer", "No answer received.")
-            self.finished.emit(answer)
-        except requests.exceptions.ConnectionError:
-            self.finished.emit("The Omni AI hasn't loaded yet. Please try again in a moment.")
-        except Exception as e:
-            self.finished.emit(f"System Error: {str(e)}")
-
-class SearchWorker(QThread):
-    results_found = pyqtSignal(list, str) # results, query_at_start
+        self.match_apps = match_apps
+        self.search_files = search_files
+        self.cond = threading.Condition()
+        self.pending = None # (generation, query)
 
-    def __init__(self, query):
-        super().__init__()
-        self.query = query
+    def submit(self, generation, query):
+        with self.cond:
+            self.pending = (generation, query)
+            self.cond.notify()
 
     def run(self):
-        try:
-            # Semantic Search
-            r = requests.post("http://127.0.0.1:5500/search", json={"query": self.query}, timeout=5)
-            results = r.json().get("results", [])
-            self.results_found.emit(results, self.query)
-        except:
-            self.results_found.emit([], self.query)
-
-class LinkActionWidget(QWidget):
-    icon_downloaded = pyqtSignal(object) # Use object for safer passing of bytes
-
-    def __init__(self, title, url, description, parent=None):
-        super().__init__(parent)
-        self.url = url
-        self.icon_thread = None # Keep reference
-        
-        # Connect signal
-        self.icon_downloaded.connect(self.update_icon)
-        
-        # Layout
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(16, 16, 16, 16)
-        layout.setSpacing(6)
-        
-        # 1. Top Row: Icon + Action Text
-        top_row = QWidget()
-        top_layout = QHBoxLayout(top_row)
-        top_layout.setContentsMargins(0, 0, 0, 0)
-        top_layout.setSpacing(10)
-        
-        # Icon Label
-        self.icon_label = QLabel("🌐") 
-        self.icon_label.setFixedSize(16, 16)
-        self.icon_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.icon_label.setStyleSheet("color: #007AFF; font-size: 12px;")
-        
-        # Action Label ("Open Link")
-        self.action_label = QLabel(f"Open {url}")
-        self.action_label.setStyleSheet("color: #007AFF; font-size: 13px; font-weight: 600;")
-        
-        top_layout.addWidget(self.icon_label)
-        top_layout.addWidget(self.action_label)
-        top_layout.addStretch() 
-        
-        # Main Title
-        self.title_label = QLabel(title)
-        self.title_label.setWordWrap(True)
-        self.title_label.setStyleSheet("color: #1d1d1f; font-size: 16px; font-weight: 700;")
-        
-        # Description
-        self.desc_label = QLabel(description)
-        self.desc_label.setWordWrap(True)
-        self.desc_label.setStyleSheet("color: #8E8E93; font-size: 13px; font-weight: 400;")
-        
-        layout.addWidget(top_row)
-        layout.addWidget(self.title_label)
-        layout.addWidget(self.desc_label)
-        
-        self.fetch_icon()
-
-    def fetch_icon(self):
-        try:
-            # print(f"DEBUG: Fetching icon for URL: {self.url}")
-            if not self.url: return
-            
-            # 1. Clean URL
-            clean_url = self.url.strip().strip('<>').strip('"').strip("'")
-            
-            # 2. Add schema if missing for parsing
-            if not clean_url.startswith("http") and not clean_url.startswith("//"):
-                clean_url = "https://" + clean_url
-                
-            parsed = urlparse(clean_url)
-            domain = parsed.netloc
-            
-            # Fallback for simple strings like "google.com" passed through logic
-            if not domain and parsed.path:
-                possible = parsed.path.split('/')[0]
-                if '.' in possible: domain = possible
-
-            if not domain: return
-
-            # Normalize domain (strip www.) for better favicon hit rate
-            if domain.startswith("www."):
-                domain = domain[4:]
-            
-            # 3. Fetch
-            icon_url = f"https://www.google.com/s2/favicons?domain={domain}&sz=64"
-            
-            self.icon_thread = threading.Thread(target=self._download_icon, args=(icon_url,), daemon=True)
-            self.icon_thread.start()
-        except Exception as e:
-            print(f"Error starting icon thread: {e}")
-
-    def _download_icon(self, url):
-        try:
-            headers = {
-                "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            }
-            r = requests.get(url, headers=headers, timeout=3)
-            if r.status_code == 200:
-                self.icon_downloaded.emit(r.content)
-        except: pass
-
-    def update_icon(self, data):
-        try:
-            # Check if C++ object is still alive
-            if not self.icon_label: return
-        except RuntimeError:
-            return # C++ object deleted
-
-        try:
-            pixmap = QPixmap()
-            pixmap.loadFromData(data)
-            if not pixmap.isNull():
-                self.icon_label.setText("") 
-                self.icon_label.setPixmap(pixmap.scaled(16, 16, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
-        except RuntimeError: return # Catch underlying C++ deletion during operation
-        except Exception: pass
-
-    def sizeHint(self):
-        w = 520 
-        header_h = 32
-        title_h = self.title_label.heightForWidth(w)
-        desc_h = self.desc_label.heightForWidth(w)
-        h = 32 + 12 + header_h + title_h + desc_h + 20 
-        return QSize(600, h)
-
-class InstallActionWidget(LinkActionWidget):
-    def __init__(self, name, website_url, parent=None):
-        # Use website URL for icon fetching, or fallback
-        url_for_icon = website_url if website_url else f"https://google.com/search?q={name}"
-        
-        super().__init__(f"Install {name}", url_for_icon, "Click to search in NixOS packages", parent)
-        
-        # Override Styling for Install context
-        # We will use a nested layout inside the action_label placeholder to ensure perfect alignment
-        self.action_label.setText("")
-        self.action_label.setStyleSheet("background: transparent;")
-        
-        # Create a layout for the "action_label" container
-        # Note: We are hijacking action_label as a container widget
-        layout = QHBoxLayout(self.action_label)
-        layout.setContentsMargins(0, 0, 0, 0)
-        layout.setSpacing(8)
-        
-        # --- Helper for Key Badge ---
-        def create_key(text):
-            lbl = QLabel(text)
-            lbl.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            lbl.setStyleSheet("""
-                background-color: #FFFFFF;
-                border: 1px solid #D1D1D6;
-                border-bottom: 2px solid #C7C7CC;
-                border-radius: 5px;
-                color: #1d1d1f;
-                padding: 3px 6px;
-                font-family: "Manrope";
-                font-size: 10px;
-                font-weight: 800;
-            """)
-            return lbl
-
-        # [TAB]
-        layout.addWidget(create_key("TAB"))
-        
-        # "Install"
-        lbl_install = QLabel("Install")
-        lbl_install.setStyleSheet("color: #34C759; font-weight: 700; font-size: 13px; font-family: 'Manrope';")
-        layout.addWidget(lbl_install)
-        
-        # Spacer
-        layout.addSpacing(12)
-        
-        # [ENTER]
-        layout.addWidget(create_key("ENTER"))
-        
-        # "Website"
-        lbl_web = QLabel("Website")
-        lbl_web.setStyleSheet("color: #8E8E93; font-weight: 600; font-size: 13px; font-family: 'Manrope';")
-        layout.addWidget(lbl_web)
-        
-        layout.addStretch() # Push left
-        
-        self.icon_label.setText("⬇")
-        self.icon_label.setStyleSheet("color: #34C759; font-size: 14px;")
-        
-        # Specific overrides
-        self.title_label.setStyleSheet("color: #1d1d1f; font-size: 18px; font-weight: 700;")
-        self.desc_label.setText("Available in NixOS Unstable Channel")
-        self.desc_label.setStyleSheet("color: #8E8E93; font-size: 13px;")
-
-    # Removed sizeHint override since we removed the bottom row
-
-
-class PersonActionWidget(QWidget):
-    image_downloaded = pyqtSignal(object)
-
-    def __init__(self, name, description, image_url, url, parent=None):
-        super().__init__(parent)
-        self.image_url = image_url
-        self.url = url or ""
-        
-        self.image_downloaded.connect(self.update_image)
-        
-        # Layout
-        layout = QHBoxLayout(self)
-        layout.setContentsMargins(24, 24, 24, 24)
-        layout.setSpacing(24)
-        
-        # 1. Avatar (Vertical Portrait)
-        self.avatar = QLabel()
-        self.avatar.setFixedSize(100, 150)
-        self.avatar.setStyleSheet("background-color: #E5E5EA; border-radius: 12px; border: 1px solid rgba(0,0,0,0.05);")
-        self.avatar.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        
-        # 2. Info (Right)
-        info_layout = QVBoxLayout()
-        info_layout.setSpacing(6)
-        info_layout.setContentsMargins(0, 4, 0, 0) 
-        
-        # Clean Name
-        display_name = name.replace(" - Wikipedia", "").strip()
-        
-        self.name_label = QLabel(display_name)
-        self.name_label.setFont(QFont("Manrope", 24, QFont.Weight.Bold))
-        self.name_label.setStyleSheet("color: #1d1d1f; letter-spacing: -0.5px;")
-        self.name_label.setWordWrap(True)
-        self.name_label.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft)
-        
-        self.desc_label = QLabel(description)
-        self.desc_label.setFont(QFont("Manrope", 15, QFont.Weight.Normal))
-        self.desc_label.setStyleSheet("color: #3A3A3C; line-height: 1.4;")
-        self.desc_label.setWordWrap(True)
-        self.desc_label.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft)
-        
-        # Small link indicator
-        domain = urlparse(url).netloc.replace("www.", "")
-        self.link_label = QLabel(f"Source: {domain}" if url else "Unknown Source")
-        self.link_label.setFont(QFont("Manrope", 12, QFont.Weight.DemiBold))
-        self.link_label.setStyleSheet("color: #007AFF; margin-top: 8px;")
-        
-        info_layout.addWidget(self.name_label)
-        info_layout.addWidget(self.desc_label)
-        info_layout.addWidget(self.link_label)
-        info_layout.addStretch()
-        
-        layout.addWidget(self.avatar, 0, Qt.AlignmentFlag.AlignTop)
-        layout.addLayout(info_layout)
-        
-        # Default to Initials
-        self.avatar.setText(display_name[0])
-        self.avatar.setStyleSheet("background-color: #007AFF; color: white; font-size: 48px; font-weight: bold; border-radius: 12px;")
-        
-        if self.image_url:
-            threading.Thread(target=self._download_image, daemon=True).start()
-
-    def _download_image(self):
-        try:
-            # 0. Handle Data URIs (Base64)
-            if self.image_url.startswith("data:"):
-                try:
-                    import base64
-                    header, encoded = self.image_url.split(",", 1)
-                    data = base64.b64decode(encoded)
-                    self.image_downloaded.emit(data)
-                    return
-                except: pass
-
-            headers = {
-                "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                "Accept": "image/avif,image/webp,image/apng,image/svg+xml,image/*,*/*;q=0.8"
-            }
-            
-            # verify=False to avoid SSL issues
-            r = requests.get(self.image_url, headers=headers, timeout=10, verify=False)
-            if r.status_code == 200:
-                self.image_downloaded.emit(r.content)
-        except Exception as e:
-            print(f"Image download error: {e}")
-
-    def update_image(self, data):
-        # 1. Safety Check
-        try:
-            if not self.avatar: return 
-        except RuntimeError:
-            return
-
-        try:
-            pixmap = QPixmap()
-            pixmap.loadFromData(data)
-            if not pixmap.isNull():
-                # Target Size
-                w, h = 100, 150
-                rounded = QPixmap(w, h)
-                rounded.fill(Qt.GlobalColor.transparent)
-                
-                painter = QPainter(rounded)
+        while True:
+            with self.cond:
+                while self.pending is None:
+                    self.cond.wait()
+                generation, query = self.pending
+                self.pending = None
+            providers = (("calc", local_calc), ("apps", self.match_apps),
+                         ("files", lambda q: self.search_files(q) if q else []))
+            for name, provider in providers:
+                if self.pending is not None: break # superseded
                 try:
-                    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-                    path = QPainterPath()
-                    # Rounded Rect
-                    path.addRoundedRect(0, 0, w, h, 12, 12)
-                    painter.setClipPath(path)
-                    
-                    # Scale to cover (KeepAspectRatioByExpanding)
-                    scaled = pixmap.scaled(w, h, Qt.AspectRatioMode.KeepAspectRatioByExpanding, Qt.TransformationMode.SmoothTransformation)
-                    
-                    # Center crop
-                    x = (scaled.width() - w) // 2
-                    y = (scaled.height() - h) // 2
-                    
-                    painter.drawPixmap(-x, -y, scaled)
-                finally:
-                    painter.end()
-                
-                self.avatar.setPixmap(rounded)
-                self.avatar.setStyleSheet("background-color: transparent;")
-                self.avatar.repaint()
-        except Exception as e:
-            print(f"Error updating person image: {e}")
-
-    def sizeHint(self):
-        # Dynamic Height Calculation
-        # Available Width for Text = Window(720) - Margins/Pads(~150) - Avatar(100) - Spacing(24) ~= 440px
-        w_text = 440
-        
-        name_h = self.name_label.heightForWidth(w_text)
-        # 4. Accurate Height Calculation
-        # NOTE: Qt heightForWidth DOES NOT respect CSS line-height (1.4).
-        # We must apply the multiplier manually or the text will be cutoff.
-        desc_h_raw = self.desc_label.heightForWidth(w_text)
-        desc_h = int(desc_h_raw * 1.5) # 1.4 CSS + 0.1 Safety margin
-        name_h = int(name_h * 1.3) # Safety margin for Title too
-        
-        link_h = self.link_label.heightForWidth(w_text) + 8
-        
-        # Sum + Spacing
-        # We reduced the buffer from 30+20 to just 12px for tight fit
-        text_total_h = name_h + desc_h + link_h + 12 
-        
-        # Final Height
-        # Height must accommodate the 150px image + margins(24+24) = 198px minimum
-        img_min_h = 150 + 48
-        
-        final_h = max(img_min_h, text_total_h + 24)
-        
-        return QSize(600, final_h)
-
-class PlaceActionWidget(PersonActionWidget):
-    def __init__(self, name, description, image_url, url, lat, lon, parent=None):
-        super().__init__(name, description, image_url, url, parent)
-        
-        # If no image provided, try to generate a Static Map
-        if not image_url and lat and lon:
-            # Use a free static map service (e.g. OSM based)
-            # This is a fallback to ensure a map is displayed
-            self.image_url = f"https://staticmap.openstreetmap.de/staticmap.php?center={lat},{lon}&zoom=13&size=200x300&markers={lat},{lon},red-pushpin"
-            threading.Thread(target=self._download_image, daemon=True).start()
-            
-        # Customize Styling for Place
-        self.avatar.setStyleSheet("background-color: #F2F2F7; border-radius: 12px; border: 1px solid rgba(0,0,0,0.1);")
-        if not image_url and not (lat and lon):
-            self.avatar.setText("📍") # Generic Pin if all else fails
-            self.avatar.setStyleSheet("background-color: #E5E5EA; color: #FF3B30; font-size: 48px; border-radius: 12px;")
-
-class ActionWorker(QThread):
-    action_found = pyqtSignal(object, str) # action_data (dict), query
-
-    def __init__(self, query):
-        super().__init__()
-        self.query = query
-
-    def run(self):
-        try:
-            # Fast Action Inference
-            r = requests.post("http://127.0.0.1:5500/action", json={"query": self.query}, timeout=60)
-            data = r.json()
-            # Support both 'actions' (list) and legacy 'action' (dict)
-            actions = data.get("actions", [])
-            if not actions and data.get("action"):
-                actions = [data.get("action")]
-                
-            self.action_found.emit(actions, self.query)
-        except:
-            self.action_found.emit([], self.query)
-
-            self.action_found.emit([], self.query)
+                    results = provider(query)
+                except Exception as e:
+                    logging.warning(f"Local provider {name} failed: {e}")
+                    results = []
+                self.results_ready.emit(generation, name, results)
 
 class InstallWorker(QThread):
     progress_update = pyqtSignal(str) # Status text
@@ -585,8 +249,14 @@ class ThinkingWidget(QWidget):
             h += min(content_h, 200) + 6
         return QSize(w, h)
 
+    def append(self, text):
+        """More streamed thinking; the label only reflows while it's visible"""
+        self.full_text += text
+        if self.is_expanded: self.content_label.setText(self.full_text)
+
     def toggle_expand(self, event):
         self.is_expanded = not self.is_expanded
+        if self.is_expanded: self.content_label.setText(self.full_text)
         self.scroll_area.setHidden(not self.is_expanded)
         self.header.setText("▴ Thinking" if self.is_expanded else "▾ Thinking")
         
@@ -607,29 +277,96 @@ class ThinkingWidget(QWidget):
                 self.window().adjust_window_height()
 
 class AnswerWidget(QWidget):
-    def __init__(self, text, parent=None):
+    # Window(720) - Margins(80) - ListPadding(24) - WidgetInternalPadding(30) = 586, minus a little slack
+    WRAP_WIDTH = 570
+
+    def __init__(self, text="", parent=None):
         super().__init__(parent)
         self.layout = QVBoxLayout(self)
         self.layout.setContentsMargins(15, 5, 15, 5)
         self.layout.setSpacing(0)
-        
-        self.label = QLabel(text)
-        self.label.setWordWrap(True)
-        self.label.setFont(QFont("Manrope", 20, QFont.Weight.Medium))
-        self.label.setStyleSheet("color: #1d1d1f; line-height: 1.3;")
-        
-        self.layout.addWidget(self.label)
-        
+
+        # A QTextDocument instead of a QLabel: appending a streamed delta only lays out
+        # the last paragraph again, where QLabel.setText reflows the whole answer
+        self.text_view = QTextEdit()
+        self.text_view.setReadOnly(True)
+        self.text_view.setFrameShape(QFrame.Shape.NoFrame)
+        self.text_view.setFocusPolicy(Qt.FocusPolicy.NoFocus) # Keep focus on input
+        self.text_view.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.text_view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        # Fixed wrap width: heights are known before the list has laid the widget out
+        self.text_view.setLineWrapMode(QTextEdit.LineWrapMode.FixedPixelWidth)
+        self.text_view.setLineWrapColumnOrWidth(self.WRAP_WIDTH)
+        self.text_view.setFont(QFont("Manrope", 20, QFont.Weight.Medium))
+        self.set_color("#1d1d1f")
+
+        self.cursor = QTextCursor(self.text_view.document())
+        block = QTextBlockFormat()
+        block.setLineHeight(130, QTextBlockFormat.LineHeightTypes.ProportionalHeight.value)
+        self.cursor.setBlockFormat(block) # new paragraphs inherit it
+
+        self.layout.addWidget(self.text_view)
+        if text: self.append(text)
+
+    def set_color(self, color):
+        self.text_view.setStyleSheet(f"QTextEdit {{ background: transparent; color: {color}; }}")
+
+    def append(self, text):
+        self.cursor.movePosition(QTextCursor.MoveOperation.End)
+        self.cursor.insertText(text)
+
+    def text(self):
+        return self.text_view.toPlainText()
+
     def sizeHint(self):
-        # Reduced width estimate to ensure height calculation handles wrapping correctly
-        # Window(720) - Margins(80) - ListPadding(24) - WidgetInternalPadding(30) = 586
-        # We use 550 to be safe (underestimating width -> overestimating height -> no cutoff)
-        w = 550
-        # Increased buffer to 60 to prevent any bottom cutoff
-        h = self.label.heightForWidth(w) + 60
-        return QSize(w, h)
+        doc_h = self.text_view.document().size().height() # already laid out, nothing recomputed
+        h = int(doc_h) + 10 + 6 # layout margins + a few px against cutoff
+        return QSize(self.WRAP_WIDTH, h)
+
+# --- RESIDENT MODE ---
+def send_command(command):
+    """Hand a command to a running Omni; False if there is none"""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(1)
+            sock.connect(SOCKET_PATH)
+            sock.sendall(command.encode() + b"\n")
+        return True
+    except OSError:
+        return False
+
+class OmniServer(QLocalServer):
+    """Line commands from open-omni: show, toggle, hide, quit (optionally + activation token)"""
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        QLocalServer.removeServer(SOCKET_PATH) # stale socket; callers checked nobody answers
+        if not self.listen(SOCKET_PATH):
+            logging.error(f"Omni socket unavailable: {self.errorString()}")
+        self.newConnection.connect(self.accept_clients)
+
+    def accept_clients(self):
+        while self.hasPendingConnections():
+            conn = self.nextPendingConnection()
+            conn.readyRead.connect(lambda conn=conn: self.handle(conn))
+            conn.disconnected.connect(conn.deleteLater)
+
+    def handle(self, conn):
+        while conn.canReadLine():
+            command, _, token = bytes(conn.readLine()).decode(errors="ignore").strip().partition(" ")
+            if token:
+                # Activation token of the hotkey launch, so the compositor lets us take focus
+                os.environ["XDG_ACTIVATION_TOKEN"] = token
+            if command == "show": self.window.summon()
+            elif command == "toggle":
+                if self.window.isVisible() and self.window.isActiveWindow(): self.window.dismiss()
+                else: self.window.summon()
+            elif command == "hide": self.window.dismiss()
+            elif command == "quit": QApplication.quit()
 
 class OmniWindow(QWidget):
+    apps_changed = pyqtSignal() # from the app index thread; queued onto the UI thread
+
     def __init__(self):
         super().__init__()
         # Frameless & Translucent
@@ -639,6 +376,7 @@ class OmniWindow(QWidget):
         self.setWindowTitle("Omni Intelligence")
         self.resize(720, 140) # Start minimal
         self.center()
+        self.resident = False # set by main(): hide on close and wait for the next summon
         # Remember initial top position for stability
         self.initial_top = self.y()
         
@@ -674,11 +412,24 @@ class OmniWindow(QWidget):
         self.divider = QFrame()
         self.divider.setObjectName("Divider")
         
-        # List
+        # Search results: model + painted cards, no widget per row
+        self.result_model = ResultModel(self.SECTIONS)
+        self.results_view = QListView()
+        self.results_view.setObjectName("Results")
+        self.results_view.setModel(self.result_model)
+        self.results_view.setItemDelegate(CardDelegate(self.results_view))
+        self.results_view.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.results_view.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.results_view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.results_view.setFocusPolicy(Qt.FocusPolicy.NoFocus) # Keep focus on input
+        self.results_view.verticalScrollBar().setSingleStep(20)
+        self.results_view.clicked.connect(self.on_entered)
+        self.results_active = False # results_view shown; otherwise list_widget (answer/install views)
+
+        # List for answer/install views (few rows, real widgets: progress bar, expandable thinking)
         self.list_widget = QListWidget()
         self.list_widget.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
         self.list_widget.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        self.list_widget.itemClicked.connect(self.on_entered)
         self.list_widget.setWordWrap(True) 
         self.list_widget.setFocusPolicy(Qt.FocusPolicy.NoFocus) # Keep focus on input
         self.list_widget.verticalScrollBar().setSingleStep(20) # Smoother scroll step
@@ -686,13 +437,26 @@ class OmniWindow(QWidget):
         
         frame_layout.addWidget(self.input_field)
         frame_layout.addWidget(self.divider)
+        frame_layout.addWidget(self.results_view)
         frame_layout.addWidget(self.list_widget)
+        self.list_widget.hide()
         main_layout.addWidget(self.frame)
         
         self.setStyleSheet(STYLE_SHEET)
         
-        # Data
-        self.apps = self.load_apps()
+        # Data: installed apps from the desktop-entry cache (no crawl unless something changed)
+        self.app_index = AppIndex()
+        self.apps_changed.connect(self.on_apps_changed)
+        self.app_index.watch(on_change=self.apps_changed.emit)
+        # Filenames under ~ (built in the background, kept fresh with inotify)
+        self.file_index = FileIndex()
+        self.file_index.start()
+
+        # Every keystroke starts a new generation; results from older ones are dropped
+        self.generation = 0
+        self.local_worker = LocalSearchWorker(self.app_index.match, self.search_files)
+        self.local_worker.results_ready.connect(self.handle_local_results)
+        self.local_worker.start()
         self.refresh_list("")
 
         # Entry Animation
@@ -701,10 +465,11 @@ class OmniWindow(QWidget):
         # Initial height adjustment
         self.adjust_window_height()
 
-        # Search Worker
-        self.search_worker = None
-        # Action Worker
-        self.action_worker = None
+        # One I/O thread for everything sent to the brain; newer requests cancel older ones
+        self.brain = BrainClient(urlparse(BRAIN_URL).hostname, urlparse(BRAIN_URL).port)
+        self.brain.response.connect(self.handle_brain_response)
+        self.brain.partial.connect(self.handle_brain_partial)
+        self.brain.start()
         
         # Debounce Timer
         self.debounce_timer = QTimer()
@@ -712,17 +477,30 @@ class OmniWindow(QWidget):
         self.debounce_timer.setInterval(400) # 400ms delay
         self.debounce_timer.timeout.connect(self.trigger_async_searches)
 
+        # Streamed answers: row/window heights follow the text at most every 50ms, not per token
+        self.answer_stream = None
+        self.answer_resize_timer = QTimer()
+        self.answer_resize_timer.setSingleShot(True)
+        self.answer_resize_timer.setInterval(50)
+        self.answer_resize_timer.timeout.connect(self.refresh_answer_size)
+
     def adjust_window_height(self):
         # 1. Precise Item Summation
         list_h = 0
         has_ai_answer = False
-        for i in range(self.list_widget.count()):
-            item = self.list_widget.item(i)
-            widget = self.list_widget.itemWidget(item)
-            # Check for AI Answer Widget to apply safety buffers
-            if widget and widget.__class__.__name__ == "AnswerWidget":
-                has_ai_answer = True
-            list_h += item.sizeHint().height() + 6
+        if self.results_active:
+            # Card heights are cached by the delegate, no layout pass here
+            count = self.result_model.rowCount()
+            list_h = sum(self.results_view.sizeHintForRow(i) for i in range(count))
+        else:
+            count = self.list_widget.count()
+            for i in range(count):
+                item = self.list_widget.item(i)
+                widget = self.list_widget.itemWidget(item)
+                # Check for AI Answer Widget to apply safety buffers
+                if widget and widget.__class__.__name__ == "AnswerWidget":
+                    has_ai_answer = True
+                list_h += item.sizeHint().height() + 6
         
         # 2. Window Content Height
         # Shadow margins: 80 (40+40) -> We reduced shadow so we can reduce margins, but keeping for safety
@@ -731,7 +509,7 @@ class OmniWindow(QWidget):
         # Divider: 1
         # List Padding: 20 for AI answer (truncation safety), 4 for search
         buffer = 20 if has_ai_answer else 4
-        target_list_h = list_h + buffer if self.list_widget.count() > 0 else 0
+        target_list_h = list_h + buffer if count > 0 else 0
         
         target_h = 80 + 74 + 1 + target_list_h
         
@@ -743,50 +521,40 @@ class OmniWindow(QWidget):
         # Ultra Compact Max: 800px (Increased from 540 to allow full content)
         target_h = min(target_h, 800)
         
-        if self.list_widget.count() == 0:
+        if count == 0:
             target_h = 160 # Search-bar only
 
         # 4. Instant Geometry Change (No Animation to prevent rendering freeze)
         target_y = int(screen_center_y - 120 - (target_h / 2))
         
+        anim = getattr(self, 'anim_geo', None)
+        if anim is not None and anim.state() == QPropertyAnimation.State.Running:
+            # Results arrived during the entry slide: retarget it instead of being overwritten by it
+            anim.setEndValue(QRect(self.x(), target_y, self.width(), int(target_h)))
+            return
         self.setGeometry(self.x(), target_y, self.width(), int(target_h))
 
-    def handle_semantic_results(self, results, original_query):
-        # Only update if the query hasn't changed significantly or if we want to show results anyway
-        # Check if input still matches roughly what was searched
-        current_text = self.input_field.text()
-        if current_text != original_query: return 
-
+    def handle_semantic_results(self, results, generation):
+        # Results for an older keystroke are dropped without touching the list
+        if generation != self.generation or not self.results_active: return
         if not results: return
 
-        # Add separator if needed or just append
-        # To avoid duplicate items if file is found by both 'fd' and 'semantic', we can check paths
-        existing_paths = set()
-        for i in range(self.list_widget.count()):
-            item = self.list_widget.item(i)
-            d = item.data(Qt.ItemDataRole.UserRole)
-            if d and 'path' in d: existing_paths.add(d['path'])
-
-        added_count = 0
-        for res in results:
-            if res['path'] in existing_paths: continue
-            
-            item = QListWidgetItem(res['name'])
-            item.setData(Qt.ItemDataRole.UserRole, res)
-            item.setSizeHint(QSize(600, 50)) # Explicit size for height calculation
-            self.list_widget.addItem(item)
-            added_count += 1
-        
-            self.list_widget.scrollToBottom()
-            self.adjust_window_height()
+        # To avoid duplicate items if file is found by both the filename index and 'semantic', we can check paths
+        existing_paths = {key[1] for name in ("apps", "files") for key in self.result_model.keys(name)}
+        entries = [(("semantic", res['path']), lambda res=res: self._make_plain_item(res['name'], res))
+                   for res in results if res['path'] not in existing_paths]
+        if not entries: return
+        self._set_section("semantic", entries)
+        self.results_view.scrollToBottom()
+        self.adjust_window_height()
 
-    def handle_action_result(self, actions_list, query):
-        current_text = self.input_field.text()
-        logging.info(f"handle_action_result called. Query: '{query}', Current Input: '{current_text}', Found: {len(actions_list) if actions_list else 0} actions")
+    def handle_action_result(self, actions_list, generation):
+        logging.info(f"handle_action_result called. Generation: {generation} (current {self.generation}), "
+                     f"Found: {len(actions_list) if actions_list else 0} actions")
         
-        # Check if input matches (ignoring leading/trailing whitespace)
-        if current_text.strip() != query.strip():
-            logging.warning(f"Query mismatch (ignoring whitespace): '{current_text.strip()}' != '{query.strip()}'")
+        # Answer for an older keystroke? Drop it
+        if generation != self.generation or not self.results_active:
+            logging.info("Stale actions, dropping.")
             return
 
         if not actions_list:
@@ -797,167 +565,56 @@ class OmniWindow(QWidget):
         if not isinstance(actions_list, list):
             actions_list = [actions_list]
 
-        # 1. Clear ALL existing fast actions from top
-        # We loop and remove as long as item 0 is a fast_action
-        while True:
-            first_item = self.list_widget.item(0)
-            if not first_item: break
-            data = first_item.data(Qt.ItemDataRole.UserRole)
-            if data and isinstance(data, dict) and data.get('type') == 'fast_action':
-                self.list_widget.takeItem(0)
-            else:
-                break # Stop if we hit a non-action item (like an app)
-        
-        # 2. Insert New Actions (Reverse order to maintain A, B, C top-down)
-        for action_data in reversed(actions_list):
-            logging.info(f"Processing action item: {action_data}")
-            item = QListWidgetItem()
-            
-            # --- RICH UI ---
-            if isinstance(action_data, dict) and action_data.get('type') == 'link':
-                # Rich Link Card
-                widget = LinkActionWidget(
-                    title=action_data.get('title', 'Link'),
-                    url=action_data.get('url', ' '.strip()),
-                    description=action_data.get('description', ' '.strip())
-                )
-                item.setSizeHint(widget.sizeHint()) # Dynamic height
-                item.setData(Qt.ItemDataRole.UserRole, {"type": "fast_action", "action_data": action_data})
-                self.list_widget.insertItem(0, item)
-                self.list_widget.setItemWidget(item, widget)
-                
-            elif isinstance(action_data, dict) and action_data.get('type') == 'person':
-                # Person Card
-                widget = PersonActionWidget(
-                    name=action_data.get('name', 'Person'),
-                    description=action_data.get('description', ' '),
-                    image_url=action_data.get('image'),
-                    url=action_data.get('url')
-                )
-                item.setSizeHint(widget.sizeHint())
-                item.setData(Qt.ItemDataRole.UserRole, {"type": "fast_action", "action_data": action_data})
-                self.list_widget.insertItem(0, item)
-                self.list_widget.setItemWidget(item, widget)
-
-            elif isinstance(action_data, dict) and action_data.get('type') == 'place':
-                # Place Card (With Map Logic)
-                widget = PlaceActionWidget(
-                    name=action_data.get('name', 'Place'),
-                    description=action_data.get('description') or action_data.get('address', ' '),
-                    image_url=action_data.get('image'),
-                    url=action_data.get('url'),
-                    lat=action_data.get('latitude'),
-                    lon=action_data.get('longitude')
-                )
-                item.setSizeHint(widget.sizeHint())
-                item.setData(Qt.ItemDataRole.UserRole, {"type": "fast_action", "action_data": action_data})
-                self.list_widget.insertItem(0, item)
-                self.list_widget.setItemWidget(item, widget)
-
-            elif isinstance(action_data, dict) and action_data.get('type') == 'status':
-                    # Status Text (Gray)
-                    text = f"⚡ {action_data.get('content')}"
-                    item.setText(text)
-                    item.setForeground(QColor("#8E8E93"))
-                    font = item.font(); font.setItalic(True); item.setFont(font)
-                    item.setData(Qt.ItemDataRole.UserRole, {"type": "fast_action", "action_data": action_data})
-                    self.list_widget.insertItem(0, item)
-
-            elif isinstance(action_data, dict) and action_data.get('type') == 'calc':
-                    # Calculator
-                    val = action_data.get('content')
-                    item.setText(f"  {val}")
-                    item.setIcon(QIcon.fromTheme("accessories-calculator"))
-                    item.setForeground(QColor("#AF52DE"))
-                    font = item.font(); font.setBold(True); font.setPointSize(22); item.setFont(font)
-                    item.setData(Qt.ItemDataRole.UserRole, {"type": "fast_action", "action_data": action_data})
-                    self.list_widget.insertItem(0, item)
-
-            elif isinstance(action_data, dict) and action_data.get('type') == 'install':
-                    # INSTALL ACTION
-                    app_name = action_data.get('name')
-                    website = action_data.get('website')
-                    
-                    # 1. Check if ANY installed app matches loosely
-                    is_installed = False
-                    for app in self.apps:
-                        if app_name.lower() in app['name'].lower():
-                            is_installed = True
-                            break
-                    
-                    if not is_installed:
-                        # Show Install Action Card
-                        widget = InstallActionWidget(app_name, website)
-                        item.setSizeHint(widget.sizeHint())
-                        item.setData(Qt.ItemDataRole.UserRole, {"type": "fast_action", "action_data": action_data})
-                        self.list_widget.insertItem(0, item)
-                        self.list_widget.setItemWidget(item, widget)
-                    
-            else:
-                # Fallback / Command
-                if isinstance(action_data, str):
-                        text = action_data
-                else:
-                        text = action_data.get('content', str(action_data))
-                        
-                item.setText(f"⚡ {text}")
-                item.setForeground(QColor("#007AFF"))
-                font = item.font(); font.setBold(True); item.setFont(font)
-                item.setData(Qt.ItemDataRole.UserRole, {"type": "fast_action", "action_data": action_data})
-                self.list_widget.insertItem(0, item)
-            
-        self.list_widget.setCurrentRow(0)
-        self.adjust_window_height()
+        # The local calculator already answered this one
+        if self.result_model.keys("calc"):
+            actions_list = [a for a in actions_list if not (isinstance(a, dict) and a.get('type') == 'calc')]
 
-    def on_entered(self, item=None):
-        query = self.input_field.text().strip()
-        if not query: return
-        
-        # Stop any pending fast actions
-        self.debounce_timer.stop()
-        
-        # Cancel active Fast Action Worker if running
-        if self.action_worker and self.action_worker.isRunning():
-            self.action_worker.terminate()
-            self.action_worker.wait()
-            self.action_worker = None
-        
-        # Determine if we should launch or search
-        # 1. Check if user clicked a specific item
-        if item:
-            data = item.data(Qt.ItemDataRole.UserRole)
-            if data:
-                action_type = data.get("type")
-                
-                if action_type == "launch_app":
-                    self.launch_app(data.get("app_cmd"))
-                    self.reset_ui()
-                    return
-                    
-                elif action_type == "fast_action":
-                    action_data = data.get("action_data")
-                    # Handle Rich Actions
-                    if action_data.get('type') == 'link' or action_data.get('type') == 'open':
-                        QDesktopServices.openUrl(QUrl(action_data.get('url')))
-                        self.reset_ui()
-                        return
-
-        # 2. Main "Ask Omni" Flow
-        self.list_widget.clear()
-        
-        # Show Thinking UI
-        item = QListWidgetItem()
-        self.thinking_widget = ThinkingWidget(f"Analyzing '{query}'...")
-        item.setSizeHint(self.thinking_widget.sizeHint())
-        self.list_widget.addItem(item)
-        self.list_widget.setItemWidget(item, self.thinking_widget)
-        
+        self._set_section("actions", [(json.dumps(a, sort_keys=True, default=str), lambda a=a: self._make_action_item(a))
+                                      for a in actions_list])
+        self.select_row(0)
         self.adjust_window_height()
-        
-        # Start AI Worker
-        self.ai_worker = AIWorker(query)
-        self.ai_worker.finished.connect(self.display_answer)
-        self.ai_worker.start()
+
+    def _make_action_item(self, action_data):
+        """Card dict for one fast action, or None to skip it"""
+        logging.info(f"Processing action item: {action_data}")
+        data = {"type": "fast_action", "action_data": action_data}
+        kind = action_data.get('type') if isinstance(action_data, dict) else None
+
+        # --- RICH UI ---
+        if kind == 'link':
+            # Rich Link Card
+            return {"kind": "link", "title": action_data.get('title', 'Link'), "url": action_data.get('url', ''),
+                    "description": action_data.get('description', ''), "data": data}
+
+        elif kind in ('person', 'place'):
+            # Person / Place Card (places fall back to a static map)
+            return dict(person_card(kind, action_data), data=data)
+
+        elif kind == 'status':
+            # Status Text (Gray)
+            return {"kind": "status", "text": f"⚡ {action_data.get('content')}", "data": data}
+
+        elif kind == 'calc':
+            # Calculator
+            return {"kind": "calc", "text": f"{action_data.get('content')}",
+                    "icon": QIcon.fromTheme("accessories-calculator"), "data": data}
+
+        elif kind == 'install':
+            # INSTALL ACTION
+            app_name = action_data.get('name')
+
+            # 1. Check if an installed app goes by that name
+            if self.app_index.lookup(app_name) is not None:
+                return None # already installed
+            return {"kind": "install", "title": f"Install {app_name}", "website": action_data.get('website'),
+                    "description": "Available in NixOS Unstable Channel", "data": data}
+
+        # Fallback / Command
+        if isinstance(action_data, str):
+            text = action_data
+        else:
+            text = action_data.get('content', str(action_data))
+        return {"kind": "command", "text": f"⚡ {text}", "data": data}
 
     def center(self):
         qr = self.frameGeometry()
@@ -988,20 +645,15 @@ class OmniWindow(QWidget):
             key = event.key()
 
             if key == Qt.Key.Key_Down:
-                current = self.list_widget.currentRow()
-                if current < self.list_widget.count() - 1:
-                    self.list_widget.setCurrentRow(current + 1)
+                self.select_row(self.current_row() + 1)
                 return True
             elif key == Qt.Key.Key_Up:
-                current = self.list_widget.currentRow()
-                if current > 0:
-                    self.list_widget.setCurrentRow(current - 1)
+                self.select_row(self.current_row() - 1)
                 return True
             elif key == Qt.Key.Key_Tab:
                 # TAB KEY handling for Actions
-                item = self.list_widget.currentItem()
-                if item:
-                    data = item.data(Qt.ItemDataRole.UserRole)
+                if self.results_active and self.results_view.currentIndex().isValid():
+                    data = self.results_view.currentIndex().data(Qt.ItemDataRole.UserRole)
                     if data and isinstance(data, dict):
                          # Logic for Install Action -> TAB = Install (NixOS Search)
                          if data.get('type') == 'fast_action':
@@ -1015,7 +667,7 @@ class OmniWindow(QWidget):
 
     def start_autonomous_install(self, app_name):
         # 1. Update UI to "Installing" mode
-        self.list_widget.clear()
+        self.clear_list()
         
         # Block signals...
         self.input_field.blockSignals(True)
@@ -1121,15 +773,15 @@ class OmniWindow(QWidget):
         if hasattr(self, 'install_timer'):
             self.install_timer.stop()
             
-        self.list_widget.clear()
+        self.clear_list()
         
         # Use AnswerWidget to ensure proper height calculation for long error messages
         aw = AnswerWidget(message)
-        # Apply specific styling to the internal label based on success/error
+        # Apply specific styling to the text based on success/error
         if success:
-             aw.label.setStyleSheet("color: #34C759; line-height: 1.3;") # Green
+             aw.set_color("#34C759") # Green
         else:
-             aw.label.setStyleSheet("color: #FF3B30; line-height: 1.3;") # Red
+             aw.set_color("#FF3B30") # Red
              
         item = QListWidgetItem(self.list_widget)
         item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsSelectable)
@@ -1148,165 +800,157 @@ class OmniWindow(QWidget):
         # Keep window open for feedback
         if success:
             # Refresh app list so the new app is findable
-            self.apps = self.load_apps()
-
-    def load_apps(self):
-        apps = []
-        paths = ["/run/current-system/sw/share/applications", os.path.expanduser("~/.nix-profile/share/applications")]
-        seen = set()
-        for p in paths:
-            if not os.path.exists(p): continue
-            try:
-                for f in os.listdir(p):
-                    if f.endswith(".desktop"):
-                        full_path = os.path.join(p, f)
-                        
-                        # Defaults
-                        name = f.replace(".desktop", "").replace("-", " ").title()
-                        icon = "application-x-executable"
-                        no_display = False
-                        
-                        try:
-                            with open(full_path, 'r', errors='ignore') as df:
-                                for line in df:
-                                    stripped = line.strip()
-                                    if stripped.startswith("[") and stripped != "[Desktop Entry]":
-                                        break # Stop parsing if we hit a new section (e.g. Actions)
-
-                                    if stripped.startswith("Name="):
-                                        name = stripped.split("=", 1)[1]
-                                    elif stripped.startswith("Icon="):
-                                        icon = stripped.split("=", 1)[1]
-                                    elif stripped.startswith("NoDisplay=true"):
-                                        no_display = True
-                        except:
-                            pass # If reading fails, just use filename fallback
-                        
-                        if no_display: continue
-                        if name in seen: continue
-                        seen.add(name)
-                        apps.append({"name": name, "path": full_path, "icon": icon, "type": "app"})
-            except: continue
-        return sorted(apps, key=lambda x: x['name'])
+            self.app_index.refresh()
 
     def search_files(self, query):
         if not query or len(query) < 2: return []
+        # In-memory lookup, no disk or child process on the UI thread
         try:
-            # Use fd to search in home directory, max 10 results, excluding hidden files by default
-            cmd = ["fd", "--max-results", "5", "--type", "f", "--type", "d", "--exclude", ".*", query, os.path.expanduser("~")]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=1)
-            paths = result.stdout.strip().split('\n')
-            items = []
-            for p in paths:
-                if not p: continue
-                name = os.path.basename(p)
-                if not name: name = p # Fallback if basename is empty
-                is_dir = os.path.isdir(p)
-                icon = "folder" if is_dir else "text-x-generic"
-                items.append({"name": name, "path": p, "icon": icon, "type": "file"})
-            return items
-        except:
+            return self.file_index.search(query, limit=5)
+        except Exception as e:
+            logging.warning(f"File index search failed: {e}")
             return []
 
     def on_text_changed(self, text):
         self.refresh_list(text)
 
-    def refresh_list(self, query):
+    # --- RESULT LIST ---
+    # Top to bottom; each section is diffed on its own by ResultModel, so
+    # unchanged rows keep their card and cached layout across keystrokes
+    SECTIONS = ("actions", "calc", "apps", "ai", "files", "semantic")
+    MAX_LOCAL_ROWS = 10
+
+    def clear_list(self):
+        """For answer/install views that take over the whole list"""
+        self.results_active = False
+        self.result_model.clear()
+        self.results_view.hide()
         self.list_widget.clear()
-        
-        # Prepare Items
-        # 1. AI Item (Always created but placed efficiently)
-        display_text = f"Ask Omni: {query}" if query else "Ask Omni..."
-        ai_item = QListWidgetItem(display_text)
-        ai_item.setData(Qt.ItemDataRole.UserRole, {"type": "ai", "query": query})
-        ai_item.setSizeHint(QSize(600, 50)) # Explicit size
-        
-        # 2. Apps
-        query_lower = query.lower()
-        app_matches = []
-        for app in self.apps:
-            if query_lower in app['name'].lower():
-                app_matches.append(app)
-        
-        # 3. Files
-        file_matches = []
-        if query:
-            file_matches = self.search_files(query)
+        self.list_widget.show()
 
-        # --- SMART ORDERING ---
-        final_items = []
-        
-        # If we have app matches, show them first!
-        if app_matches:
-            # Add apps
-            for app in app_matches[:9]: # Limit apps
-                item = QListWidgetItem(app['name'])
-                if app['icon']:
-                    if os.path.isabs(app['icon']) and os.path.exists(app['icon']):
-                            item.setIcon(QIcon(app['icon']))
-                    else:
-                            item.setIcon(QIcon.fromTheme(app['icon']))
-                item.setData(Qt.ItemDataRole.UserRole, app)
-                item.setSizeHint(QSize(600, 50)) # Explicit size
-                final_items.append(item)
-            
-            # Then AI
-            final_items.append(ai_item)
-        else:
-            # No apps? AI comes first
-            final_items.append(ai_item)
-        
-        # Then files
-        remaining_slots = 10 - len(final_items)
-        for f in file_matches[:remaining_slots]:
-                item = QListWidgetItem(f['name'])
-                item.setIcon(QIcon.fromTheme(f['icon']))
-                item.setToolTip(f['path'])
-                item.setData(Qt.ItemDataRole.UserRole, f)
-                item.setSizeHint(QSize(600, 50)) # Explicit size
-                final_items.append(item)
-        
-        # Add to widget
-        for item in final_items:
-            self.list_widget.addItem(item)
+    def _make_plain_item(self, text, data, icon=None, tooltip=None):
+        return {"kind": "plain", "text": text, "icon": icon, "tooltip": tooltip, "data": data}
 
-        self.list_widget.setCurrentRow(0)
-        self.adjust_window_height()
+    def _set_section(self, name, entries):
+        """entries: [(key, factory)] with factory() -> card dict or None"""
+        if not self.results_active:
+            self.list_widget.clear()
+            self.list_widget.hide()
+            self.results_view.show()
+            self.results_active = True
+        self.result_model.set_section(name, entries)
+
+    def current_row(self):
+        if self.results_active: return self.results_view.currentIndex().row()
+        return self.list_widget.currentRow()
+
+    def select_row(self, row):
+        if self.results_active:
+            if 0 <= row < self.result_model.rowCount():
+                self.results_view.setCurrentIndex(self.result_model.index(row))
+        elif 0 <= row < self.list_widget.count():
+            self.list_widget.setCurrentRow(row)
+
+    def _app_icon(self, app):
+        if not app['icon']: return None
+        if os.path.isabs(app['icon']) and os.path.exists(app['icon']):
+            return QIcon(app['icon'])
+        return QIcon.fromTheme(app['icon'])
+
+    def refresh_list(self, query):
+        self.generation += 1
+        self.query = query
+
+        # Whatever the brain said was for the previous query
+        if self.results_active:
+            self._set_section("actions", [])
+            self._set_section("semantic", [])
+
+        # 1. AI Item (no lookup needed, so it's updated right away)
+        display_text = f"Ask Omni: {query}" if query else "Ask Omni..."
+        ai_data = {"type": "ai", "query": query}
+        self._set_section("ai", [("ai", lambda: self._make_plain_item(display_text, ai_data))])
+        self.result_model.update_card("ai", "ai", text=display_text, data=ai_data) # in place, one dataChanged
 
-        self.list_widget.setCurrentRow(0)
+        # 2. Calculator / apps / files stream in from the local worker
+        self.local_worker.submit(self.generation, query)
+
+        self.select_row(0)
         self.adjust_window_height()
 
-        # 4. Debounce Async Search
+        # 3. Debounce Async Search
         if len(query) >= 1:
             self.debounce_timer.start()
 
+    def on_apps_changed(self):
+        """Apps were installed/removed: re-run the local providers for what's on screen.
+        Same generation, so the brain's results for this query stay."""
+        if self.results_active:
+            self.local_worker.submit(self.generation, self.input_field.text())
+
+    def handle_local_results(self, generation, provider, results):
+        if generation != self.generation or not self.results_active: return
+
+        if provider == "calc":
+            entries = [(("calc", r['content']), lambda r=r: self._make_action_item(r)) for r in results]
+        elif provider == "apps":
+            # If we have app matches, they go above the AI item
+            entries = [(("app", app['path']), lambda app=app: self._make_plain_item(app['name'], app, self._app_icon(app)))
+                       for app in results[:9]] # Limit apps
+        else:
+            remaining_slots = self.MAX_LOCAL_ROWS - 1 - len(self.result_model.keys("apps")) - len(self.result_model.keys("calc"))
+            entries = [(("file", f['path']), lambda f=f: self._make_plain_item(f['name'], f, QIcon.fromTheme(f['icon']), f['path']))
+                       for f in results[:max(0, remaining_slots)]]
+
+        self._set_section(provider, entries)
+        self.select_row(0)
+        self.adjust_window_height()
+
     def trigger_async_searches(self):
         query = self.input_field.text()
         if len(query) < 1: return
+        # Semantic search + fast action; each supersedes the previous keystroke's request
+        self.brain.submit("search", "/search", {"query": query}, self.generation, timeout=5)
+        self.brain.submit("action", "/action", {"query": query}, self.generation, timeout=60)
+
+    def handle_brain_response(self, channel, generation, data, error):
+        if channel == "search":
+            self.handle_semantic_results((data or {}).get("results", []), generation)
+        elif channel == "action":
+            data = data or {}
+            # Support both 'actions' (list) and legacy 'action' (dict)
+            actions = data.get("actions", [])
+            if not actions and data.get("action"):
+                actions = [data.get("action")]
+            self.handle_action_result(actions, generation)
+        elif channel == "ask":
+            if generation != self.generation: return # window was dismissed meanwhile
+            if error == "offline":
+                answer = "The Omni AI hasn't loaded yet. Please try again in a moment."
+            elif error:
+                answer = f"System Error: {error}"
+            elif data.get("streamed"):
+                self.finish_answer() # the text is already on screen
+                return
+            else:
+                answer = data.get("answer", "No answer received.")
+            self.display_ai_result(answer)
+
+    def handle_brain_partial(self, channel, generation, delta):
+        if channel != "ask" or generation != self.generation: return
+        if self.answer_stream is None: self.begin_answer() # first token replaces "Thinking..."
+        self.feed_answer(delta)
 
-        # Trigger Semantic Search
-        if self.search_worker and self.search_worker.isRunning():
-                # Let it finish or ignore, we will spawn new one
-                pass
-        self.search_worker = SearchWorker(query)
-        self.search_worker.results_found.connect(self.handle_semantic_results)
-        self.search_worker.start()
-
-        # Trigger Fast Action
-        if self.action_worker and self.action_worker.isRunning():
-                pass
-        self.action_worker = ActionWorker(query)
-        self.action_worker.action_found.connect(self.handle_action_result)
-        self.action_worker.start()
-
-    def on_entered(self, item=None):
-        if self.list_widget.currentRow() < 0: return
+    def on_entered(self, index=None):
+        if not self.results_active: return
         
         # Handle enter vs click
-        item = item or self.list_widget.currentItem()
-        if not item: return
+        if index is None or not index.isValid():
+            index = self.results_view.currentIndex()
+        if not index.isValid(): return
 
-        data = item.data(Qt.ItemDataRole.UserRole)
+        data = index.data(Qt.ItemDataRole.UserRole)
+        if not data: return
         
         if data['type'] == 'ai':
             query = data['query']
@@ -1315,6 +959,7 @@ class OmniWindow(QWidget):
             
         elif data['type'] == 'app':
             subprocess.Popen(["dex", data['path']], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self.app_index.record_launch(data, self.input_field.text())
             self.close()
             
         elif data['type'] == 'file':
@@ -1372,7 +1017,7 @@ class OmniWindow(QWidget):
                         self.close()
 
     def start_ai_inference(self, query):
-        self.list_widget.clear()
+        self.clear_list()
         
         loading_item = QListWidgetItem("Thinking...")
         loading_item.setFlags(loading_item.flags() & ~Qt.ItemFlag.ItemIsSelectable)
@@ -1383,89 +1028,85 @@ class OmniWindow(QWidget):
         self.input_field.setDisabled(True)
         self.input_field.setStyleSheet("color: rgba(60, 60, 67, 0.6);")
         
-        self.worker = AIWorker(query)
-        self.worker.finished.connect(self.display_ai_result)
-        self.worker.start()
+        self.answer_stream = None
+        # Streamed: timeout is the longest pause between tokens
+        self.brain.submit("ask", "/ask", {"query": query, "stream": True}, self.generation, timeout=120, stream=True)
 
     def display_ai_result(self, answer):
-        logging.info("display_ai_result called.")
+        """A whole answer at once (errors, non-streamed replies)"""
+        logging.info(f"display_ai_result called, raw answer length: {len(answer)}")
+        self.begin_answer()
+        self.feed_answer(answer)
+        self.finish_answer()
+
+    # --- STREAMED ANSWER ---
+    def begin_answer(self):
+        self.clear_list()
+        self.answer_stream = AnswerStream() # splits thinking / text / JSON action as it arrives
+        self.thinking_widget = None
+        self.answer_widget = None
+
+    def feed_answer(self, delta):
+        for kind, text in self.answer_stream.feed(delta):
+            self._show_answer_part(kind, text)
+        if not self.answer_resize_timer.isActive():
+            self.answer_resize_timer.start()
+
+    def _show_answer_part(self, kind, text):
+        if kind == "think":
+            if self.thinking_widget is None:
+                self.thinking_widget = ThinkingWidget("")
+                # Thinking Block goes above the answer
+                item = QListWidgetItem()
+                item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsSelectable)
+                self.list_widget.insertItem(0, item)
+                self.list_widget.setItemWidget(item, self.thinking_widget)
+            self.thinking_widget.append(text)
+        else:
+            if self.answer_widget is None:
+                self.answer_widget = AnswerWidget()
+                answer_item = QListWidgetItem(self.list_widget)
+                answer_item.setFlags(answer_item.flags() & ~Qt.ItemFlag.ItemIsSelectable)
+                self.list_widget.setItemWidget(answer_item, self.answer_widget)
+            self.answer_widget.append(text)
+
+    def refresh_answer_size(self):
+        """Row heights from the already laid-out documents, then the window"""
+        for i in range(self.list_widget.count()):
+            item = self.list_widget.item(i)
+            widget = self.list_widget.itemWidget(item)
+            if widget is not None: item.setSizeHint(widget.sizeHint())
+        self.adjust_window_height()
+        if self.answer_stream is not None: self.list_widget.scrollToBottom() # follow the text
+
+    def finish_answer(self):
+        if self.answer_stream is None: self.begin_answer() # streamed, but not a single token
+        for kind, text in self.answer_stream.finish():
+            self._show_answer_part(kind, text)
+        action_data = self.answer_stream.action
+        display_text = self.answer_stream.text.rstrip(".… ")
+        self.answer_stream = None
+        logging.info(f"Answer finished: {len(display_text)} chars, action: {bool(action_data)}")
+
+        # If the whole answer was just JSON, give a default feedback
+        if action_data and not display_text:
+            display_text = "Executing action..."
+            self._show_answer_part("text", display_text)
+
         try:
             self.input_field.setDisabled(False)
             self.input_field.setStyleSheet("")
             self.input_field.setFocus()
-            self.list_widget.clear()
-            logging.info(f"Raw Answer length: {len(answer)}")
         except Exception as e:
                 logging.error(f"Error resetting UI: {e}")
-        
-        # --- PARSING ---
-        display_text = answer
-        action_data = None
-        thinking_text = ""
-        
-        # 1. Extract Thinking
-        # More robust: handle <think>...</think> OR just <think> if not closed
-        thinking_match = re.search(r'<think>(.*?)(?:</think>|$)', answer, re.DOTALL)
-        if thinking_match:
-            thinking_text = thinking_match.group(1).strip()
-            # Clean full match from display text
-            full_match_text = re.search(r'<think>.*?(?:</think>|$)', answer, re.DOTALL).group(0)
-            display_text = answer.replace(full_match_text, "").strip()
-        
-        # 2. Extract JSON Actions
-        try:
-            # 1. Try to find JSON in code blocks
-            if "```json" in display_text:
-                parts = display_text.split("```json")
-                display_text = parts[0].strip()
-                json_str = parts[1].split("```")[0].strip()
-                action_data = json.loads(json_str)
-            else:
-                # 2. Try to find any {...} block using regex
-                match = re.search(r'(\{.*\})', display_text, re.DOTALL)
-                if match:
-                    json_str = match.group(1)
-                    action_data = json.loads(json_str)
-                    # If the whole remaining answer was just JSON, give a default feedback
-                    if display_text.strip() == json_str:
-                        display_text = "Executing action..."
-                    else:
-                        # Strip the JSON part from the display text
-                        display_text = display_text.replace(json_str, "").strip()
-        except Exception as e:
-            pass
-        
-        # 3. Clean up Punctuation (remove trailing ... or .)
-        display_text = display_text.rstrip(".… ")
-        
-        # --- UI CONSTRUCTION ---
-        
-        # Add Thinking Block if present
-        if thinking_text:
-            tw = ThinkingWidget(thinking_text)
-            # Pass parent to automatically add to list
-            item = QListWidgetItem(self.list_widget)
-            item.setSizeHint(tw.sizeHint())
-            item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsSelectable)
-            # self.list_widget.addItem(item) <--- REMOVED REDUNDANT CALL
-            self.list_widget.setItemWidget(item, tw)
 
         if display_text:
-            aw = AnswerWidget(display_text)
-            answer_item = QListWidgetItem(self.list_widget)
-            answer_item.setFlags(answer_item.flags() & ~Qt.ItemFlag.ItemIsSelectable)
-            
-            # Set size hint FIRST to help the list
-            answer_item.setSizeHint(aw.sizeHint())
-            
-            # self.list_widget.addItem(answer_item) <--- REMOVED REDUNDANT CALL
-            self.list_widget.setItemWidget(answer_item, aw)
-            
             try:
                 subprocess.Popen(["xclip", "-selection", "clipboard"], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).communicate(input=display_text.encode())
             except: pass
-        
-        self.adjust_window_height()
+
+        self.answer_resize_timer.stop()
+        self.refresh_answer_size()
 
         # --- ACTION EXECUTION ---
         if action_data:
@@ -1496,20 +1137,18 @@ class OmniWindow(QWidget):
                     if name:
                         info_msg = f"Launching {name}..."
                         # ... rest of launch logic
-                        found = False
-                        for app in self.apps:
-                            if name.lower() in app['name'].lower():
-                                subprocess.Popen(["dex", app['path']], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                                found = True
-                                break
-                        if not found:
-                                subprocess.Popen(["xdg-open", name], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                        app = self.app_index.lookup(name)
+                        if app:
+                            subprocess.Popen(["dex", app['path']], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                            self.app_index.record_launch(app)
+                        else:
+                            subprocess.Popen(["xdg-open", name], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
                         success = True
                 
                 if success:
                     # Update UI briefly before closing
                     if not display_text or display_text == "Executing action...":
-                        self.list_widget.clear()
+                        self.clear_list()
                         item = QListWidgetItem(info_msg)
                         item.setFont(QFont("Manrope", 20, QFont.Weight.Medium))
                         self.list_widget.addItem(item)
@@ -1520,13 +1159,13 @@ class OmniWindow(QWidget):
                 else:
                     # If we have action data but couldn't execute (missing fields), just show it
                     if not display_text or display_text == "Executing action...":
-                            self.list_widget.clear()
+                            self.clear_list()
                             err_item = QListWidgetItem(f"Could not execute '{action}'. Missing parameters.")
                             err_item.setForeground(QColor(200, 50, 50))
                             self.list_widget.addItem(err_item)
 
             except Exception as e:
-                self.list_widget.clear()
+                self.clear_list()
                 err_item = QListWidgetItem(f"System Error: {str(e)}")
                 err_item.setForeground(QColor(200, 50, 50))
                 self.list_widget.addItem(err_item)
@@ -1535,14 +1174,67 @@ class OmniWindow(QWidget):
         if event.key() == Qt.Key.Key_Escape:
             self.close()
 
+    # --- SHOW / HIDE ---
+    def closeEvent(self, event):
+        # Every close() path (Escape, launching something) just hides a resident window
+        if self.resident:
+            event.ignore()
+            self.dismiss()
+        else:
+            event.accept()
+
+    def dismiss(self):
+        self.hide()
+        installing = getattr(self, 'install_timer', None) is not None and self.install_timer.isActive()
+        if not installing: # otherwise come back to the progress bar
+            self.reset_state()
+
+    def reset_state(self):
+        """Back to an empty search bar, as if freshly started"""
+        self.generation += 1 # late results from the last session are dropped
+        self.debounce_timer.stop()
+        self.answer_resize_timer.stop()
+        self.answer_stream = None
+        for channel in ("search", "action", "ask"):
+            self.brain.cancel(channel)
+        self.input_field.blockSignals(True)
+        self.input_field.setDisabled(False)
+        self.input_field.setStyleSheet("")
+        self.input_field.setText("")
+        self.input_field.blockSignals(False)
+        self.clear_list()
+        self.refresh_list("")
+
+    def summon(self):
+        if self.isVisible():
+            self.raise_()
+            self.activateWindow()
+            return
+        self.adjust_window_height()
+        self.center()
+        self.show()
+        self.raise_()
+        self.activateWindow()
+        self.input_field.setFocus()
+        self.animate_entry()
+
 if __name__ == "__main__":
+    # --daemon: stay resident and serve SOCKET_PATH; --hidden: prewarm without showing
+    resident = "--daemon" in sys.argv
+    if resident and send_command("show" if "--hidden" not in sys.argv else "noop"):
+        sys.exit(0) # already running
     try:
         app = QApplication(sys.argv)
         app.setApplicationName("Omni")
         app.setApplicationDisplayName("Omni")
         app.setDesktopFileName("omni-bar")
         window = OmniWindow()
-        window.show()
+        if resident:
+            app.setQuitOnLastWindowClosed(False)
+            window.resident = True
+            server = OmniServer(window)
+        if "--hidden" not in sys.argv:
+            window.show()
         sys.exit(app.exec())
     except Exception as e:
         with open("/tmp/omni_crash.log", "w") as f:
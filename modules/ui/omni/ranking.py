@@ -0,0 +1,177 @@
+"""Fuzzy + frecency ranking for the Omni launcher's app list.
+
+FuzzyMatcher precomputes, per entry, the lowercased name as a padded code
+point matrix, word-boundary flags and a token index (name words, initials,
+Exec binary, keywords, GenericName). A query is matched against all
+entries at once with numpy: one masked argmax per query character finds
+each entry's next match position, once leftmost and once preferring word
+starts, and the better of the two alignments is kept. Scores reward
+consecutive runs and word starts and penalize gaps, much like fzf.
+
+Frecency remembers launches (~/.local/share/omni/frecency.json): how often
+and how recently an app was started, and which typed prefixes led to it,
+so "ff" and "vsc" go straight to the app you always pick.
+"""
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+MAX_LEN = 64 # longer names are matched on their first 64 characters
+FRECENCY_PATH = os.path.expanduser("~/.local/share/omni/frecency.json")
+FRECENCY_HALF_LIFE = 14 * 86400
+QUERY_KEY_LEN = 8 # typed prefixes remembered per launch
+FRECENCY_FORGET = 0.05 # decayed counts below this are dropped
+
+
+def _words(text):
+    return [w for w in "".join(c if c.isalnum() else " " for c in text.lower()).split() if w]
+
+
+def _char_mask(text):
+    mask = 0
+    for c in text: mask |= 1 << (ord(c) % 64)
+    return np.uint64(mask)
+
+
+def _initials(text):
+    # "Visual Studio Code" -> "vsc", "LibreOffice Writer" -> "lw"
+    return "".join(w[0] for w in _words(text))
+
+
+class FuzzyMatcher:
+    def __init__(self, entries):
+        """entries: app dicts (name, name_en, exec, keywords, generic)"""
+        self.entries = entries
+        n = len(entries)
+        self.chars = np.zeros((n, MAX_LEN), dtype=np.uint16)
+        self.masks = np.zeros(n, dtype=np.uint64) # bit per char (mod 64): cheap "can it match at all"
+        self.boundary = np.zeros((n, MAX_LEN), dtype=bool)
+        self.lengths = np.zeros(n, dtype=np.float32)
+        self.tokens = {} # token prefix -> set of entry ids, for the non-name fields
+        for i, entry in enumerate(entries):
+            original = entry['name'][:MAX_LEN]
+            name = original.lower()[:MAX_LEN]
+            self.lengths[i] = len(name)
+            self.chars[i, :len(name)] = [min(ord(c), 0xFFFF) for c in name]
+            self.masks[i] = _char_mask(name)
+            camel = len(original) == len(name)
+            for j, c in enumerate(name):
+                # word start: first char, after a separator, or a camelCase hump (LibreOffice)
+                self.boundary[i, j] = j == 0 or (c.isalnum() and not name[j - 1].isalnum()) \
+                    or (camel and original[j].isupper() and original[j - 1].islower())
+            binary = os.path.basename(entry.get('exec', '').split(" ")[0]).lower()
+            tokens = set(_words(entry.get('name_en', ''))) | set(_words(entry.get('generic', '')))
+            tokens |= {k.lower() for k in entry.get('keywords', ())} | {binary, _initials(entry['name'])}
+            for token in tokens:
+                for k in range(1, min(len(token), 12) + 1):
+                    self.tokens.setdefault(token[:k], set()).add(i)
+        self.positions = np.arange(MAX_LEN)
+        self.index = {entry['path']: i for i, entry in enumerate(entries)}
+
+    def _align(self, chars, boundary, q, prefer_boundary):
+        """(matched, score) arrays for one alignment strategy over the given rows"""
+        n = len(chars)
+        prev = np.full(n, -1)
+        matched = np.ones(n, dtype=bool)
+        score = np.zeros(n, dtype=np.float32)
+        rows = np.arange(n)
+        for k, c in enumerate(q):
+            hits = (chars == min(ord(c), 0xFFFF)) & (self.positions > prev[:, None])
+            pos = np.argmax(hits, axis=1)
+            found = hits[rows, pos]
+            if prefer_boundary:
+                starts = hits & boundary
+                bpos = np.argmax(starts, axis=1)
+                use = starts[rows, bpos]
+                pos = np.where(use, bpos, pos)
+            matched &= found
+            consecutive = pos == prev + 1
+            at_start = boundary[rows, pos]
+            gap = np.where(prev >= 0, pos - prev - 1, pos)
+            score += 1.0 + 2.0 * at_start + 1.5 * (consecutive & (k > 0)) - 0.15 * np.minimum(gap, 10)
+            prev = np.where(found, pos, prev)
+        return matched, score
+
+    def scores(self, query):
+        """Score per entry (-inf where the query doesn't match at all)"""
+        q = query.strip().lower()[:MAX_LEN]
+        if not q or not self.entries:
+            return np.zeros(len(self.entries), dtype=np.float32)
+        score = np.full(len(self.entries), -np.inf, dtype=np.float32)
+        matched = np.zeros(len(self.entries), dtype=bool)
+        qmask = _char_mask(q)
+        rows = np.flatnonzero((self.masks & qmask) == qmask) # usually a small fraction
+        if len(rows):
+            chars, boundary = self.chars[rows], self.boundary[rows]
+            m1, s1 = self._align(chars, boundary, q, False)
+            m2, s2 = self._align(chars, boundary, q, True)
+            score[rows] = np.where(m2 & (~m1 | (s2 > s1)), s2, s1) - 0.02 * self.lengths[rows] # shorter wins ties
+            matched[rows] = m1 | m2
+        # Other fields: keyword/binary/initials prefix hits count like a decent name match
+        token_hits = self.tokens.get(q, ())
+        if token_hits:
+            ids = np.fromiter(token_hits, dtype=np.int64)
+            score[ids] = np.maximum(np.where(matched[ids], score[ids], -np.inf), 1.5 * len(q) + 1.0)
+            matched[ids] = True
+        return np.where(matched, score, -np.inf)
+
+
+class Frecency:
+    """Launch history: exponentially decayed counts per app and per typed prefix"""
+
+    def __init__(self, path=FRECENCY_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.apps = {} # app path -> [decayed count, last launch]
+        self.queries = {} # typed prefix -> {app path: [decayed count, last launch]}
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            self.apps, self.queries = data.get("apps", {}), data.get("queries", {})
+        except (OSError, ValueError):
+            pass
+        # Earlier files kept plain per-prefix counts; they start decaying from now
+        now = time.time()
+        for picks in self.queries.values():
+            for app_path, value in picks.items():
+                if not isinstance(value, list): picks[app_path] = [float(value), now]
+
+    @staticmethod
+    def _decay(value, since):
+        return value * math.pow(0.5, max(0.0, time.time() - since) / FRECENCY_HALF_LIFE)
+
+    def record(self, app_path, query=""):
+        now = time.time()
+        key = query.strip().lower()[:QUERY_KEY_LEN]
+        with self.lock:
+            count, last = self.apps.get(app_path, [0.0, now])
+            self.apps[app_path] = [self._decay(count, last) + 1.0, now]
+            if key:
+                picks = self.queries.setdefault(key, {})
+                count, last = picks.get(app_path, [0.0, now])
+                picks[app_path] = [self._decay(count, last) + 1.0, now]
+                # Apps not picked for this prefix in a long while are forgotten
+                for other, (count, last) in list(picks.items()):
+                    if self._decay(count, last) < FRECENCY_FORGET: del picks[other]
+            data = {"apps": self.apps, "queries": self.queries}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.tmp-{os.getpid()}"
+            with open(tmp, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def boosts(self, query):
+        """{app path: bonus added to its match score} for apps with any history:
+        habit for this typed prefix first, general use second"""
+        with self.lock:
+            picked = {path: self._decay(count, last)
+                      for path, (count, last) in self.queries.get(query.strip().lower()[:QUERY_KEY_LEN], {}).items()}
+            return {path: 6.0 * math.log1p(picked.get(path, 0.0)) + 1.5 * math.log1p(self._decay(count, last))
+                    for path, (count, last) in self.apps.items()}
@@ -0,0 +1,358 @@
+"""Omni's search result list as model/view.
+
+ResultModel holds rows as plain "card" dicts, grouped into the window's
+sections. set_section() diffs a section by key: rows are inserted,
+removed or moved, and a changed row (the "Ask Omni" row on every
+keystroke, a favicon that just arrived) is updated in place with
+dataChanged.
+
+CardDelegate paints each card directly. There is no widget tree per row
+and no layout pass. Wrapped text is laid out once per card and width as
+QStaticText and cached on the card together with its size hint.
+adjust_window_height() therefore sums cached numbers.
+
+Card kinds:
+  plain    icon + one line (apps, files, "Ask Omni", semantic hits)
+  calc     big purple result
+  status   gray italic line
+  command  blue bold line
+  link     favicon, "Open <url>", title, description
+  install  TAB/ENTER hints, "Install <name>"
+  person   portrait + name, description, source (place: same, map fallback)
+"""
+from urllib.parse import urlparse
+
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, QPointF, QRect, QRectF, QSize, Qt
+from PyQt6.QtGui import QColor, QFont, QFontMetrics, QPainter, QPainterPath, QStaticText, QTextOption, QTransform
+from PyQt6.QtWidgets import QStyle, QStyledItemDelegate
+
+from favicons import favicons
+from image_cache import images
+
+CARD_ROLE = Qt.ItemDataRole.UserRole + 1
+ROW_GAP = 6 # was margin-bottom on QListWidget::item
+IMAGE_W, IMAGE_H, IMAGE_RADIUS = 100, 150, 12
+
+
+class ResultModel(QAbstractListModel):
+    def __init__(self, sections, parent=None):
+        super().__init__(parent)
+        self.sections = sections # top to bottom
+        self.rows = [] # [(section, key, card)]
+
+    # --- Qt API ---
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.rows): return None
+        card = self.rows[index.row()][2]
+        if role == Qt.ItemDataRole.UserRole: return card.get('data')
+        if role == CARD_ROLE: return card
+        if role == Qt.ItemDataRole.DisplayRole: return card.get('text') or card.get('title') or card.get('name')
+        if role == Qt.ItemDataRole.ToolTipRole: return card.get('tooltip')
+        return None
+
+    # --- SECTIONS ---
+    def keys(self, section):
+        return [key for s, key, _ in self.rows if s == section]
+
+    def clear(self):
+        self.beginResetModel()
+        self.rows = []
+        self.endResetModel()
+
+    def _find(self, section, key):
+        for i, (s, k, _) in enumerate(self.rows):
+            if s == section and k == key: return i
+        return -1
+
+    def set_section(self, section, entries):
+        """entries: [(key, factory)] with factory() -> card dict or None.
+        Rows whose key is still present keep their card (and its cached layout)."""
+        order = self.sections.index(section)
+        start = sum(1 for s, _, _ in self.rows if self.sections.index(s) < order)
+        wanted = {key for key, _ in entries}
+        for i in reversed(range(len(self.rows))):
+            s, key, _ = self.rows[i]
+            if s == section and key not in wanted:
+                self.beginRemoveRows(QModelIndex(), i, i)
+                del self.rows[i]
+                self.endRemoveRows()
+
+        placed = set()
+        for key, factory in entries:
+            if key in placed: continue # duplicate
+            row = start + len(placed)
+            current = self._find(section, key)
+            if current > row: # everything above `row` is placed already, so only upward moves
+                self.beginMoveRows(QModelIndex(), current, current, QModelIndex(), row)
+                self.rows.insert(row, self.rows.pop(current))
+                self.endMoveRows()
+            elif current < 0:
+                card = factory()
+                if card is None: continue
+                self.beginInsertRows(QModelIndex(), row, row)
+                self.rows.insert(row, (section, key, card))
+                self.endInsertRows()
+            placed.add(key)
+
+    def update_card(self, section, key, **changes):
+        """Change a card's fields in place; its cached layout is dropped"""
+        i = self._find(section, key)
+        if i < 0: return
+        card = self.rows[i][2]
+        card.update(changes)
+        card.pop('_layout', None)
+        index = self.index(i)
+        self.dataChanged.emit(index, index)
+
+    def touch(self, card):
+        """Repaint the row showing card, if it's still listed (async icon/image arrived)"""
+        for i, (_, _, c) in enumerate(self.rows):
+            if c is card:
+                index = self.index(i)
+                self.dataChanged.emit(index, index)
+                return
+
+
+# --- PAINTING ---
+def _font(size, weight=QFont.Weight.Normal, italic=False, points=False):
+    font = QFont("Manrope")
+    if points: font.setPointSize(size)
+    else: font.setPixelSize(size)
+    font.setWeight(weight)
+    font.setItalic(italic)
+    return font
+
+FONT_ROW = _font(18, QFont.Weight.Medium)
+FONT_ROW_SELECTED = _font(18, QFont.Weight.DemiBold)
+FONT_CALC = _font(22, QFont.Weight.Bold, points=True)
+FONT_STATUS = _font(18, QFont.Weight.Medium, italic=True)
+FONT_COMMAND = _font(18, QFont.Weight.Bold)
+FONT_LINK_ACTION = _font(13, QFont.Weight.DemiBold)
+FONT_LINK_TITLE = _font(16, QFont.Weight.Bold)
+FONT_INSTALL_TITLE = _font(18, QFont.Weight.Bold)
+FONT_SMALL = _font(13)
+FONT_KEY = _font(10, QFont.Weight.ExtraBold)
+FONT_KEY_LABEL = _font(13, QFont.Weight.Bold)
+FONT_PERSON_NAME = _font(24, QFont.Weight.Bold, points=True)
+FONT_PERSON_DESC = _font(15, points=True)
+FONT_PERSON_SOURCE = _font(12, QFont.Weight.DemiBold, points=True)
+FONT_INITIAL = _font(48, QFont.Weight.Bold)
+
+TEXT = QColor("#1d1d1f")
+GRAY = QColor("#8E8E93")
+BLUE = QColor("#007AFF")
+GREEN = QColor("#34C759")
+PURPLE = QColor("#AF52DE")
+SELECTED = QColor(0, 0, 0, 15) # rgba(0, 0, 0, 0.06)
+
+
+def _wrapped(text, font, width):
+    static = QStaticText(text)
+    static.setTextFormat(Qt.TextFormat.PlainText)
+    option = QTextOption()
+    option.setWrapMode(QTextOption.WrapMode.WrapAtWordBoundaryOrAnywhere)
+    static.setTextOption(option)
+    static.setTextWidth(max(1, width))
+    static.prepare(QTransform(), font)
+    return static
+
+
+class CardDelegate(QStyledItemDelegate):
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+
+    def _width(self):
+        width = self.view.viewport().width()
+        return width if width > 100 else 600
+
+    # --- LAYOUT (cached on the card) ---
+    def _layout(self, card, width):
+        cached = card.get('_layout')
+        if cached and cached['width'] == width: return cached
+        kind = card['kind']
+        layout = {'width': width, 'texts': []} # texts: (QStaticText, font, color, x, y)
+        if kind in ("link", "install"):
+            inner = width - 32
+            y = 16 + 20 + 6
+            title_font = FONT_INSTALL_TITLE if kind == "install" else FONT_LINK_TITLE
+            title = _wrapped(card['title'], title_font, inner)
+            layout['texts'].append((title, title_font, TEXT, 16, y))
+            y += title.size().height() + 6
+            desc = _wrapped(card.get('description', ''), FONT_SMALL, inner)
+            layout['texts'].append((desc, FONT_SMALL, GRAY, 16, y))
+            layout['height'] = int(y + desc.size().height() + 16)
+        elif kind == "person":
+            x = 24 + IMAGE_W + 24
+            inner = width - x - 24
+            y = 24 + 4
+            for text, font, color, gap in ((card['name'], FONT_PERSON_NAME, TEXT, 6),
+                                           (card.get('description', ''), FONT_PERSON_DESC, QColor("#3A3A3C"), 14),
+                                           (card.get('source', ''), FONT_PERSON_SOURCE, BLUE, 0)):
+                static = _wrapped(text, font, inner)
+                layout['texts'].append((static, font, color, x, y))
+                y += static.size().height() + gap
+            layout['height'] = int(max(IMAGE_H + 48, y + 24))
+        elif kind == "calc":
+            layout['height'] = 62
+        else:
+            layout['height'] = 50
+        card['_layout'] = layout
+        return layout
+
+    def sizeHint(self, option, index):
+        card = index.data(CARD_ROLE)
+        if card is None: return super().sizeHint(option, index)
+        width = self._width()
+        return QSize(width, self._layout(card, width)['height'] + ROW_GAP)
+
+    # --- PAINT ---
+    def paint(self, painter, option, index):
+        card = index.data(CARD_ROLE)
+        if card is None: return super().paint(painter, option, index)
+        rect = option.rect.adjusted(0, 0, 0, -ROW_GAP)
+        layout = self._layout(card, rect.width())
+        selected = bool(option.state & QStyle.StateFlag.State_Selected)
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        if selected:
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(SELECTED)
+            painter.drawRoundedRect(QRectF(rect), 16, 16)
+        painter.translate(rect.topLeft())
+        getattr(self, f"_paint_{card['kind']}")(painter, card, rect.width(), rect.height(), selected, index)
+        for static, font, color, x, y in layout['texts']:
+            painter.setFont(font)
+            painter.setPen(color)
+            painter.drawStaticText(QPointF(x, y), static)
+        painter.restore()
+
+    def _line(self, painter, text, font, color, x, width, height):
+        painter.setFont(font)
+        painter.setPen(color)
+        text = QFontMetrics(font).elidedText(text, Qt.TextElideMode.ElideRight, max(0, width - x - 20))
+        painter.drawText(QRect(x, 0, width - x - 20, height), Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft, text)
+
+    def _paint_plain(self, painter, card, width, height, selected, index):
+        x = 20
+        icon = card.get('icon')
+        if icon is not None and not icon.isNull():
+            icon.paint(painter, QRect(x, (height - 32) // 2, 32, 32))
+            x += 32 + 12
+        self._line(painter, card['text'], FONT_ROW_SELECTED if selected else FONT_ROW, TEXT, x, width, height)
+
+    def _paint_calc(self, painter, card, width, height, selected, index):
+        x = 20
+        icon = card.get('icon')
+        if icon is not None and not icon.isNull():
+            icon.paint(painter, QRect(x, (height - 32) // 2, 32, 32))
+            x += 32 + 12
+        self._line(painter, card['text'], FONT_CALC, PURPLE, x, width, height)
+
+    def _paint_status(self, painter, card, width, height, selected, index):
+        self._line(painter, card['text'], FONT_STATUS, GRAY, 20, width, height)
+
+    def _paint_command(self, painter, card, width, height, selected, index):
+        self._line(painter, card['text'], FONT_COMMAND, BLUE, 20, width, height)
+
+    def _favicon(self, card, url, index):
+        """Pixmap for url's domain, requested once per card; the row repaints when it lands"""
+        if '_favicon' not in card:
+            model = index.model()
+            def arrived(pixmap, card=card):
+                card['_favicon'] = pixmap
+                model.touch(card)
+            card['_favicon'] = favicons().lookup(url, arrived)
+        return card['_favicon']
+
+    def _paint_link(self, painter, card, width, height, selected, index):
+        pixmap = self._favicon(card, card['url'], index)
+        if pixmap is not None:
+            painter.drawPixmap(QRect(16, 18, 16, 16), pixmap)
+        else:
+            painter.setFont(_font(12)); painter.setPen(BLUE)
+            painter.drawText(QRect(16, 18, 16, 16), Qt.AlignmentFlag.AlignCenter, "🌐")
+        self._line(painter, f"Open {card['url']}", FONT_LINK_ACTION, BLUE, 16 + 16 + 10, width, 16 + 16 + 20)
+
+    def _key(self, painter, text, x):
+        """Keyboard badge at x on the top row; returns the x after it"""
+        w = QFontMetrics(FONT_KEY).horizontalAdvance(text) + 12
+        badge = QRectF(x, 16, w, 20)
+        painter.setPen(QColor("#D1D1D6"))
+        painter.setBrush(QColor("#FFFFFF"))
+        painter.drawRoundedRect(badge, 5, 5)
+        painter.setPen(QColor("#C7C7CC"))
+        painter.drawLine(QPointF(x + 3, 36), QPointF(x + w - 3, 36)) # thicker bottom edge
+        painter.setFont(FONT_KEY)
+        painter.setPen(TEXT)
+        painter.drawText(badge, Qt.AlignmentFlag.AlignCenter, text)
+        return x + w + 8
+
+    def _label(self, painter, text, color, x):
+        painter.setFont(FONT_KEY_LABEL)
+        painter.setPen(color)
+        painter.drawText(QRect(x, 16, 200, 20), Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft, text)
+        return x + QFontMetrics(FONT_KEY_LABEL).horizontalAdvance(text)
+
+    def _paint_install(self, painter, card, width, height, selected, index):
+        pixmap = self._favicon(card, card['website'], index) if card.get('website') else None
+        if pixmap is not None:
+            painter.drawPixmap(QRect(16, 18, 16, 16), pixmap)
+        else:
+            painter.setFont(_font(14)); painter.setPen(GREEN)
+            painter.drawText(QRect(16, 18, 16, 16), Qt.AlignmentFlag.AlignCenter, "⬇")
+        x = self._key(painter, "TAB", 16 + 16 + 10)
+        x = self._label(painter, "Install", GREEN, x) + 12 + 8
+        x = self._key(painter, "ENTER", x)
+        self._label(painter, "Website", GRAY, x)
+
+    def _paint_person(self, painter, card, width, height, selected, index):
+        target = QRect(24, 24, IMAGE_W, IMAGE_H)
+        if card.get('image') and '_image' not in card:
+            model = index.model()
+            def arrived(pixmap, card=card):
+                card['_image'] = pixmap
+                model.touch(card)
+            card['_image'] = images().lookup(card['image'], IMAGE_W, IMAGE_H, IMAGE_RADIUS, arrived)
+        if card.get('_image') is not None:
+            painter.drawPixmap(target, card['_image'])
+            return
+        # Placeholder: initial on blue, or a pin for places without picture or coordinates
+        path = QPainterPath()
+        path.addRoundedRect(QRectF(target), IMAGE_RADIUS, IMAGE_RADIUS)
+        if card.get('placeholder') == "pin":
+            painter.fillPath(path, QColor("#E5E5EA"))
+            painter.setPen(QColor("#FF3B30"))
+            painter.setFont(FONT_INITIAL)
+            painter.drawText(target, Qt.AlignmentFlag.AlignCenter, "📍")
+        elif card.get('placeholder') == "map":
+            painter.fillPath(path, QColor("#F2F2F7"))
+        else:
+            painter.fillPath(path, BLUE)
+            painter.setPen(QColor("white"))
+            painter.setFont(FONT_INITIAL)
+            painter.drawText(target, Qt.AlignmentFlag.AlignCenter, card['name'][:1])
+
+
+def person_card(kind, action_data):
+    """Card for a 'person' or 'place' fast action"""
+    display_name = (action_data.get('name') or kind.title()).replace(" - Wikipedia", "").strip()
+    url = action_data.get('url') or ""
+    domain = urlparse(url).netloc.replace("www.", "")
+    card = {"kind": "person", "name": display_name or kind.title(), "image": action_data.get('image'),
+            "source": f"Source: {domain}" if url else "Unknown Source",
+            "data": {"type": "fast_action", "action_data": action_data}}
+    if kind == "person":
+        card["description"] = action_data.get('description', ' ')
+        return card
+    card["description"] = action_data.get('description') or action_data.get('address', ' ')
+    lat, lon = action_data.get('latitude'), action_data.get('longitude')
+    if not card["image"] and lat and lon:
+        # Use a free static map service (e.g. OSM based)
+        card["image"] = f"https://staticmap.openstreetmap.de/staticmap.php?center={lat},{lon}&zoom=13&size=200x300&markers={lat},{lon},red-pushpin"
+    card["placeholder"] = "map" if card["image"] else "pin"
+    return card